@@ -0,0 +1,148 @@
+import argparse
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from db_pool import get_pool
+from grading import SUBJECTS, SUBJECT_COLUMNS
+
+# Stored values may drift by float rounding: the deltas are folded in from the exact marks, while the
+# recomputation sums the single-precision FLOAT marks of student_info (65.3 reads back as 65.30000305),
+# an error that grows with the sums. Drift beyond this share of the value (or this absolute amount) is reported.
+DRIFT_REL_TOLERANCE: float = 1e-6
+DRIFT_ABS_TOLERANCE: float = 1e-3
+
+# Columns of the single student_aggregates row (created by schema.py): the count plus a sum and a sum of squares per subject
+SUM_COLUMNS: List[str] = [column + "_sum" for column in SUBJECT_COLUMNS]
+SUMSQ_COLUMNS: List[str] = [column + "_sumsq" for column in SUBJECT_COLUMNS]
+AGGREGATE_COLUMNS: List[str] = ["student_count"] + SUM_COLUMNS + SUMSQ_COLUMNS
+
+UPDATE_AGGREGATES_QUERY: str = "UPDATE student_aggregates SET {} WHERE id = 1".format(
+    ", ".join("{0} = {0} + %s".format(column) for column in AGGREGATE_COLUMNS))
+
+# The AGGREGATE_COLUMNS recomputed from the student_info columns they mirror, in one scan
+COMPUTE_AGGREGATES_QUERY: str = "SELECT COUNT(*), {}, {} FROM student_info".format(
+    ", ".join("SUM({})".format(column) for column in SUBJECT_COLUMNS),
+    ", ".join("SUM({0} * {0})".format(column) for column in SUBJECT_COLUMNS))
+
+
+def aggregate_delta(added: Sequence[Sequence[float]] = (), removed: Sequence[Sequence[float]] = ()) -> List[float]:
+    """
+    Change to each of the AGGREGATE_COLUMNS when the added students' marks come in and the removed ones go.
+    """
+    sums: List[float] = [0.0] * len(SUBJECT_COLUMNS)
+    sumsqs: List[float] = [0.0] * len(SUBJECT_COLUMNS)
+    for sign, rows in ((1, added), (-1, removed)):
+        for marks in rows:
+            for i, mark in enumerate(marks):
+                sums[i] += sign * mark
+                sumsqs[i] += sign * mark * mark
+    return [len(added) - len(removed)] + sums + sumsqs
+
+
+def apply_delta(cur: Any, added: Sequence[Sequence[float]] = (), removed: Sequence[Sequence[float]] = ()) -> None:
+    """
+    Folds added and removed students' marks into the aggregates row with a single UPDATE.
+    It runs on the caller's cursor, so it commits or rolls back together with the caller's transaction.
+    """
+    if not added and not removed:
+        return
+    cur.execute(UPDATE_AGGREGATES_QUERY, aggregate_delta(added, removed))
+
+
+def read_aggregates(cur: Any) -> Optional[Dict[str, float]]:
+    """
+    Reads the aggregates row, or returns None if it has not been set up.
+    """
+    cur.execute("SELECT {} FROM student_aggregates WHERE id = 1".format(", ".join(AGGREGATE_COLUMNS)))
+    row = cur.fetchone()
+    return dict(zip(AGGREGATE_COLUMNS, row)) if row else None
+
+
+def compute_aggregates(cur: Any) -> Dict[str, float]:
+    """
+    Recomputes the aggregates from scratch from the student_info columns (the sums are NULL, so 0, with no students).
+    """
+    cur.execute(COMPUTE_AGGREGATES_QUERY)
+    return {column: float(value or 0.0) for column, value in zip(AGGREGATE_COLUMNS, cur.fetchone())}
+
+
+def subject_statistics(aggregates: Dict[str, float]) -> Dict[str, Dict[str, float]]:
+    """
+    Derives the per-subject average and standard deviation from the aggregates in O(1).
+    """
+    count: float = aggregates["student_count"]
+    statistics: Dict[str, Dict[str, float]] = {}
+    for subject, sum_column, sumsq_column in zip(SUBJECTS, SUM_COLUMNS, SUMSQ_COLUMNS):
+        if count <= 0:
+            continue
+        mean: float = aggregates[sum_column] / count
+        variance: float = max(0.0, aggregates[sumsq_column] / count - mean * mean)
+        statistics[subject] = {"average": mean, "std_dev": math.sqrt(variance)}
+    return statistics
+
+
+def cumulative_average(aggregates: Dict[str, float]) -> Optional[float]:
+    """
+    Average mark over every subject of every student, or None when there are no students.
+    """
+    subjects_count: float = aggregates["student_count"] * len(SUBJECT_COLUMNS)
+    if subjects_count <= 0:
+        return None
+    return sum(aggregates[column] for column in SUM_COLUMNS) / subjects_count
+
+
+def is_drifted(stored: float, actual: float) -> bool:
+    return not math.isclose(stored, actual, rel_tol=DRIFT_REL_TOLERANCE, abs_tol=DRIFT_ABS_TOLERANCE)
+
+
+def check_aggregates(cur: Any, rebuild: bool = False) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """
+    Reads the stored aggregates and recomputes them, returning both (stored, actual) for comparison.
+    With rebuild, the stored row is replaced by the recomputed values.
+    """
+    stored: Dict[str, float] = {column: float(value) for column, value in
+                                (read_aggregates(cur) or dict.fromkeys(AGGREGATE_COLUMNS, 0.0)).items()}
+    actual: Dict[str, float] = compute_aggregates(cur)
+
+    if rebuild:
+        cur.execute("DELETE FROM student_aggregates WHERE id = 1")
+        cur.execute("INSERT INTO student_aggregates (id, {}) VALUES (1, {})".format(
+            ", ".join(AGGREGATE_COLUMNS), ", ".join(["%s"] * len(AGGREGATE_COLUMNS))),
+            [actual[column] for column in AGGREGATE_COLUMNS])
+    return stored, actual
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check or rebuild the student_aggregates table.")
+    parser.add_argument("--rebuild", action="store_true", help="Replace the stored aggregates with recomputed values")
+    args = parser.parse_args()
+
+    con = get_pool().get_connection()
+    cur = con.cursor()
+    try:
+        # Lock student_info against writers so the recomputation matches what is stored
+        if args.rebuild:
+            cur.execute("SELECT COUNT(*) FROM student_info FOR UPDATE")
+            cur.fetchall()
+        stored, actual = check_aggregates(cur, rebuild=args.rebuild)
+        con.commit()
+    finally:
+        con.close()
+
+    drifted: Dict[str, float] = {column: stored[column] - actual[column] for column in AGGREGATE_COLUMNS
+                                 if is_drifted(stored[column], actual[column])}
+    print("\nAGGREGATES CONSISTENCY CHECK")
+    print("-------------------------------------------------------------")
+    if drifted:
+        print("{:<30} {:>20}".format("Column", "Drift (stored - actual)"))
+        for column, value in drifted.items():
+            print("{:<30} {:>20.6f}".format(column, value))
+    else:
+        print("No drift found.")
+    if args.rebuild:
+        print("Aggregates rebuilt from student_info.")
+    print("-------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from db_pool import get_pool
+from grading import GRADE_BOUNDARIES, GRADE_LABELS, MAX_MARKS, SUBJECT_COLUMNS, SUBJECTS
+
+PERCENTILES: List[int] = [25, 50, 75, 90]
+
+MARKS_QUERY: str = "SELECT student_id, {} FROM student_info ORDER BY student_id".format(", ".join(SUBJECT_COLUMNS))
+
+
+def load_marks(cur: Any) -> Tuple[List[str], np.ndarray]:
+    """
+    Loads every student's marks in one bulk fetch.
+    Returns the student IDs and an (n_students, n_subjects) float64 array of marks in the same order.
+    """
+    cur.execute(MARKS_QUERY)
+    rows: List[Tuple[Any, ...]] = cur.fetchall()
+    student_ids: List[str] = [row[0] for row in rows]
+    marks: np.ndarray = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), len(SUBJECTS))
+    return student_ids, marks
+
+
+def grade_indices(values: np.ndarray) -> np.ndarray:
+    """
+    Maps marks or percentages to indices into GRADE_LABELS, using the calculate_grade bands.
+    """
+    return np.searchsorted(np.asarray(GRADE_BOUNDARIES, dtype=np.float64), values, side='right')
+
+
+def finite(value: float) -> Optional[float]:
+    """
+    A statistic as a float, or None where it is undefined (NaN or infinite), which JSON cannot carry.
+    """
+    return float(value) if np.isfinite(value) else None
+
+
+def compute_statistics(student_ids: Sequence[str], marks: np.ndarray) -> Dict[str, Any]:
+    """
+    Computes the class-wide statistics from the columnar marks array with vectorized operations.
+    """
+    n_students: int = marks.shape[0]
+    n_subjects: int = marks.shape[1]
+    if n_students == 0:
+        return {"students": 0}
+
+    totals: np.ndarray = marks.sum(axis=1)
+    percentages: np.ndarray = totals / MAX_MARKS * 100
+
+    # Per-subject summary statistics (population standard deviation, like the aggregates table)
+    means: np.ndarray = marks.mean(axis=0)
+    stds: np.ndarray = marks.std(axis=0)
+    quantiles: np.ndarray = np.percentile(marks, PERCENTILES, axis=0)
+    minimums: np.ndarray = marks.min(axis=0)
+    maximums: np.ndarray = marks.max(axis=0)
+
+    # Grade histograms per subject in a single bincount: offset each subject's grade index by its column
+    n_grades: int = len(GRADE_LABELS)
+    offsets: np.ndarray = np.arange(n_subjects) * n_grades
+    histogram: np.ndarray = np.bincount((grade_indices(marks) + offsets).ravel(),
+                                        minlength=n_subjects * n_grades).reshape(n_subjects, n_grades)
+    final_histogram: np.ndarray = np.bincount(grade_indices(percentages), minlength=n_grades)
+
+    # Percentile rank: share of students whose total is at or below each student's total
+    sorted_totals: np.ndarray = np.sort(totals)
+    percentile_ranks: np.ndarray = np.searchsorted(sorted_totals, totals, side='right') / n_students * 100
+
+    # Undefined (None) for a subject whose marks are all the same, or for a single student
+    if n_students > 1:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlation: np.ndarray = np.corrcoef(marks, rowvar=False)
+    else:
+        correlation = np.full((n_subjects, n_subjects), np.nan)
+
+    subjects: Dict[str, Dict[str, Any]] = {}
+    for j, subject in enumerate(SUBJECTS):
+        subjects[subject] = {
+            "mean": finite(means[j]),
+            "median": finite(quantiles[PERCENTILES.index(50), j]),
+            "std_dev": finite(stds[j]),
+            "min": finite(minimums[j]),
+            "max": finite(maximums[j]),
+            "percentiles": {p: finite(quantiles[i, j]) for i, p in enumerate(PERCENTILES)},
+            "grades": dict(zip(GRADE_LABELS, (int(count) for count in histogram[j]))),
+        }
+
+    return {
+        "students": n_students,
+        "subjects": subjects,
+        "final_grades": dict(zip(GRADE_LABELS, (int(count) for count in final_histogram))),
+        "correlation": {a: {b: finite(correlation[i, k]) for k, b in enumerate(SUBJECTS)} for i, a in enumerate(SUBJECTS)},
+        "percentile_ranks": dict(zip(student_ids, percentile_ranks.tolist())),
+    }
+
+
+def analyze(con: Optional[Any] = None) -> Dict[str, Any]:
+    """
+    Loads the marks and returns the class-wide statistics.
+    Uses the given connection, or one from the shared pool.
+    """
+    own_connection: bool = con is None
+    if own_connection:
+        con = get_pool().get_connection()
+    try:
+        student_ids, marks = load_marks(con.cursor())
+    finally:
+        if own_connection:
+            con.close()
+    return compute_statistics(student_ids, marks)
+
+
+def print_statistics(statistics: Dict[str, Any], student_id: Optional[str] = None) -> None:
+    """
+    Prints the class-wide statistics, and the percentile rank of a student if one is given.
+    """
+    if not statistics["students"]:
+        print("No entries found in the database.")
+        return
+
+    print("\nCLASS ANALYTICS ({} students)".format(statistics["students"]))
+    print("-------------------------------------------------------------")
+    print("{:<18} {:>7} {:>7} {:>7} {:>7} {:>7} {:>7}".format("Subject", "Mean", "Median", "StdDev", "P25", "P75", "P90"))
+    for subject, values in statistics["subjects"].items():
+        print("{:<18} {:>7.2f} {:>7.2f} {:>7.2f} {:>7.2f} {:>7.2f} {:>7.2f}".format(
+            subject, values["mean"], values["median"], values["std_dev"],
+            values["percentiles"][25], values["percentiles"][75], values["percentiles"][90]))
+
+    print("-------------------------------------------------------------")
+    print("{:<18} ".format("Grades") + " ".join("{:>6}".format(label) for label in GRADE_LABELS))
+    for subject, values in statistics["subjects"].items():
+        print("{:<18} ".format(subject) + " ".join("{:>6}".format(values["grades"][label]) for label in GRADE_LABELS))
+    print("{:<18} ".format("Final Grade") + " ".join("{:>6}".format(statistics["final_grades"][label]) for label in GRADE_LABELS))
+
+    print("-------------------------------------------------------------")
+    print("Correlation between subjects")
+    short_names: List[str] = [subject[:7] for subject in SUBJECTS]
+    print("{:<18} ".format("") + " ".join("{:>7}".format(name) for name in short_names))
+    for subject, row in statistics["correlation"].items():
+        print("{:<18} ".format(subject) + " ".join("{:>7}".format("-") if row[other] is None else "{:>7.2f}".format(row[other])
+                                                   for other in SUBJECTS))
+    print("-------------------------------------------------------------")
+
+    if student_id:
+        rank: Optional[float] = statistics["percentile_ranks"].get(student_id)
+        if rank is None:
+            print("Student with ID '{}' not found.".format(student_id))
+        else:
+            print("Student '{}' is at the {:.2f} percentile of the class.".format(student_id, rank))
@@ -0,0 +1,163 @@
+import argparse
+import gzip
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from gradebook import ENTRY_FIELDS
+from ranking import get_rank_index
+from storage import get_storage
+from student_cache import get_cache
+
+
+def read_ids(path: str) -> Iterator[str]:
+    """
+    Streams student IDs from a file with one ID per line (blank lines are skipped).
+    """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield line.strip()
+
+
+def id_chunks(student_ids: Iterator[str], chunk_size: int) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for student_id in student_ids:
+        chunk.append(student_id)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def matching_chunks(filters: Dict[str, Any], chunk_size: int) -> Iterator[List[str]]:
+    """
+    Yields the IDs of the students matching the filters, chunk_size at a time. Each chunk is read
+    after the previous one has been removed, continuing from the last ID seen (keyset pagination).
+    """
+    last: Optional[str] = None
+    while True:
+        chunk: List[str] = [entry[0] for entry in get_storage().iter_entries(filters, after=last, limit=chunk_size)]
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+class ArchiveFile:
+    """
+    Appends removed entries to a gzip-compressed JSON lines file, flushed before each chunk is committed.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        # Appending adds a new gzip member, which gzip readers treat as one stream
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+
+    def write(self, entries: List[Tuple[Any, ...]]) -> None:
+        archived_at: str = datetime.now(timezone.utc).isoformat()
+        for entry in entries:
+            record: Dict[str, Any] = dict(zip(ENTRY_FIELDS, entry))
+            record["archived_at"] = archived_at
+            self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def remove_students(chunks: Iterator[List[str]], to_tables: bool = False, to_file: Optional[str] = None) -> Dict[str, float]:
+    """
+    Removes the students in each chunk of IDs in its own transaction, copying them to the archive
+    tables and/or a compressed file first. Returns counts and the throughput of the removal.
+    """
+    archive_file: Optional[ArchiveFile] = ArchiveFile(to_file) if to_file else None
+    storage = get_storage()
+    start: float = time.perf_counter()
+    requested: int = 0
+    removed: int = 0
+    try:
+        for chunk in chunks:
+            requested += len(chunk)
+            entries: List[Tuple[Any, ...]] = storage.remove_students(
+                chunk, archive=to_tables, before_commit=archive_file.write if archive_file else None)
+            removed += len(entries)
+            for entry in entries:
+                get_cache().invalidate(entry[0])
+                get_rank_index().remove(entry[0])
+
+            elapsed: float = time.perf_counter() - start
+            print("\r{} students removed ({:.0f} rows/sec)".format(removed, removed / elapsed if elapsed > 0 else 0.0), end="")
+    finally:
+        if archive_file is not None:
+            archive_file.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "requested": requested,
+        "removed": removed,
+        "elapsed": elapsed,
+        "rows_per_sec": removed / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Remove many students at once, archiving them to tables or a compressed file.")
+    selection = parser.add_argument_group("students to remove (IDs, or the filters combined)")
+    selection.add_argument("--ids", nargs="+", help="Student IDs")
+    selection.add_argument("--ids-file", help="File with one student ID per line")
+    selection.add_argument("--prefix", help="Student IDs starting with this prefix")
+    selection.add_argument("--below-percentage", type=float, help="Students whose percentage is below this")
+    selection.add_argument("--final-grade", help="Students with this final grade")
+    parser.add_argument("--to-tables", action="store_true", help="Copy the students to the student_info_archive and grade_table_archive tables")
+    parser.add_argument("--to-file", help="Append the students to this gzip-compressed JSON lines file")
+    parser.add_argument("--no-archive", action="store_true", help="Delete the students without keeping a copy")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Students per delete transaction (default 500)")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the students that would be removed")
+    args = parser.parse_args()
+
+    filters: Dict[str, Any] = {}
+    if args.prefix:
+        filters["student_id_prefix"] = args.prefix
+    if args.below_percentage is not None:
+        filters["below_percentage"] = args.below_percentage
+    if args.final_grade:
+        filters["final_grade"] = args.final_grade
+    if bool(args.ids or args.ids_file) == bool(filters):
+        parser.error("give either --ids/--ids-file or at least one of --prefix, --below-percentage, --final-grade")
+    if not (args.to_tables or args.to_file or args.no_archive or args.dry_run):
+        parser.error("choose --to-tables and/or --to-file, or --no-archive to delete without a copy")
+    chunk_size: int = max(1, args.chunk_size)
+
+    if args.dry_run:
+        if filters:
+            count: int = sum(1 for _ in get_storage().iter_entries(filters))
+        else:
+            count = sum(1 for student_id in (args.ids or read_ids(args.ids_file)) if get_storage().fetch_entry(student_id))
+        print("{} students would be removed.".format(count))
+        return
+
+    chunks: Iterator[List[str]]
+    if filters:
+        chunks = matching_chunks(filters, chunk_size)
+    else:
+        chunks = id_chunks(iter(args.ids) if args.ids else read_ids(args.ids_file), chunk_size)
+    result: Dict[str, float] = remove_students(chunks, args.to_tables, args.to_file)
+
+    print("\n\nREMOVAL SUMMARY")
+    print("-------------------------------------------------------------")
+    if not filters:
+        print("Student IDs given: ", result["requested"])
+    print("Students removed: ", result["removed"])
+    print("Elapsed: {:.2f}s ({:.0f} rows/sec)".format(result["elapsed"], result["rows_per_sec"]))
+    if args.to_tables:
+        print("Archived to: student_info_archive, grade_table_archive")
+    if args.to_file:
+        print("Archived to: ", args.to_file)
+    print("-------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import functools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import gradebook
+from db_pool import env_float, env_int
+
+
+class AsyncGradebook:
+    """
+    Runs the blocking gradebook operations on a thread pool, so that independent reports can be
+    awaited together from asyncio. At most max_concurrency operations run at once (each holds a
+    pooled connection, so keep it at or below pool_size), and each is given up on after timeout seconds.
+
+    A timed-out operation is abandoned rather than interrupted: its thread finishes the query and
+    returns the connection to the pool in the background.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, timeout: Optional[float] = None) -> None:
+        self.max_concurrency: int = max(1, max_concurrency or env_int('report_concurrency', env_int('pool_size', 5)))
+        self.timeout: float = timeout if timeout is not None else env_float('report_timeout', 30.0)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="report")
+        # Created on first use, inside the running event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Runs func(*args) on the thread pool within the concurrency limit and the timeout.
+        Raises asyncio.TimeoutError if it takes longer than the timeout.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await asyncio.wait_for(loop.run_in_executor(self._executor, functools.partial(func, *args)), self.timeout)
+
+    async def average(self, student_id: Optional[str] = None) -> Dict[str, Any]:
+        return await self.run(gradebook.average, student_id)
+
+    async def toppers(self) -> Any:
+        return await self.run(gradebook.toppers)
+
+    async def top_n(self, n: int) -> Any:
+        return await self.run(gradebook.top_n, n)
+
+    async def failed_students(self) -> Any:
+        return await self.run(gradebook.failed_students)
+
+    async def entries(self, after: Optional[str] = None, before: Optional[str] = None, limit: Optional[int] = None,
+                      filters: Optional[Dict[str, Any]] = None) -> Any:
+        return await self.run(gradebook.entries, after, before, limit, filters)
+
+    async def report_card(self, student_id: str) -> Dict[str, Any]:
+        return await self.run(gradebook.report_card, student_id)
+
+    async def statistics(self) -> Dict[str, Any]:
+        return await self.run(gradebook.statistics)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self) -> "AsyncGradebook":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def dashboard_reports(top_n: int = 10, page_size: int = 50) -> Dict[str, Tuple[Callable[..., Any], Tuple[Any, ...]]]:
+    """
+    The independent reports of the dashboard, as name -> (gradebook function, arguments):
+    the figures behind Calculate Average, Status and the first page of Display.
+    """
+    return {
+        "average": (gradebook.average, ()),
+        "toppers": (gradebook.toppers, ()),
+        "top_n": (gradebook.top_n, (top_n,)),
+        "failed": (gradebook.failed_students, ()),
+        "entries": (gradebook.entries, (None, None, page_size)),
+    }
+
+
+def report_error(error: BaseException) -> Dict[str, str]:
+    if isinstance(error, asyncio.TimeoutError):
+        return {"error": "Timed out.", "type": "TimeoutError"}
+    return {"error": str(error), "type": type(error).__name__}
+
+
+async def dashboard(engine: AsyncGradebook, top_n: int = 10, page_size: int = 50) -> Dict[str, Any]:
+    """
+    Runs the dashboard reports concurrently. A report that fails or times out is returned as
+    {"error": ..., "type": ...} without holding up the others.
+    """
+    reports = dashboard_reports(top_n, page_size)
+    results = await asyncio.gather(*(engine.run(func, *args) for func, args in reports.values()), return_exceptions=True)
+    return {name: report_error(result) if isinstance(result, BaseException) else result
+            for name, result in zip(reports, results)}
+
+
+def sequential_dashboard(top_n: int = 10, page_size: int = 50) -> Dict[str, Any]:
+    """
+    Runs the dashboard reports one after another, as the menu does.
+    """
+    result: Dict[str, Any] = {}
+    for name, (func, args) in dashboard_reports(top_n, page_size).items():
+        try:
+            result[name] = func(*args)
+        except Exception as e:
+            result[name] = report_error(e)
+    return result
+
+
+def run_dashboard(top_n: int = 10, page_size: int = 50, max_concurrency: Optional[int] = None,
+                  timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Runs the dashboard reports concurrently from blocking code.
+    """
+    async def run() -> Dict[str, Any]:
+        async with AsyncGradebook(max_concurrency, timeout) as engine:
+            return await dashboard(engine, top_n, page_size)
+    return asyncio.run(run())
+
+
+def compare(top_n: int = 10, page_size: int = 50, max_concurrency: Optional[int] = None,
+            timeout: Optional[float] = None, repeat: int = 3) -> Dict[str, float]:
+    """
+    Times the sequential and the concurrent dashboard (best of repeat runs each).
+    """
+    # One untimed run of each, so that connections are open and caches warm for both
+    sequential_dashboard(top_n, page_size)
+    run_dashboard(top_n, page_size, max_concurrency, timeout)
+
+    sequential: float = float("inf")
+    concurrent: float = float("inf")
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        sequential_dashboard(top_n, page_size)
+        sequential = min(sequential, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        run_dashboard(top_n, page_size, max_concurrency, timeout)
+        concurrent = min(concurrent, time.perf_counter() - start)
+    return {"sequential_seconds": sequential, "concurrent_seconds": concurrent,
+            "speedup": sequential / concurrent if concurrent > 0 else 0.0}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the dashboard reports concurrently and print them as JSON.")
+    parser.add_argument("--top-n", type=int, default=10, help="Size of the top N report (default 10)")
+    parser.add_argument("--page-size", type=int, default=50, help="Entries in the display page (default 50)")
+    parser.add_argument("--concurrency", type=int, help="Reports run at once (default report_concurrency, or pool_size)")
+    parser.add_argument("--timeout", type=float, help="Seconds before a report is given up on (default report_timeout, or 30)")
+    parser.add_argument("--compare", action="store_true", help="Time the concurrent reports against the sequential ones instead")
+    parser.add_argument("--indent", type=int, default=None, help="Indent the JSON output")
+    args = parser.parse_args()
+
+    if args.compare:
+        result: Dict[str, Any] = compare(args.top_n, args.page_size, args.concurrency, args.timeout)
+    else:
+        result = run_dashboard(args.top_n, args.page_size, args.concurrency, args.timeout)
+    print(json.dumps(result, indent=args.indent, default=str))
+
+
+if __name__ == "__main__":
+    main()
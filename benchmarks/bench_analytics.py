@@ -0,0 +1,101 @@
+"""
+Compares the vectorized analytics engine with equivalent pure-Python loops over row tuples
+(the style of calculate_average, get_student_status and add_grade), on synthetic in-memory data.
+
+    python -m benchmarks.bench_analytics --sizes 100000 1000000
+"""
+import argparse
+import math
+import time
+from bisect import bisect_right
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from analytics import compute_statistics
+from grading import MAX_MARKS, SUBJECTS, calculate_grade
+
+
+def synthetic_rows(n: int, seed: int = 42) -> List[Tuple[Any, ...]]:
+    """
+    Builds n (student_id, marks...) tuples, as fetched from student_info.
+    """
+    rng = np.random.default_rng(seed)
+    marks: np.ndarray = np.round(np.clip(rng.normal(65, 15, (n, len(SUBJECTS))), 0, 100), 1)
+    return [("S{:08d}".format(i), *row) for i, row in enumerate(marks.tolist())]
+
+
+def loop_statistics(rows: List[Tuple[Any, ...]]) -> Dict[str, Any]:
+    """
+    The same statistics computed with per-row Python loops and calculate_grade per mark.
+    """
+    n: int = len(rows)
+    columns: List[List[float]] = [[row[j + 1] for row in rows] for j in range(len(SUBJECTS))]
+    subjects: Dict[str, Dict[str, Any]] = {}
+    means: List[float] = []
+    for subject, column in zip(SUBJECTS, columns):
+        total: float = 0
+        for mark in column:
+            total += mark
+        mean: float = total / n
+        means.append(mean)
+        squares: float = 0
+        for mark in column:
+            squares += (mark - mean) ** 2
+        ordered: List[float] = sorted(column)
+        grades: Dict[str, int] = {}
+        for mark in column:
+            grade: str = calculate_grade(mark)
+            grades[grade] = grades.get(grade, 0) + 1
+        subjects[subject] = {"mean": mean, "median": ordered[n // 2], "std_dev": math.sqrt(squares / n), "grades": grades}
+
+    totals: List[float] = [sum(row[1:]) for row in rows]
+    final_grades: Dict[str, int] = {}
+    for total in totals:
+        grade = calculate_grade(total / MAX_MARKS * 100)
+        final_grades[grade] = final_grades.get(grade, 0) + 1
+    sorted_totals: List[float] = sorted(totals)
+    percentile_ranks: Dict[str, float] = {row[0]: bisect_right(sorted_totals, total) / n * 100 for row, total in zip(rows, totals)}
+
+    correlation: Dict[str, Dict[str, float]] = {}
+    for i, a in enumerate(SUBJECTS):
+        correlation[a] = {}
+        for k, b in enumerate(SUBJECTS):
+            covariance: float = 0
+            for x, y in zip(columns[i], columns[k]):
+                covariance += (x - means[i]) * (y - means[k])
+            correlation[a][b] = covariance / n / (subjects[a]["std_dev"] * subjects[b]["std_dev"])
+
+    return {"subjects": subjects, "final_grades": final_grades, "correlation": correlation, "percentile_ranks": percentile_ranks}
+
+
+def vectorized_statistics(rows: List[Tuple[Any, ...]]) -> Dict[str, Any]:
+    # Includes building the columnar array, as load_marks does after its fetch
+    student_ids: List[str] = [row[0] for row in rows]
+    marks: np.ndarray = np.array([row[1:] for row in rows], dtype=np.float64)
+    return compute_statistics(student_ids, marks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized analytics against Python loops.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000], help="Numbers of students")
+    args = parser.parse_args()
+
+    print("{:>10} {:>12} {:>12} {:>9}".format("Students", "Loops", "Vectorized", "Speedup"))
+    print("-------------------------------------------------------------")
+    for n in args.sizes:
+        rows: List[Tuple[Any, ...]] = synthetic_rows(n)
+
+        start: float = time.perf_counter()
+        loop_statistics(rows)
+        loop_time: float = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized_statistics(rows)
+        vectorized_time: float = time.perf_counter() - start
+
+        print("{:>10} {:>11.3f}s {:>11.3f}s {:>8.1f}x".format(n, loop_time, vectorized_time, loop_time / vectorized_time))
+
+
+if __name__ == "__main__":
+    main()
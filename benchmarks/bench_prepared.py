@@ -0,0 +1,78 @@
+"""
+Compares the per-call latency of the single-student lookup, insert and remove paths with plain
+(text protocol) cursors and with the prepared statements of statements.py, on synthetic data.
+
+The gain is on MySQL, where a prepared statement is parsed and planned once per connection and its
+rows come back in the binary protocol; sqlite3 already caches compiled statements per connection,
+so on SQLite the two runs should be about even:
+
+    python -m benchmarks.bench_prepared --backend mysql --database grade_bench --rows 100000
+    python -m benchmarks.bench_prepared --rows 100000
+"""
+import argparse
+import random
+import tempfile
+from typing import Any, Dict, List
+
+from benchmarks.datagen import generate_students
+from benchmarks.run import measure, open_backend, populate
+from grading import validate_student_record
+from statements import statement_stats
+from storage import SQLStorage, set_storage
+
+
+def run_mode(args: argparse.Namespace, prepared: bool, sample_ids: List[str], start: int) -> Dict[str, Dict[str, float]]:
+    """
+    Times the lookup, insert and remove paths through a storage with or without prepared statements.
+    """
+    storage: SQLStorage = SQLStorage(args.backend, prepared=prepared)
+    set_storage(storage)
+    records: List[Dict[str, Any]] = list(generate_students(args.ops, args.seed + 1, start=start))
+    new_rows = [validate_student_record(record) for record in records]
+    # Warm up: open the connection and, when prepared, prepare the lookup
+    storage.fetch_entry(sample_ids[0])
+
+    # The storage is called directly, so the student cache does not hide the queries
+    return {
+        "lookup": measure(storage.fetch_entry, sample_ids),
+        "insert": measure(lambda row: storage.add_student(*row), new_rows),
+        "remove": measure(storage.remove_student, [record["student_id"] for record in records]),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark prepared statements on the single-student paths.")
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], default="sqlite")
+    parser.add_argument("--database", help="Scratch MySQL database (required for --backend mysql; its tables are emptied)")
+    parser.add_argument("--workdir", default=tempfile.gettempdir(), help="Directory for the SQLite database")
+    parser.add_argument("--rows", type=int, default=100000, help="Number of synthetic students (default 100000)")
+    parser.add_argument("--ops", type=int, default=2000, help="Calls per path and mode (default 2000)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if args.backend == "mysql" and not args.database:
+        parser.error("--backend mysql needs --database")
+    # One pooled connection, so every call reuses its prepared statements
+    args.pool_size = 1
+
+    open_backend(args, args.rows)
+    populate(generate_students(args.rows, args.seed))
+    rng: random.Random = random.Random(args.seed)
+    sample_ids: List[str] = ["S{:08d}".format(rng.randrange(args.rows)) for _ in range(args.ops)]
+
+    plain: Dict[str, Dict[str, float]] = run_mode(args, False, sample_ids, args.rows)
+    prepared: Dict[str, Dict[str, float]] = run_mode(args, True, sample_ids, args.rows + args.ops)
+
+    print("\n{} students on {}, {} calls per path".format(args.rows, args.backend, args.ops))
+    print("-------------------------------------------------------------")
+    print("{:<8} {:>13} {:>13} {:>13} {:>10}".format("Path", "Plain (us)", "Prepared (us)", "P50 prep (us)", "Change"))
+    for path in plain:
+        before: float = plain[path]["mean"] * 1e6
+        after: float = prepared[path]["mean"] * 1e6
+        print("{:<8} {:>13.1f} {:>13.1f} {:>13.1f} {:>9.1f}%".format(
+            path, before, after, prepared[path]["p50"] * 1e6, (after - before) / before * 100))
+    print("-------------------------------------------------------------")
+    print("Prepared statements: ", statement_stats())
+
+
+if __name__ == "__main__":
+    main()
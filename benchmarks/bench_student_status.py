@@ -0,0 +1,118 @@
+"""
+Compares the old fetch-everything implementation of the student status reports with
+the server-side queries, on a synthetic table.
+
+Run from the project directory against a scratch database (it is filled with synthetic students):
+
+    python -m benchmarks.bench_student_status --database grade_bench --rows 1000000
+"""
+import argparse
+import random
+import string
+import time
+from typing import Any, Callable, List, Tuple
+
+from db_pool import ConnectionPool, connect_mysql
+from schema import create_tables
+from storage import fetch_failed_students, fetch_top_n, fetch_toppers
+
+MARKS_QUERY: str = "SELECT student_id, name, phone_number, maths, english, sst, science, computer_science FROM student_info"
+
+
+def populate(con: Any, rows: int, batch_size: int = 10000) -> None:
+    """
+    Fills student_info with synthetic students until it holds the requested number of rows.
+    """
+    cur = con.cursor()
+    cur.execute("SELECT COUNT(*) FROM student_info")
+    existing: int = cur.fetchone()[0]
+    if existing >= rows:
+        return
+
+    rng: random.Random = random.Random(42)
+    query: str = """
+        INSERT INTO student_info(student_id, name, phone_number, maths, english, sst, science, computer_science)
+        VALUES(%s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    for start in range(existing, rows, batch_size):
+        batch: List[Tuple[Any, ...]] = []
+        for i in range(start, min(start + batch_size, rows)):
+            name: str = "".join(rng.choice(string.ascii_letters) for _ in range(8))
+            phone: str = "".join(rng.choice(string.digits) for _ in range(10))
+            marks: List[float] = [round(min(100.0, max(0.0, rng.gauss(65, 15))), 1) for _ in range(5)]
+            batch.append(("S{:08d}".format(i), name, phone, *marks))
+        cur.executemany(query, batch)
+        con.commit()
+        print("\rPopulated {} / {} rows".format(min(start + batch_size, rows), rows), end="")
+    print()
+
+
+def legacy_toppers(cur: Any, limit: int) -> List[Tuple[Any, ...]]:
+    # The previous implementation: max() inside the list comprehension is O(n^2)
+    cur.execute(MARKS_QUERY + " ORDER BY student_id LIMIT %s", (limit,))
+    all_students_info: List[Tuple[Any, ...]] = cur.fetchall()
+    student_marks = [(student[0], student[1], sum(student[3:])) for student in all_students_info]
+    return [student for student in student_marks if student[2] == max(student_marks, key=lambda x: x[2])[2]]
+
+
+def legacy_top_n(cur: Any, n: int) -> List[Tuple[Any, ...]]:
+    cur.execute(MARKS_QUERY)
+    all_students_info: List[Tuple[Any, ...]] = cur.fetchall()
+    student_marks = [(student[0], student[1], sum(student[3:])) for student in all_students_info]
+    return sorted(student_marks, key=lambda x: x[2], reverse=True)[:n]
+
+
+def legacy_failed_students(cur: Any) -> List[Tuple[Any, ...]]:
+    cur.execute(MARKS_QUERY)
+    all_students_info: List[Tuple[Any, ...]] = cur.fetchall()
+    return [(student[0], student[1], sum(student[3:])) for student in all_students_info
+            if any(mark < 50 for mark in student[3:])]
+
+
+def timed(label: str, func: Callable[[], Any], repeat: int) -> float:
+    """
+    Runs func repeat times and prints the best wall time.
+    """
+    best: float = float("inf")
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print("{:<45} {:>10.4f}s".format(label, best))
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the student status reports.")
+    parser.add_argument("--database", required=True, help="Scratch database to fill with synthetic students")
+    parser.add_argument("--rows", type=int, default=1000000, help="Number of synthetic students (default 1000000)")
+    parser.add_argument("--n", type=int, default=10, help="N for the top N report (default 10)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (default 3)")
+    parser.add_argument("--legacy-topper-rows", type=int, default=20000,
+                        help="Rows given to the quadratic legacy topper search (default 20000)")
+    args = parser.parse_args()
+
+    pool: ConnectionPool = ConnectionPool(connect=lambda: connect_mysql(args.database), size=1)
+    con = pool.get_connection()
+    cur = con.cursor()
+    create_tables(cur)
+    con.commit()
+    populate(con, args.rows)
+
+    print("\n{:<45} {:>11}".format("Report", "Best time"))
+    print("-------------------------------------------------------------")
+    legacy_rows: int = min(args.legacy_topper_rows, args.rows)
+    timed("topper, legacy ({} rows)".format(legacy_rows), lambda: legacy_toppers(cur, legacy_rows), 1)
+    timed("topper, MAX on total_marks index", lambda: fetch_toppers(cur), args.repeat)
+    timed("top {}, legacy".format(args.n), lambda: legacy_top_n(cur, args.n), args.repeat)
+    timed("top {}, ORDER BY/LIMIT on total_marks index".format(args.n), lambda: fetch_top_n(cur, args.n), args.repeat)
+    timed("failed, legacy", lambda: legacy_failed_students(cur), args.repeat)
+    timed("failed, range scan on lowest_mark index", lambda: fetch_failed_students(cur), args.repeat)
+    print("-------------------------------------------------------------")
+
+    con.close()
+    pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Synthetic student generator. Produces records that pass the add_student validation rules:
+names without digits, 10-digit phone numbers and marks between 0 and 100.
+
+    python -m benchmarks.datagen 100000 students.csv --distribution bimodal
+"""
+import argparse
+import csv
+import json
+import random
+import string
+from typing import Any, Dict, Iterator, List
+
+from grading import STUDENT_FIELDS, SUBJECT_COLUMNS
+
+FIRST_NAMES: List[str] = ["Aarav", "Diya", "Ishaan", "Ananya", "Vihaan", "Saanvi", "Arjun", "Meera", "Kabir", "Riya",
+                          "Rohan", "Priya", "Aditya", "Kavya", "Nikhil", "Sneha", "Rahul", "Pooja", "Sameer", "Tara"]
+LAST_NAMES: List[str] = ["Sharma", "Verma", "Patel", "Reddy", "Iyer", "Nair", "Das", "Mehta", "Gupta", "Rao",
+                         "Singh", "Kumar", "Joshi", "Pillai", "Mishra", "Bose", "Menon", "Kapoor", "Shah", "Sen"]
+
+DISTRIBUTIONS: List[str] = ["normal", "uniform", "bimodal"]
+
+
+def generate_mark(rng: random.Random, distribution: str) -> float:
+    if distribution == "uniform":
+        mark: float = rng.uniform(0, 100)
+    elif distribution == "bimodal":
+        # A weaker and a stronger group of students
+        mark = rng.gauss(42, 10) if rng.random() < 0.3 else rng.gauss(78, 9)
+    else:
+        mark = rng.gauss(65, 15)
+    return round(min(100.0, max(0.0, mark)), 1)
+
+
+def generate_students(count: int, seed: int = 42, distribution: str = "normal", start: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Yields count synthetic student records (dicts with the STUDENT_FIELDS), reproducible for a given seed.
+    Student IDs are S00000000, S00000001, ... starting at start.
+    """
+    rng: random.Random = random.Random(seed)
+    for i in range(start, start + count):
+        record: Dict[str, Any] = {
+            "student_id": "S{:08d}".format(i),
+            "name": "{} {}".format(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)),
+            "phone_number": rng.choice("6789") + "".join(rng.choice(string.digits) for _ in range(9)),
+        }
+        for column in SUBJECT_COLUMNS:
+            record[column] = generate_mark(rng, distribution)
+        yield record
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write synthetic students to a CSV or JSONL file (for bulk_import.py).")
+    parser.add_argument("count", type=int, help="Number of students")
+    parser.add_argument("path", help="Output file (.csv or .jsonl)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="normal", help="Distribution of the marks")
+    args = parser.parse_args()
+
+    students: Iterator[Dict[str, Any]] = generate_students(args.count, args.seed, args.distribution)
+    with open(args.path, "w", newline="", encoding="utf-8") as f:
+        if args.path.endswith((".jsonl", ".json")):
+            for record in students:
+                f.write(json.dumps(record) + "\n")
+        else:
+            writer = csv.DictWriter(f, fieldnames=STUDENT_FIELDS)
+            writer.writeheader()
+            writer.writerows(students)
+
+
+if __name__ == "__main__":
+    main()
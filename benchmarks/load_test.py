@@ -0,0 +1,135 @@
+"""
+Load test of the HTTP read API: client threads, each on its own keep-alive connection, request a mix
+of endpoints for a fixed time, and the throughput, latency percentiles and status codes are reported.
+
+Without --url it starts the API in this process on the configured backend (e.g. backend=sqlite):
+
+    python -m benchmarks.load_test --threads 16 --duration 10
+    python -m benchmarks.load_test --url http://127.0.0.1:8080 --threads 32 --duration 30
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+from benchmarks.run import summarize
+from http_api import GradebookServer
+
+# Share of requests per endpoint; {id} is a random known student
+MIX: List[Tuple[str, int]] = [
+    ("/students/{id}", 40),
+    ("/students/{id}/report-card", 20),
+    ("/students/{id}/rank", 5),
+    ("/average", 10),
+    ("/status/toppers", 5),
+    ("/status/top?n=10", 5),
+    ("/entries?after={id}&limit=50", 10),
+    ("/status/failed?limit=50", 5),
+]
+
+
+def fetch_json(host: str, port: int, path: str) -> Any:
+    con = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        con.request("GET", path)
+        return json.loads(con.getresponse().read())
+    finally:
+        con.close()
+
+
+def client(host: str, port: int, student_ids: List[str], deadline: float, seed: int, use_etags: bool,
+           results: List[Tuple[str, int, float]]) -> None:
+    """
+    Sends requests on one keep-alive connection until the deadline, recording (endpoint, status, seconds).
+    """
+    rng: random.Random = random.Random(seed)
+    paths: List[str] = [path for path, _ in MIX]
+    weights: List[int] = [weight for _, weight in MIX]
+    etags: Dict[str, str] = {}
+    con = http.client.HTTPConnection(host, port, timeout=30)
+    local: List[Tuple[str, int, float]] = []
+    try:
+        while time.perf_counter() < deadline:
+            template: str = rng.choices(paths, weights)[0]
+            path: str = template.replace("{id}", quote(rng.choice(student_ids)))
+            headers: Dict[str, str] = {"If-None-Match": etags[path]} if use_etags and path in etags else {}
+            start: float = time.perf_counter()
+            con.request("GET", path, headers=headers)
+            response = con.getresponse()
+            response.read()
+            local.append((template, response.status, time.perf_counter() - start))
+            if use_etags and response.getheader("ETag"):
+                etags[path] = response.getheader("ETag")
+    finally:
+        con.close()
+        results.extend(local)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the gradebook HTTP API.")
+    parser.add_argument("--url", help="API to test (default: start one in this process on a free port)")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent clients (default 8)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run (default 10)")
+    parser.add_argument("--students", type=int, default=1000, help="Known student IDs to pick from (default 1000)")
+    parser.add_argument("--etags", action="store_true", help="Revalidate with If-None-Match, as a caching client would")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    server: Optional[GradebookServer] = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname or "127.0.0.1", url.port or 80
+    else:
+        server = GradebookServer(("127.0.0.1", 0))
+        host, port = server.server_address[:2]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        student_ids: List[str] = [entry["student_id"] for entry in fetch_json(host, port, "/entries?limit={}".format(
+            max(1, min(args.students, 1000))))["entries"]]
+        if not student_ids:
+            parser.error("The gradebook has no students to request.")
+
+        results: List[Tuple[str, int, float]] = []
+        deadline: float = time.perf_counter() + args.duration
+        threads: List[threading.Thread] = [
+            threading.Thread(target=client, args=(host, port, student_ids, deadline, args.seed + i, args.etags, results))
+            for i in range(max(1, args.threads))]
+        start: float = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed: float = time.perf_counter() - start
+
+        stats: Dict[str, Any] = fetch_json(host, port, "/stats")
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    print("\n{} requests from {} clients in {:.1f}s: {:.0f} requests/sec".format(len(results), args.threads, elapsed, len(results) / elapsed))
+    print("-------------------------------------------------------------")
+    print("{:<32} {:>7} {:>10} {:>10} {:>10}".format("Endpoint", "Calls", "Mean (ms)", "P50 (ms)", "P95 (ms)"))
+    for template, _ in MIX:
+        latencies: List[float] = [seconds for endpoint, _, seconds in results if endpoint == template]
+        if latencies:
+            summary: Dict[str, float] = summarize(latencies)
+            print("{:<32} {:>7} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+                template, summary["calls"], summary["mean"] * 1000, summary["p50"] * 1000, summary["p95"] * 1000))
+    statuses: Dict[int, int] = {}
+    for _, status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print("Status codes: ", dict(sorted(statuses.items())))
+    print("Response cache: ", stats["responses"])
+    print("Connection pool: checkouts {}, connects {}, waits {}".format(
+        stats["pool"]["checkouts"], stats["pool"]["connects"], stats["pool"]["waits"]))
+    print("-------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Benchmark suite: fills a fresh database with synthetic students and times every operation
+of the gradebook API, writing the results as JSON for regression tracking.
+
+Runs offline against the SQLite backend by default:
+
+    python -m benchmarks.run --sizes 1000 100000 1000000 --output bench_results.json
+
+against the in-memory engine (--backend memory), or against a scratch MySQL database (its tables are emptied first):
+
+    python -m benchmarks.run --backend mysql --database grade_bench --sizes 1000 100000
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import gradebook
+from benchmarks.datagen import DISTRIBUTIONS, generate_students
+from db_pool import ConnectionPool, connect_mysql, set_pool
+from grade_queue import GradeQueue
+from grading import SUBJECT_COLUMNS, validate_student_record
+from schema import create_tables
+from sqlite_backend import connect_sqlite
+from storage import BACKENDS, SQLStorage, create_storage, get_storage, set_storage
+from student_cache import get_cache
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """
+    Summary statistics of per-call latencies, in seconds.
+    """
+    ordered: List[float] = sorted(latencies)
+    return {
+        "calls": len(ordered),
+        "total": sum(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "min": ordered[0],
+        "max": ordered[-1],
+    }
+
+
+def measure(func: Callable[[Any], Any], arguments: Sequence[Any]) -> Dict[str, float]:
+    """
+    Calls func once per argument and summarizes the latencies.
+    """
+    latencies: List[float] = []
+    for argument in arguments:
+        start: float = time.perf_counter()
+        func(argument)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def open_backend(args: argparse.Namespace, size: int) -> None:
+    """
+    Points the shared storage (and for the SQL backends the shared pool) at a fresh, empty database for one run.
+    """
+    set_storage(create_storage(args.backend))
+    if args.backend == "memory":
+        return
+    if args.backend == "mysql":
+        connect: Callable[[], Any] = lambda: connect_mysql(args.database)
+        con = connect()
+        cur = con.cursor()
+        create_tables(cur)
+        for table in ("grade_table", "student_info"):
+            cur.execute("DELETE FROM {}".format(table))
+        con.commit()
+    else:
+        path: str = os.path.join(args.workdir, "bench_{}.sqlite3".format(size))
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        connect = lambda: connect_sqlite(path)
+        con = connect()
+        cur = con.cursor()
+        create_tables(cur, "sqlite")
+        con.commit()
+
+    # Empty tables: reset the aggregates to match
+    from aggregates import check_aggregates
+    check_aggregates(cur, rebuild=True)
+    con.commit()
+    con.close()
+
+    set_pool(ConnectionPool(connect=connect, size=args.pool_size))
+
+
+def populate(records: Iterator[Dict[str, Any]], batch_size: int = 10000) -> int:
+    """
+    Loads synthetic students with batched inserts. Returns the number loaded.
+    """
+    loaded: int = 0
+    batch: List[Any] = []
+    for record in records:
+        batch.append(validate_student_record(record))
+        if len(batch) >= batch_size:
+            loaded += get_storage().insert_students(batch)
+            batch = []
+    if batch:
+        loaded += get_storage().insert_students(batch)
+    return loaded
+
+
+def update_batch(updates: List[Any]) -> None:
+    for row in get_storage().update_marks(updates):
+        get_cache().invalidate(row[0])
+
+
+def consume(iterator: Iterator[Any]) -> int:
+    count: int = 0
+    for _ in iterator:
+        count += 1
+    return count
+
+
+def measure_grade_queue(args: argparse.Namespace, size: int, operations: Dict[str, Dict[str, float]],
+                        sample_ids: List[str], new_marks: List[List[float]], batches: List[List[Any]]) -> None:
+    """
+    Times the writes again with the write-behind grade queue on (the *_queued rows), then the flush that
+    brings grade_table up to date. Each write then pays for two journal commits instead of its grade_table writes.
+    """
+    path: str = os.path.join(args.workdir, "bench_grade_queue_{}.db".format(size))
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    queue: GradeQueue = GradeQueue(path)
+    storage = get_storage()
+    set_storage(SQLStorage(args.backend, queue))
+    try:
+        records: List[Dict[str, Any]] = list(generate_students(args.ops, args.seed + 2, args.distribution, start=size + args.ops))
+        operations["insert_queued"] = measure(gradebook.add_student, records)
+        operations["update_queued"] = measure(lambda i: gradebook.update_student(sample_ids[i], marks=new_marks[i]), range(args.ops))
+        operations["update_batch_queued"] = measure(update_batch, batches)
+        operations["remove_queued"] = measure(gradebook.remove_student, [record["student_id"] for record in records])
+    finally:
+        queue.stop()
+        set_storage(storage)
+    # What the stopped worker had not applied yet
+    operations["grade_queue_flush"] = measure(lambda _: queue.flush(), range(1))
+
+
+def run_size(args: argparse.Namespace, size: int) -> Dict[str, Any]:
+    """
+    Runs every operation against a database of the given number of students.
+    """
+    open_backend(args, size)
+    get_cache().clear()
+
+    start: float = time.perf_counter()
+    populate(generate_students(size, args.seed, args.distribution))
+    populate_time: float = time.perf_counter() - start
+
+    rng: random.Random = random.Random(args.seed)
+    sample_ids: List[str] = ["S{:08d}".format(rng.randrange(size)) for _ in range(args.ops)]
+    new_records: List[Dict[str, Any]] = list(generate_students(args.ops, args.seed + 1, args.distribution, start=size))
+    new_marks: List[List[float]] = [[rng.uniform(0, 100) for _ in SUBJECT_COLUMNS] for _ in range(args.ops)]
+    scans: range = range(args.scan_repeat)
+
+    operations: Dict[str, Dict[str, float]] = {}
+    operations["insert"] = measure(gradebook.add_student, new_records)
+    operations["update"] = measure(lambda i: gradebook.update_student(sample_ids[i], marks=new_marks[i]), range(args.ops))
+    # One transaction per batch of update_batch_size students, as bulk_update.py applies them
+    batches: List[List[Any]] = [[(sample_ids[j], new_marks[j]) for j in range(i, min(i + args.update_batch_size, args.ops))]
+                                for i in range(0, args.ops, args.update_batch_size)]
+    operations["update_batch"] = measure(update_batch, batches)
+    operations["report_card"] = measure(gradebook.report_card, sample_ids)
+    operations["average_student"] = measure(gradebook.average, sample_ids)
+    operations["average_all"] = measure(lambda _: gradebook.average(), range(args.ops))
+    operations["topper"] = measure(lambda _: gradebook.toppers(), range(args.ops))
+    operations["top_n"] = measure(lambda _: gradebook.top_n(args.top_n), range(args.ops))
+    operations["failed"] = measure(lambda _: gradebook.failed_students(), scans)
+    operations["display_page"] = measure(lambda student_id: gradebook.entries(after=student_id, limit=args.page_size), sample_ids)
+    operations["display_all"] = measure(lambda _: consume(gradebook.iter_all_entries()), scans)
+    operations["analytics"] = measure(lambda _: gradebook.statistics(), scans)
+    operations["remove"] = measure(gradebook.remove_student, [record["student_id"] for record in new_records])
+    if args.backend != "memory":
+        measure_grade_queue(args, size, operations, sample_ids, new_marks, batches)
+
+    return {"size": size, "populate_seconds": populate_time, "populate_rows_per_sec": size / populate_time,
+            "operations": operations}
+
+
+def print_results(result: Dict[str, Any]) -> None:
+    print("\n{} students (populated in {:.2f}s, {:.0f} rows/sec)".format(
+        result["size"], result["populate_seconds"], result["populate_rows_per_sec"]))
+    print("-------------------------------------------------------------")
+    print("{:<20} {:>7} {:>11} {:>11} {:>11}".format("Operation", "Calls", "Mean (ms)", "P50 (ms)", "P95 (ms)"))
+    for name, summary in result["operations"].items():
+        print("{:<20} {:>7} {:>11.3f} {:>11.3f} {:>11.3f}".format(
+            name, summary["calls"], summary["mean"] * 1000, summary["p50"] * 1000, summary["p95"] * 1000))
+    print("-------------------------------------------------------------")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Time every gradebook operation on synthetic data.")
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite")
+    parser.add_argument("--database", help="Scratch MySQL database (required for --backend mysql; its tables are emptied)")
+    parser.add_argument("--workdir", default=tempfile.gettempdir(), help="Directory for the SQLite databases")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000], help="Numbers of students")
+    parser.add_argument("--ops", type=int, default=200, help="Calls per point operation (default 200)")
+    parser.add_argument("--scan-repeat", type=int, default=3, help="Calls per full-scan operation (default 3)")
+    parser.add_argument("--update-batch-size", type=int, default=50, help="Students per batched update (default 50)")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=1)
+    parser.add_argument("--no-cache", action="store_true", help="Disable the student cache")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="normal")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+    if args.backend == "mysql" and not args.database:
+        parser.error("--database is required for the mysql backend")
+
+    if args.no_cache:
+        get_cache().max_entries = 0
+
+    results: List[Dict[str, Any]] = []
+    for size in args.sizes:
+        result: Dict[str, Any] = run_size(args, size)
+        print_results(result)
+        results.append(result)
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlite": sqlite3.sqlite_version,
+            "cache": not args.no_cache,
+            "pool_size": args.pool_size,
+            "ops": args.ops,
+            "scan_repeat": args.scan_repeat,
+            "distribution": args.distribution,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print("Results written to", args.output)
+
+
+if __name__ == "__main__":
+    main()
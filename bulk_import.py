@@ -0,0 +1,191 @@
+import argparse
+import csv
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import mysql.connector as mq
+
+from student_cache import get_cache
+from grading import STUDENT_FIELDS, validate_student_record
+from ranking import get_rank_index
+from storage import Storage, get_storage
+
+
+def read_records(path: str, file_format: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Streams (line number, record) pairs from a CSV or JSONL file without loading it into memory.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_no, {"__error__": "Invalid JSON: {}".format(e), "__raw__": line.rstrip("\n")}
+                    continue
+                if not isinstance(record, dict):
+                    record = {"__error__": "Expected a JSON object.", "__raw__": line.rstrip("\n")}
+                yield line_no, record
+
+
+def validate_record(record: Dict[str, Any]) -> Tuple[Tuple[Any, ...], Tuple[Any, ...]]:
+    """
+    Validates a record read from the file and returns the student_info and grade_table rows for it.
+    Raises ValueError describing the first problem found.
+    """
+    if "__error__" in record:
+        raise ValueError(record["__error__"])
+    return validate_student_record(record)
+
+
+class RejectWriter:
+    """
+    Writes rejected records along with the reason to a CSV file, opened lazily on the first reject.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.count: int = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, line_no: int, record: Dict[str, Any], error: str) -> None:
+        if self._writer is None:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(['line', 'error', 'record'])
+        raw: str = record.get("__raw__") or json.dumps(record, default=str)
+        self._writer.writerow([line_no, error, raw])
+        self.count += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+def insert_chunk(storage: Storage, chunk: List[Tuple[int, Dict[str, Any], Tuple[Any, ...], Tuple[Any, ...]]],
+                 rejects: RejectWriter) -> int:
+    """
+    Inserts a chunk of validated rows with one Storage.insert_students transaction, which also keeps the
+    aggregates and the change log up to date. If the batch fails, the rows are retried one at a time
+    so only the offending ones are rejected. Returns the number of students inserted.
+    """
+    try:
+        return storage.insert_students([(student_row, grade_row) for _, _, student_row, grade_row in chunk])
+    except mq.Error:
+        pass
+
+    inserted: int = 0
+    for line_no, record, student_row, grade_row in chunk:
+        try:
+            inserted += storage.insert_students([(student_row, grade_row)])
+        except mq.Error as e:
+            rejects.write(line_no, record, str(e))
+    return inserted
+
+
+def import_students(path: str, file_format: Optional[str] = None, batch_size: int = 1000,
+                    reject_path: Optional[str] = None) -> Dict[str, float]:
+    """
+    Imports students from a CSV or JSONL file in chunked, transactional batches.
+    Returns counts and the throughput of the import.
+    """
+    if file_format is None:
+        file_format = 'jsonl' if os.path.splitext(path)[1].lower() in ('.jsonl', '.json') else 'csv'
+    if reject_path is None:
+        reject_path = path + '.rejects.csv'
+
+    rejects: RejectWriter = RejectWriter(reject_path)
+    storage: Storage = get_storage()
+
+    start: float = time.perf_counter()
+    read: int = 0
+    inserted: int = 0
+    seen: Set[str] = set()
+    chunk: List[Tuple[int, Dict[str, Any], Tuple[Any, ...], Tuple[Any, ...]]] = []
+
+    def flush() -> int:
+        # Drop IDs that are already stored, then insert the rest of the chunk
+        taken: Set[str] = storage.existing_ids([student_row[0] for _, _, student_row, _ in chunk])
+        fresh = []
+        for item in chunk:
+            if item[2][0] in taken:
+                rejects.write(item[0], item[1], "Student with ID '{}' already exists.".format(item[2][0]))
+            else:
+                fresh.append(item)
+        count: int = insert_chunk(storage, fresh, rejects) if fresh else 0
+        # These students may be cached as missing in this process
+        for item in fresh:
+            get_cache().invalidate(item[2][0])
+        if count:
+            # Reloaded on next use, rather than working out which rows the fallback inserted
+            get_rank_index().invalidate()
+        chunk.clear()
+        return count
+
+    try:
+        for line_no, record in read_records(path, file_format):
+            read += 1
+            try:
+                student_row, grade_row = validate_record(record)
+            except ValueError as e:
+                rejects.write(line_no, record, str(e))
+                continue
+
+            # Duplicate IDs within the file itself
+            if student_row[0] in seen:
+                rejects.write(line_no, record, "Duplicate student ID '{}' in the file.".format(student_row[0]))
+                continue
+            seen.add(student_row[0])
+
+            chunk.append((line_no, record, student_row, grade_row))
+            if len(chunk) >= batch_size:
+                inserted += flush()
+                print("\r{} rows read, {} inserted, {} rejected".format(read, inserted, rejects.count), end="")
+
+        if chunk:
+            inserted += flush()
+    finally:
+        rejects.close()
+
+    elapsed: float = time.perf_counter() - start
+    return {
+        "read": read,
+        "inserted": inserted,
+        "rejected": rejects.count,
+        "elapsed": elapsed,
+        "rows_per_sec": inserted / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk import students from a CSV or JSONL file.")
+    parser.add_argument("path", help="CSV (with a header row) or JSONL file with the columns: " + ", ".join(STUDENT_FIELDS))
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="File format (inferred from the extension by default)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per insert transaction (default 1000)")
+    parser.add_argument("--rejects", help="File for rejected rows (default <path>.rejects.csv)")
+    args = parser.parse_args()
+
+    result: Dict[str, float] = import_students(args.path, args.format, max(1, args.batch_size), args.rejects)
+
+    print("\n\nIMPORT SUMMARY")
+    print("-------------------------------------------------------------")
+    print("Rows read: ", result["read"])
+    print("Students inserted: ", result["inserted"])
+    print("Rows rejected: ", result["rejected"])
+    print("Elapsed: {:.2f}s ({:.0f} rows/sec)".format(result["elapsed"], result["rows_per_sec"]))
+    if result["rejected"]:
+        print("Rejected rows written to: ", args.rejects or args.path + '.rejects.csv')
+    print("-------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
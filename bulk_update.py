@@ -0,0 +1,141 @@
+import argparse
+import os
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import mysql.connector as mq
+
+from bulk_import import RejectWriter, read_records
+from grading import SUBJECT_COLUMNS, parse_mark
+from ranking import get_rank_index
+from storage import get_storage
+from student_cache import get_cache
+
+UPDATE_FIELDS: List[str] = ['student_id'] + SUBJECT_COLUMNS
+
+
+def validate_update(record: Dict[str, Any]) -> Tuple[str, List[float]]:
+    """
+    Validates a record read from the file and returns the student ID and the new marks in SUBJECTS order.
+    Raises ValueError describing the first problem found.
+    """
+    if "__error__" in record:
+        raise ValueError(record["__error__"])
+    missing: List[str] = [field for field in UPDATE_FIELDS if record.get(field) in (None, '')]
+    if missing:
+        raise ValueError("Missing field(s): {}".format(", ".join(missing)))
+
+    marks: List[float] = []
+    for column in SUBJECT_COLUMNS:
+        try:
+            marks.append(parse_mark(record[column]))
+        except ValueError:
+            raise ValueError("Marks for {} should be a number between 0 and 100.".format(column))
+    return str(record['student_id']).strip(), marks
+
+
+def update_chunk(chunk: List[Tuple[int, Dict[str, Any], str, List[float]]], rejects: RejectWriter) -> int:
+    """
+    Applies a chunk of mark updates in one transaction, rejecting the students that do not exist.
+    If the batch fails, the rows are retried one at a time so only the offending ones are rejected.
+    Returns the number of students updated.
+    """
+    storage = get_storage()
+    failed: Set[str] = set()
+    try:
+        updated: Set[str] = {row[0] for row in storage.update_marks([(student_id, marks) for _, _, student_id, marks in chunk])}
+    except mq.Error:
+        updated = set()
+        for line_no, record, student_id, marks in chunk:
+            try:
+                updated.update(row[0] for row in storage.update_marks([(student_id, marks)]))
+            except mq.Error as e:
+                rejects.write(line_no, record, str(e))
+                failed.add(student_id)
+
+    for line_no, record, student_id, marks in chunk:
+        if student_id in updated:
+            get_cache().invalidate(student_id)
+            get_rank_index().set(student_id, storage.total_marks(marks))
+        elif student_id not in failed:
+            rejects.write(line_no, record, "Student with ID '{}' not found.".format(student_id))
+    return len(updated)
+
+
+def update_students(path: str, file_format: Optional[str] = None, batch_size: int = 1000,
+                    reject_path: Optional[str] = None) -> Dict[str, float]:
+    """
+    Replaces the marks of the students listed in a CSV or JSONL file, in batched transactions
+    that also recompute their grades. Returns counts and the throughput of the update.
+    """
+    if file_format is None:
+        file_format = 'jsonl' if os.path.splitext(path)[1].lower() in ('.jsonl', '.json') else 'csv'
+    if reject_path is None:
+        reject_path = path + '.rejects.csv'
+
+    rejects: RejectWriter = RejectWriter(reject_path)
+    start: float = time.perf_counter()
+    read: int = 0
+    updated: int = 0
+    seen: Set[str] = set()
+    chunk: List[Tuple[int, Dict[str, Any], str, List[float]]] = []
+
+    try:
+        for line_no, record in read_records(path, file_format):
+            read += 1
+            try:
+                student_id, marks = validate_update(record)
+            except ValueError as e:
+                rejects.write(line_no, record, str(e))
+                continue
+
+            # The same student twice in the file is most likely a mistake
+            if student_id in seen:
+                rejects.write(line_no, record, "Duplicate student ID '{}' in the file.".format(student_id))
+                continue
+            seen.add(student_id)
+
+            chunk.append((line_no, record, student_id, marks))
+            if len(chunk) >= batch_size:
+                updated += update_chunk(chunk, rejects)
+                chunk = []
+                print("\r{} rows read, {} updated, {} rejected".format(read, updated, rejects.count), end="")
+
+        if chunk:
+            updated += update_chunk(chunk, rejects)
+    finally:
+        rejects.close()
+
+    elapsed: float = time.perf_counter() - start
+    return {
+        "read": read,
+        "updated": updated,
+        "rejected": rejects.count,
+        "elapsed": elapsed,
+        "updates_per_sec": updated / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk update students' marks from a CSV or JSONL file.")
+    parser.add_argument("path", help="CSV (with a header row) or JSONL file with the columns: " + ", ".join(UPDATE_FIELDS))
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="File format (inferred from the extension by default)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Students per update transaction (default 1000)")
+    parser.add_argument("--rejects", help="File for rejected rows (default <path>.rejects.csv)")
+    args = parser.parse_args()
+
+    result: Dict[str, float] = update_students(args.path, args.format, max(1, args.batch_size), args.rejects)
+
+    print("\n\nUPDATE SUMMARY")
+    print("-------------------------------------------------------------")
+    print("Rows read: ", result["read"])
+    print("Students updated: ", result["updated"])
+    print("Rows rejected: ", result["rejected"])
+    print("Elapsed: {:.2f}s ({:.0f} updates/sec)".format(result["elapsed"], result["updates_per_sec"]))
+    if result["rejected"]:
+        print("Rejected rows written to: ", args.rejects or args.path + '.rejects.csv')
+    print("-------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from db_pool import env_int, get_pool
+from grading import STUDENT_FIELDS
+
+# Operations recorded in the change log
+INSERT: str = "insert"
+UPDATE: str = "update"
+DELETE: str = "delete"
+
+# change_log (created by schema.py) is an append-only record of the writes to student_info, one row per student
+# changed, in commit order. data holds the student's fields after the change as JSON (NULL for a delete);
+# grade_table and the other derived tables follow from them. change_log_state holds the last sequence number handed out.
+
+# Takes the next sequence numbers. The UPDATE locks the counter row until the writer commits, so sequence
+# numbers are handed out and committed in the same order and a reader never sees a later change before an earlier one
+NEXT_SEQ_QUERY: str = "UPDATE change_log_state SET last_seq = last_seq + %s WHERE id = 1"
+LAST_SEQ_QUERY: str = "SELECT last_seq FROM change_log_state WHERE id = 1"
+
+INSERT_CHANGE_QUERY: str = "INSERT INTO change_log (seq, operation, student_id, data) VALUES (%s, %s, %s, %s)"
+
+READ_CHANGES_QUERY: str = "SELECT seq, operation, student_id, data FROM change_log WHERE seq > %s ORDER BY seq LIMIT %s"
+
+# A change as read back: (seq, operation, student_id, student_info row after the change or None)
+Change = Tuple[int, str, str, Optional[Tuple[Any, ...]]]
+
+
+def seed_change_log(cur: Any) -> None:
+    """
+    Seeds the sequence counter of a new change log.
+    """
+    cur.execute("SELECT COUNT(*) FROM change_log_state")
+    if cur.fetchone()[0] == 0:
+        cur.execute("INSERT INTO change_log_state (id, last_seq) VALUES (1, 0)")
+
+
+def change_log_enabled() -> bool:
+    return env_int('change_log', 0) > 0
+
+
+def log_changes(cur: Any, operation: str, student_rows: Sequence[Sequence[Any]]) -> None:
+    """
+    Appends a change per student_info row (the row after the change; for a delete, the removed row) on the
+    caller's cursor, so it commits or rolls back with the change itself. Call it last before committing,
+    as it holds the sequence counter until then.
+    """
+    if not student_rows:
+        return
+    cur.execute(NEXT_SEQ_QUERY, (len(student_rows),))
+    cur.execute(LAST_SEQ_QUERY)
+    first: int = cur.fetchone()[0] - len(student_rows) + 1
+    changes: List[Tuple[Any, ...]] = [
+        (first + i, operation, row[0], None if operation == DELETE else json.dumps(dict(zip(STUDENT_FIELDS[1:], row[1:]))))
+        for i, row in enumerate(student_rows)]
+    if len(changes) == 1:
+        cur.execute(INSERT_CHANGE_QUERY, changes[0])
+    else:
+        cur.executemany(INSERT_CHANGE_QUERY, changes)
+
+
+def read_changes(cur: Any, after: int, limit: int = 1000) -> List[Change]:
+    """
+    Returns up to limit changes with a sequence number above after, oldest first.
+    """
+    cur.execute(READ_CHANGES_QUERY, (after, limit))
+    changes: List[Change] = []
+    for seq, operation, student_id, data in cur.fetchall():
+        fields: Optional[Dict[str, Any]] = json.loads(data) if data is not None else None
+        row: Optional[Tuple[Any, ...]] = (student_id,) + tuple(fields[field] for field in STUDENT_FIELDS[1:]) if fields else None
+        changes.append((seq, operation, student_id, row))
+    return changes
+
+
+def log_bounds(cur: Any) -> Tuple[Optional[int], int]:
+    """
+    Returns the first sequence number still in the log (None if it is empty) and the last one handed out.
+    """
+    cur.execute("SELECT MIN(seq) FROM change_log")
+    first: Optional[int] = cur.fetchone()[0]
+    cur.execute(LAST_SEQ_QUERY)
+    row: Optional[Tuple[Any, ...]] = cur.fetchone()
+    return first, row[0] if row else 0
+
+
+def prune_changes(cur: Any, upto: int) -> int:
+    """
+    Deletes the changes up to and including a sequence number. Replicas behind it re-copy the tables
+    on their next sync. Returns the number of changes deleted.
+    """
+    cur.execute("DELETE FROM change_log WHERE seq <= %s", (upto,))
+    return cur.rowcount
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect or prune the change log.")
+    parser.add_argument("--prune", type=int, metavar="SEQ", help="Delete the changes up to and including SEQ")
+    args = parser.parse_args()
+
+    with get_pool().get_connection() as con:
+        cur = con.cursor()
+        if args.prune is not None:
+            print("Deleted {} changes.".format(prune_changes(cur, args.prune)))
+            con.commit()
+        first, last = log_bounds(cur)
+
+    print("\nCHANGE LOG")
+    print("-------------------------------------------------------------")
+    print("Logging writes: ", "yes" if change_log_enabled() else "no (set change_log=1 to enable it)")
+    print("Last sequence number: ", last)
+    print("Changes kept: ", "{} to {}".format(first, last) if first is not None else "none")
+    print("-------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional
+
+import mysql.connector as mq
+
+import gradebook
+from async_reports import run_dashboard
+from db_pool import pool_stats
+from ranking import get_rank_index
+from student_cache import get_cache
+from grading import STUDENT_FIELDS, SUBJECT_COLUMNS
+
+
+def emit(result: Any, indent: Optional[int]) -> None:
+    # NaN is not valid JSON; undefined figures are returned as None (null)
+    print(json.dumps(result, indent=indent, default=str, allow_nan=False))
+
+
+def read_filters(args: argparse.Namespace) -> Dict[str, Any]:
+    filters: Dict[str, Any] = {}
+    if args.name:
+        filters["name"] = args.name
+    if args.final_grade:
+        filters["final_grade"] = args.final_grade
+    if args.min_percentage is not None:
+        filters["min_percentage"] = args.min_percentage
+    return filters
+
+
+def run(args: argparse.Namespace) -> Any:
+    """
+    Runs the chosen subcommand through the gradebook API and returns its JSON-serializable result.
+    """
+    if args.command == "add":
+        return gradebook.add_student({field: getattr(args, field) for field in STUDENT_FIELDS})
+    if args.command == "update":
+        marks: Optional[List[float]] = None
+        if any(getattr(args, column) is not None for column in SUBJECT_COLUMNS):
+            # Subjects that are not given keep their current marks
+            current: Dict[str, Any] = gradebook.get_student(args.student_id)
+            marks = [current[column] if getattr(args, column) is None else getattr(args, column) for column in SUBJECT_COLUMNS]
+        return gradebook.update_student(args.student_id, args.name, args.phone_number, marks)
+    if args.command == "remove":
+        return gradebook.remove_student(args.student_id)
+    if args.command == "get":
+        return gradebook.get_entry(args.student_id)
+    if args.command == "report-card":
+        return gradebook.report_card(args.student_id)
+    if args.command == "average":
+        return gradebook.average(args.student_id)
+    if args.command == "subjects":
+        return gradebook.subject_report(args.subject)
+    if args.command == "toppers":
+        return gradebook.toppers()
+    if args.command == "top-n":
+        return gradebook.top_n(args.n)
+    if args.command in ("rank", "percentile"):
+        # One lookup is cheaper from the total_marks index than loading the whole ranking into this process
+        get_rank_index().enabled = False
+        if args.command == "rank":
+            return gradebook.rank(args.student_id)
+        return gradebook.percentile_total(args.percentile)
+    if args.command == "failed":
+        return gradebook.failed_students()
+    if args.command == "display":
+        return gradebook.entries(after=args.after, before=args.before, limit=args.limit, filters=read_filters(args))
+    if args.command == "stats":
+        result: Dict[str, Any] = gradebook.statistics()
+        if not args.ranks:
+            result.pop("percentile_ranks", None)
+        return result
+    if args.command == "dashboard":
+        return run_dashboard(args.top_n, args.page_size, args.concurrency, args.timeout)
+    if args.command == "pool-stats":
+        return pool_stats()
+    if args.command == "cache-stats":
+        return get_cache().stats()
+    raise ValueError("Unknown command: {}".format(args.command))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Student Grade Tracker command line interface (JSON output).")
+    parser.add_argument("--indent", type=int, default=None, help="Indent the JSON output")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Add a student")
+    for field in STUDENT_FIELDS:
+        add.add_argument("--" + field.replace("_", "-"), dest=field, required=True)
+
+    update = commands.add_parser("update", help="Update a student's name, phone number or marks")
+    update.add_argument("student_id")
+    update.add_argument("--name")
+    update.add_argument("--phone-number", dest="phone_number")
+    for column in SUBJECT_COLUMNS:
+        update.add_argument("--" + column.replace("_", "-"), dest=column, type=float)
+
+    for name, text in (("remove", "Remove a student and their grades"), ("get", "Show a student"),
+                       ("report-card", "Show a student's report card"), ("rank", "Rank and percentile of a student")):
+        command = commands.add_parser(name, help=text)
+        command.add_argument("student_id")
+
+    average = commands.add_parser("average", help="Average of a student, or of all entries")
+    average.add_argument("student_id", nargs="?")
+
+    subjects = commands.add_parser("subjects", help="Average, standard deviation, range and failures of each subject")
+    subjects.add_argument("--subject", help="Only this subject (name or code, e.g. Maths or computer_science)")
+    commands.add_parser("toppers", help="Topper(s) of the class")
+    top_n = commands.add_parser("top-n", help="Top N students of the class")
+    top_n.add_argument("n", type=int)
+    commands.add_parser("failed", help="Students who have failed")
+    percentile = commands.add_parser("percentile", help="Total marks at a percentile of the class")
+    percentile.add_argument("percentile", type=float, help="Percentile, above 0 and at most 100 (50 gives the median)")
+
+    display = commands.add_parser("display", help="Entries with their grades; --limit pages, --stream writes JSON lines")
+    display.add_argument("--after", help="Entries after this student ID")
+    display.add_argument("--before", help="Entries just before this student ID")
+    display.add_argument("--limit", type=int, help="Maximum number of entries")
+    display.add_argument("--stream", action="store_true", help="Stream every entry as one JSON object per line")
+    display.add_argument("--name", help="Name contains")
+    display.add_argument("--final-grade", dest="final_grade")
+    display.add_argument("--min-percentage", dest="min_percentage", type=float)
+
+    stats = commands.add_parser("stats", help="Class analytics")
+    stats.add_argument("--ranks", action="store_true", help="Include every student's percentile rank")
+
+    dashboard = commands.add_parser("dashboard", help="Average, toppers, top N, failed students and a page of entries, run concurrently")
+    dashboard.add_argument("--top-n", dest="top_n", type=int, default=10)
+    dashboard.add_argument("--page-size", dest="page_size", type=int, default=50)
+    dashboard.add_argument("--concurrency", type=int, help="Reports run at once")
+    dashboard.add_argument("--timeout", type=float, help="Seconds before a report is given up on")
+
+    commands.add_parser("pool-stats", help="Connection pool statistics")
+    commands.add_parser("cache-stats", help="Student cache statistics")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args: argparse.Namespace = build_parser().parse_args(argv)
+    try:
+        if args.command == "display" and args.stream:
+            # JSON lines keep memory flat however many entries there are
+            for entry in gradebook.iter_all_entries(read_filters(args)):
+                print(json.dumps(entry, default=str, allow_nan=False))
+            return 0
+        emit(run(args), args.indent)
+        return 0
+    except gradebook.GradebookError as e:
+        emit({"error": str(e), "type": type(e).__name__}, args.indent)
+        return 1
+    except mq.Error as e:
+        emit({"error": str(e), "type": "DatabaseError"}, args.indent)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import mysql.connector as mq
+from mysql.connector import MySQLConnection
+from dotenv import load_dotenv
+
+from sqlite_backend import connect_sqlite
+
+load_dotenv()
+
+
+def env_int(key: str, default: int) -> int:
+    """
+    Reads an integer setting from the environment, falling back to the default.
+    """
+    value: Optional[str] = os.getenv(key)
+    try:
+        return int(value) if value else default
+    except ValueError:
+        return default
+
+
+def env_float(key: str, default: float) -> float:
+    """
+    Reads a float setting from the environment, falling back to the default.
+    """
+    value: Optional[str] = os.getenv(key)
+    try:
+        return float(value) if value else default
+    except ValueError:
+        return default
+
+
+def connect_mysql(database: Optional[str] = None) -> MySQLConnection:
+    """
+    Opens a new MySQL connection using the credentials from the .env file,
+    optionally to a database other than the configured one.
+    """
+    return mq.connect(
+        host=os.getenv('host'),
+        user=os.getenv('user'),
+        password=os.getenv('password'),
+        database=database or os.getenv('database')
+    )
+
+
+def storage_backend() -> str:
+    """
+    Returns the configured storage backend: mysql (the default), sqlite or memory.
+    """
+    return (os.getenv('backend') or 'mysql').strip().lower()
+
+
+def connect_database() -> Any:
+    """
+    Opens a new connection to the configured backend: the SQLite file named by sqlite_path
+    for the sqlite backend, otherwise the MySQL database.
+    """
+    if storage_backend() == 'sqlite':
+        return connect_sqlite(os.getenv('sqlite_path') or 'student_grades.db')
+    return connect_mysql()
+
+
+class PooledConnection:
+    """
+    Wraps a pooled connection so that close() hands it back to the pool
+    instead of tearing down the TCP connection.
+    """
+
+    def __init__(self, pool: "ConnectionPool", raw: Any) -> None:
+        self._pool = pool
+        self._raw = raw
+
+    def close(self) -> None:
+        # Return the underlying connection to the pool (only once)
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw)
+
+    @property
+    def raw(self) -> Any:
+        """
+        The underlying connection, which outlives this checkout (per-connection state is keyed on it).
+        """
+        if self._raw is None:
+            raise mq.InterfaceError("Connection has already been returned to the pool.")
+        return self._raw
+
+    def __getattr__(self, name: str) -> Any:
+        if self._raw is None:
+            raise mq.InterfaceError("Connection has already been returned to the pool.")
+        return getattr(self._raw, name)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of database connections shared by every operation.
+
+    Connections are health-checked on checkout (a ping, only once they have been
+    idle for ping_interval seconds), evicted after idle_timeout seconds of
+    inactivity and transparently re-opened when they turn out to be dead.
+    """
+
+    def __init__(self, connect: Callable[[], Any] = connect_database, size: int = 5, timeout: float = 30.0,
+                 idle_timeout: float = 300.0, ping_interval: float = 30.0, reconnect_attempts: int = 3) -> None:
+        self._connect = connect
+        self.size: int = max(1, size)
+        self.timeout: float = timeout
+        self.idle_timeout: float = idle_timeout
+        self.ping_interval: float = ping_interval
+        self.reconnect_attempts: int = max(1, reconnect_attempts)
+
+        # Idle connections as (raw connection, time it was returned) pairs, most recent last
+        self._idle: List[Tuple[Any, float]] = []
+        self._in_use: int = 0
+        self._cond = threading.Condition()
+        self._pid: int = os.getpid()
+
+        self._stats: Dict[str, float] = {
+            "checkouts": 0,
+            "connects": 0,
+            "reconnects": 0,
+            "connect_failures": 0,
+            "health_check_failures": 0,
+            "idle_evictions": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "max_wait_time": 0.0,
+        }
+
+    def _open(self) -> Any:
+        """
+        Opens a new raw connection, retrying up to reconnect_attempts times.
+        """
+        last_error: Optional[Exception] = None
+        for attempt in range(self.reconnect_attempts):
+            try:
+                raw = self._connect()
+                with self._cond:
+                    self._stats["connects"] += 1
+                return raw
+            except mq.Error as e:
+                last_error = e
+                with self._cond:
+                    self._stats["connect_failures"] += 1
+                time.sleep(min(0.1 * (2 ** attempt), 1.0))
+        raise last_error
+
+    def _is_healthy(self, raw: Any, idle_since: float) -> bool:
+        """
+        Pings a connection that has been idle for longer than ping_interval.
+        """
+        if time.monotonic() - idle_since < self.ping_interval:
+            return True
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, raw: Any) -> None:
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _reset_after_fork(self) -> None:
+        # Connections must never be shared across processes; start afresh in a child
+        self._idle = []
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+
+    def get_connection(self) -> PooledConnection:
+        """
+        Checks a connection out of the pool, waiting up to timeout seconds if every
+        connection is in use.
+        """
+        if os.getpid() != self._pid:
+            self._reset_after_fork()
+
+        start: float = time.monotonic()
+        with self._cond:
+            waited: bool = False
+            while not self._idle and self._in_use >= self.size:
+                remaining: float = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise mq.PoolError("Timed out waiting for a free database connection.")
+                waited = True
+                self._cond.wait(remaining)
+
+            wait: float = time.monotonic() - start
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+            self._stats["wait_time"] += wait
+            self._stats["max_wait_time"] = max(self._stats["max_wait_time"], wait)
+
+            # Drop connections that sat idle for too long (the oldest are at the front)
+            now: float = time.monotonic()
+            stale: List[Any] = []
+            while self._idle and now - self._idle[0][1] > self.idle_timeout:
+                stale.append(self._idle.pop(0)[0])
+                self._stats["idle_evictions"] += 1
+
+            candidate: Optional[Tuple[Any, float]] = self._idle.pop() if self._idle else None
+            self._in_use += 1
+
+        for raw in stale:
+            self._discard(raw)
+
+        try:
+            if candidate is not None:
+                raw, idle_since = candidate
+                if self._is_healthy(raw, idle_since):
+                    return PooledConnection(self, raw)
+                # Dead connection: replace it with a fresh one
+                with self._cond:
+                    self._stats["health_check_failures"] += 1
+                    self._stats["reconnects"] += 1
+                self._discard(raw)
+            return PooledConnection(self, self._open())
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, raw: Any) -> None:
+        """
+        Returns a connection to the pool, rolling back any transaction left open.
+        """
+        if os.getpid() != self._pid:
+            self._discard(raw)
+            return
+        healthy: bool = True
+        try:
+            if raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            healthy = False
+        if not healthy:
+            self._discard(raw)
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns a snapshot of the pool counters, for sizing the pool.
+        """
+        with self._cond:
+            snapshot: Dict[str, float] = dict(self._stats)
+            snapshot["size"] = self.size
+            snapshot["in_use"] = self._in_use
+            snapshot["idle"] = len(self._idle)
+        checkouts = snapshot["checkouts"]
+        snapshot["avg_wait_time"] = snapshot["wait_time"] / checkouts if checkouts else 0.0
+        return snapshot
+
+    def close_all(self) -> None:
+        """
+        Closes every idle connection held by the pool.
+        """
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for raw, _ in idle:
+            self._discard(raw)
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Returns the process-wide connection pool, creating it from the .env settings on first use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Imported here, as instrumentation reads its settings with the helpers above
+                from instrumentation import get_instrumentation, instrument_connect
+                connect: Callable[[], Any] = connect_database
+                if get_instrumentation().enabled:
+                    connect = instrument_connect(connect_database)
+                _pool = ConnectionPool(
+                    connect=connect,
+                    size=env_int('pool_size', 5),
+                    timeout=env_float('pool_timeout', 30.0),
+                    idle_timeout=env_float('pool_idle_timeout', 300.0),
+                    ping_interval=env_float('pool_ping_interval', 30.0),
+                    reconnect_attempts=env_int('pool_reconnect_attempts', 3)
+                )
+    return _pool
+
+
+def set_pool(pool: ConnectionPool) -> None:
+    """
+    Replaces the process-wide connection pool, e.g. to point every operation at another database.
+    """
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, pool
+    if old is not None:
+        old.close_all()
+
+
+def pool_stats() -> Dict[str, float]:
+    """
+    Returns the statistics of the process-wide connection pool.
+    """
+    return get_pool().stats()
+
+
+def print_pool_stats() -> None:
+    """
+    Prints the connection pool statistics.
+    """
+    stats: Dict[str, float] = pool_stats()
+    print("\nCONNECTION POOL STATISTICS")
+    print("-------------------------------------------------------------")
+    for key, value in stats.items():
+        if isinstance(value, float):
+            print("{:<25} {:.6f}".format(key, value))
+        else:
+            print("{:<25} {}".format(key, value))
+    print("-------------------------------------------------------------")
@@ -0,0 +1,245 @@
+import argparse
+import csv
+import gzip
+import importlib
+import io
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from gradebook import ENTRY_FIELDS
+from grading import STUDENT_FIELDS
+from storage import get_storage
+
+# Compressions each format accepts; the first is the default
+COMPRESSIONS: Dict[str, List[str]] = {
+    "parquet": ["snappy", "zstd", "gzip", "none"],
+    "csv": ["gzip", "zstd", "none"],
+}
+
+CSV_EXTENSIONS: Dict[str, str] = {"gzip": ".csv.gz", "zstd": ".csv.zst", "none": ".csv"}
+
+# Columns stored as text in Parquet; the marks, total and percentage are doubles
+TEXT_FIELDS: List[str] = STUDENT_FIELDS[:3] + ["final_grade"]
+
+# Partition of the entries that have no grade_table row
+NO_GRADE: str = "none"
+
+
+def require(module: str, package: str, purpose: str) -> Any:
+    """
+    Imports an optional dependency, explaining what needs installing if it is missing.
+    """
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        raise ImportError("{} needs the {} package (pip install {}).".format(purpose, package, package)) from e
+
+
+def entry_batches(batch_size: int, filters: Optional[Dict[str, Any]] = None) -> Iterator[List[Tuple[Any, ...]]]:
+    """
+    Streams the entries (student_info joined with grade_table) in student_id order, batch_size at a time.
+    """
+    batch: List[Tuple[Any, ...]] = []
+    for entry in get_storage().iter_entries(filters, batch_size=batch_size):
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class CSVWriter:
+    """
+    Writes entries to a CSV file with a header row, optionally gzip or zstd compressed.
+    """
+
+    def __init__(self, path: str, compression: str = "gzip") -> None:
+        self._raw: Optional[Any] = None
+        if compression == "gzip":
+            self._file = gzip.open(path, 'wt', compresslevel=6, encoding='utf-8', newline='')
+        elif compression == "zstd":
+            zstandard = require("zstandard", "zstandard", "zstd compression")
+            self._raw = open(path, 'wb')
+            self._file = io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(self._raw), encoding='utf-8', newline='')
+        else:
+            self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(ENTRY_FIELDS)
+
+    def write(self, entries: List[Tuple[Any, ...]]) -> None:
+        self._writer.writerows(entries)
+
+    def close(self) -> None:
+        self._file.close()
+        if self._raw is not None:
+            self._raw.close()
+
+
+class ParquetWriter:
+    """
+    Writes entries to a Parquet file, each batch as one Arrow record batch (a row group).
+    """
+
+    def __init__(self, path: str, compression: str = "snappy") -> None:
+        self._pa = require("pyarrow", "pyarrow", "Parquet export")
+        parquet = require("pyarrow.parquet", "pyarrow", "Parquet export")
+        self._schema = self._pa.schema([(field, self._pa.string() if field in TEXT_FIELDS else self._pa.float64())
+                                        for field in ENTRY_FIELDS])
+        self._writer = parquet.ParquetWriter(path, self._schema, compression=None if compression == "none" else compression)
+
+    def write(self, entries: List[Tuple[Any, ...]]) -> None:
+        columns: List[List[Any]] = [list(column) for column in zip(*entries)]
+        self._writer.write_batch(self._pa.record_batch(columns, schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class Export:
+    """
+    Writes entries to one file, or with partition_by_grade to one file per final grade under a
+    directory (final_grade=<grade>/part-00000.<ext>, the Hive layout that analytics tools read as a column).
+
+    Rows are buffered per file up to batch_size, so memory stays bounded by the batch size times the
+    number of grades. Files are written under a .part name and renamed once complete, so readers never
+    see a half-written export.
+    """
+
+    def __init__(self, path: str, file_format: str = "parquet", compression: Optional[str] = None,
+                 partition_by_grade: bool = False, batch_size: int = 10000) -> None:
+        self.path: str = path
+        self.file_format: str = file_format
+        self.compression: str = compression or COMPRESSIONS[file_format][0]
+        if self.compression not in COMPRESSIONS[file_format]:
+            raise ValueError("{} export supports the compressions: {}.".format(file_format, ", ".join(COMPRESSIONS[file_format])))
+        # Fail before reading anything if an optional package is missing
+        if file_format == "parquet":
+            require("pyarrow.parquet", "pyarrow", "Parquet export")
+        elif self.compression == "zstd":
+            require("zstandard", "zstandard", "zstd compression")
+        self.partition_by_grade: bool = partition_by_grade
+        self.batch_size: int = batch_size
+        self.files: List[str] = []
+        # partition -> (writer, final path, buffered rows)
+        self._open: Dict[Optional[str], Tuple[Any, str, List[Tuple[Any, ...]]]] = {}
+
+    def _file_path(self, partition: Optional[str]) -> str:
+        if partition is None:
+            return self.path
+        extension: str = ".parquet" if self.file_format == "parquet" else CSV_EXTENSIONS[self.compression]
+        directory: str = os.path.join(self.path, "final_grade={}".format(partition))
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, "part-00000" + extension)
+
+    def _writer(self, partition: Optional[str]) -> Tuple[Any, str, List[Tuple[Any, ...]]]:
+        if partition not in self._open:
+            path: str = self._file_path(partition)
+            writer_class = ParquetWriter if self.file_format == "parquet" else CSVWriter
+            self._open[partition] = (writer_class(path + ".part", self.compression), path, [])
+        return self._open[partition]
+
+    def write(self, entries: List[Tuple[Any, ...]]) -> None:
+        grade_column: int = ENTRY_FIELDS.index("final_grade")
+        for entry in entries:
+            partition: Optional[str] = (entry[grade_column] or NO_GRADE) if self.partition_by_grade else None
+            writer, _, buffer = self._writer(partition)
+            buffer.append(entry)
+            if len(buffer) >= self.batch_size:
+                writer.write(buffer)
+                buffer.clear()
+
+    def close(self) -> None:
+        """
+        Flushes and closes every file and moves them into place.
+        """
+        if not self.partition_by_grade:
+            # An empty export still gets its file, with just the header or schema
+            self._writer(None)
+        for writer, path, buffer in self._open.values():
+            if buffer:
+                writer.write(buffer)
+                buffer.clear()
+            writer.close()
+            os.replace(path + ".part", path)
+            self.files.append(path)
+        self._open.clear()
+
+    def abort(self) -> None:
+        """
+        Closes and deletes the files of an export that failed.
+        """
+        for writer, path, _ in self._open.values():
+            try:
+                writer.close()
+            finally:
+                if os.path.exists(path + ".part"):
+                    os.remove(path + ".part")
+        self._open.clear()
+
+
+def export_entries(path: str, file_format: str = "parquet", compression: Optional[str] = None,
+                   partition_by_grade: bool = False, batch_size: int = 10000,
+                   progress: Optional[Callable[[int, float], None]] = None) -> Dict[str, Any]:
+    """
+    Streams every entry from the storage into Parquet or CSV files, calling progress (if given) with the
+    rows exported and the seconds elapsed after each batch. Returns the files written, the row count and
+    the throughput of the export.
+    """
+    export: Export = Export(path, file_format, compression, partition_by_grade, batch_size)
+    start: float = time.perf_counter()
+    rows: int = 0
+    try:
+        for batch in entry_batches(batch_size):
+            export.write(batch)
+            rows += len(batch)
+            if progress is not None:
+                progress(rows, time.perf_counter() - start)
+        export.close()
+    except BaseException:
+        export.abort()
+        raise
+
+    elapsed: float = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "files": export.files,
+        "bytes": sum(os.path.getsize(file) for file in export.files),
+        "elapsed": elapsed,
+        "rows_per_sec": rows / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def print_progress(rows: int, elapsed: float) -> None:
+    print("\r{} rows exported ({:.0f} rows/sec)".format(rows, rows / elapsed if elapsed > 0 else 0.0), end="")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export every student with their grades to Parquet or compressed CSV.")
+    parser.add_argument("path", help="Output file, or output directory with --partition-by-grade")
+    parser.add_argument("--format", choices=sorted(COMPRESSIONS), default="parquet", help="File format (default parquet, which needs pyarrow)")
+    parser.add_argument("--compression", choices=["snappy", "zstd", "gzip", "none"],
+                        help="Compression (default snappy for Parquet, gzip for CSV; zstd CSV needs zstandard)")
+    parser.add_argument("--partition-by-grade", action="store_true", help="Write one file per final grade under final_grade=<grade>/ directories")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows fetched and written at a time (default 10000)")
+    args = parser.parse_args()
+
+    try:
+        result: Dict[str, Any] = export_entries(args.path, args.format, args.compression, args.partition_by_grade,
+                                                max(1, args.batch_size), print_progress)
+    except (ImportError, ValueError) as e:
+        parser.error(str(e))
+
+    print("\n\nEXPORT SUMMARY")
+    print("-------------------------------------------------------------")
+    print("Rows exported: ", result["rows"])
+    print("Elapsed: {:.2f}s ({:.0f} rows/sec)".format(result["elapsed"], result["rows_per_sec"]))
+    print("Bytes written: ", result["bytes"])
+    for file in result["files"]:
+        print("Written: ", file)
+    print("-------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import argparse
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import mysql.connector as mq
+
+from db_pool import env_float, env_int, get_pool
+from grading import grade_row
+from storage import INSERT_GRADE_QUERY, fetch_students
+from student_cache import get_cache
+
+# One row per student whose grade_table row needs recomputing; a repeated change bumps the version instead of
+# adding a row, so changes coalesce. queued_at is kept from the first change, for the lag.
+JOURNAL_TABLE: str = '''
+    CREATE TABLE IF NOT EXISTS pending_grades (
+        student_id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        queued_at REAL NOT NULL
+    )
+'''
+
+ENQUEUE_QUERY: str = '''
+    INSERT INTO pending_grades (student_id, version, queued_at) VALUES (?, 1, ?)
+    ON CONFLICT (student_id) DO UPDATE SET version = version + 1
+'''
+
+
+class GradeQueue:
+    """
+    A write-behind queue for grade_table: writers record the IDs of changed students in a local SQLite
+    journal, and a background worker recomputes their grade rows from student_info in batches.
+
+    The worker derives each grade row from the student's current marks, so a change applied twice, or
+    after the student was removed, is harmless. A student changed again while their batch is being
+    applied keeps its journal row (its version moved on) and is recomputed in a later batch.
+    """
+
+    def __init__(self, path: str, batch_size: int = 500, interval: float = 0.5) -> None:
+        self.path: str = path
+        self.batch_size: int = batch_size
+        self.interval: float = interval
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        # One batch at a time in this process, whether from the worker or a flush
+        self._process_lock = threading.Lock()
+        # The counters are updated by the writers' threads and the worker
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Any] = {"enqueued": 0, "processed": 0, "batches": 0, "errors": 0, "last_error": None,
+                                       "last_batch_seconds": 0.0}
+
+    def _journal(self) -> sqlite3.Connection:
+        # sqlite3 connections belong to one thread, so each thread opens its own
+        con: Optional[sqlite3.Connection] = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=30.0)
+            # WAL with synchronous=NORMAL survives a crash of the program (not of the machine) without an fsync per change
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute(JOURNAL_TABLE)
+            con.commit()
+            self._local.con = con
+        return con
+
+    def _record(self, student_ids: Sequence[str]) -> None:
+        now: float = time.time()
+        con: sqlite3.Connection = self._journal()
+        with con:
+            con.executemany(ENQUEUE_QUERY, [(student_id, now) for student_id in student_ids])
+
+    def enqueue(self, student_ids: Sequence[str]) -> None:
+        """
+        Records that the grade rows of these students need recomputing. Call it before committing the
+        change to student_info, so that a crash cannot lose it, and call committed() after the commit.
+        """
+        if not student_ids:
+            return
+        self._record(student_ids)
+        with self._stats_lock:
+            self._stats["enqueued"] += len(student_ids)
+
+    def committed(self, student_ids: Sequence[str]) -> None:
+        """
+        Marks the change to these enqueued students as committed and wakes the worker. A batch that claimed
+        them before the commit read their old student_info rows; this bumps their versions (or queues them
+        again), so their journal rows stay for a later batch.
+        """
+        if not student_ids:
+            return
+        self._record(student_ids)
+        self.start()
+
+    def depth(self) -> Tuple[int, Optional[float]]:
+        """
+        Returns the number of students waiting and how long the oldest has waited, in seconds.
+        """
+        count, oldest = self._journal().execute("SELECT COUNT(*), MIN(queued_at) FROM pending_grades").fetchone()
+        return count, (time.time() - oldest) if oldest is not None else None
+
+    def process_batch(self) -> int:
+        """
+        Recomputes the grade rows of up to batch_size waiting students in one database transaction.
+        Returns the number of students processed.
+        """
+        with self._process_lock:
+            con: sqlite3.Connection = self._journal()
+            claimed: List[Tuple[str, int]] = con.execute(
+                "SELECT student_id, version FROM pending_grades ORDER BY queued_at LIMIT ?", (self.batch_size,)).fetchall()
+            if not claimed:
+                return 0
+
+            start: float = time.perf_counter()
+            student_ids: List[str] = [student_id for student_id, _ in claimed]
+            self._apply(student_ids)
+            # Cached entries hold the grade_table columns read before the batch
+            for student_id in student_ids:
+                get_cache().invalidate(student_id)
+            # Only the journal rows that did not change meanwhile are done
+            with con:
+                con.executemany("DELETE FROM pending_grades WHERE student_id = ? AND version = ?", claimed)
+            with self._stats_lock:
+                self._stats["processed"] += len(claimed)
+                self._stats["batches"] += 1
+                self._stats["last_batch_seconds"] = time.perf_counter() - start
+            return len(claimed)
+
+    def _apply(self, student_ids: List[str]) -> None:
+        # Replaces the grade rows of the batch: a delete, then one insert per student that still exists
+        with get_pool().get_connection() as db:
+            cur = db.cursor()
+            try:
+                # Locked, so that a write committing meanwhile (which queues its students again) cannot be
+                # overwritten with the grade rows of its old marks
+                students: Dict[str, Tuple[Any, ...]] = fetch_students(cur, student_ids, for_update=True)
+                cur.execute("DELETE FROM grade_table WHERE student_id IN ({})".format(", ".join(["%s"] * len(student_ids))), student_ids)
+                if students:
+                    cur.executemany(INSERT_GRADE_QUERY, [grade_row(student) for student in students.values()])
+                db.commit()
+            except mq.Error:
+                db.rollback()
+                raise
+
+    def flush(self, timeout: Optional[float] = None) -> int:
+        """
+        Processes waiting students until the journal is empty (or timeout seconds have passed), so that
+        grade_table is consistent with student_info. Returns the number of students processed.
+        """
+        deadline: Optional[float] = time.monotonic() + timeout if timeout is not None else None
+        processed: int = 0
+        while deadline is None or time.monotonic() < deadline:
+            count: int = self.process_batch()
+            if count == 0:
+                break
+            processed += count
+        return processed
+
+    def start(self) -> None:
+        """
+        Starts the background worker of this process, if it is not running.
+        """
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stop.clear()
+                self._worker = threading.Thread(target=self._run, name="grade-queue", daemon=True)
+                self._worker.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # Changes gather for an interval, so repeated changes to a student coalesce and the batches
+            # stay off the interactive writes' way; then the queue is drained
+            self._wakeup.wait(self.interval)
+            try:
+                while not self._stop.is_set() and self.process_batch() >= self.batch_size:
+                    pass
+            except (mq.Error, sqlite3.Error) as e:
+                # Left in the journal; retried after the interval
+                with self._stats_lock:
+                    self._stats["errors"] += 1
+                    self._stats["last_error"] = str(e)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the queue depth and lag with the worker's counters.
+        """
+        depth, lag = self.depth()
+        with self._stats_lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+        snapshot.update(depth=depth, lag_seconds=lag, worker_running=self._worker is not None and self._worker.is_alive(),
+                        path=self.path)
+        return snapshot
+
+
+def grade_queue_enabled() -> bool:
+    return env_int('grade_queue', 0) > 0
+
+
+_queue: Optional[GradeQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_grade_queue() -> GradeQueue:
+    """
+    Returns the process-wide grade queue, configured from the .env file (grade_queue_path,
+    grade_queue_batch, grade_queue_interval). What is still queued when the program exits is
+    flushed then, for up to grade_queue_exit_flush seconds; the rest stays in the journal.
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = GradeQueue(os.getenv('grade_queue_path') or 'grade_queue.db', env_int('grade_queue_batch', 500),
+                                    env_float('grade_queue_interval', 0.5))
+                atexit.register(_flush_on_exit, _queue)
+    return _queue
+
+
+def _flush_on_exit(queue: GradeQueue) -> None:
+    queue.stop()
+    try:
+        queue.flush(env_float('grade_queue_exit_flush', 10.0))
+    except (mq.Error, sqlite3.Error):
+        pass
+
+
+def print_grade_queue_stats() -> None:
+    """
+    Prints the depth, lag and counters of the grade queue.
+    """
+    print("\nGRADE QUEUE STATISTICS")
+    print("-------------------------------------------------------------")
+    if not grade_queue_enabled():
+        print("The grade queue is disabled; grade_table is written with each change (set grade_queue=1 to enable it).")
+    else:
+        for key, value in get_grade_queue().stats().items():
+            if isinstance(value, float):
+                print("{:<25} {:.4f}".format(key, value))
+            else:
+                print("{:<25} {}".format(key, value))
+    print("-------------------------------------------------------------")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect, flush or run the write-behind grade_table queue.")
+    parser.add_argument("--flush", action="store_true", help="Apply every queued change now, then exit")
+    parser.add_argument("--run", action="store_true", help="Run the worker in the foreground until interrupted")
+    args = parser.parse_args()
+
+    queue: GradeQueue = get_grade_queue()
+    if args.run:
+        print("Applying queued grade changes from {} (Ctrl+C to stop)...".format(queue.path))
+        try:
+            while True:
+                if queue.process_batch() == 0:
+                    time.sleep(queue.interval)
+        except KeyboardInterrupt:
+            pass
+    elif args.flush:
+        start: float = time.perf_counter()
+        processed: int = queue.flush()
+        print("Flushed {} students in {:.2f}s.".format(processed, time.perf_counter() - start))
+
+    depth, lag = queue.depth()
+    print("Queue depth: {}, lag: {}".format(depth, "{:.2f}s".format(lag) if lag is not None else "-"))
+
+
+if __name__ == "__main__":
+    main()
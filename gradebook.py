@@ -0,0 +1,342 @@
+import math
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from aggregates import cumulative_average, subject_statistics
+from analytics import compute_statistics
+from db_pool import get_pool
+from grading import (MAX_MARKS, STUDENT_FIELDS, SUBJECT_COLUMNS, SUBJECTS, calculate_grade, calculate_result,
+                     is_valid_name, is_valid_phone_number, parse_mark, validate_student_record)
+from instrumentation import operation
+from marks import subject_id, subject_record
+from ranking import get_rank_index
+from storage import get_storage
+from student_cache import MISS, get_cache
+
+ENTRY_FIELDS: List[str] = STUDENT_FIELDS + ['final_grade', 'total_marks', 'percentage']
+
+
+class GradebookError(Exception):
+    """
+    Base class for the errors reported by the gradebook operations.
+    """
+
+
+class StudentNotFoundError(GradebookError):
+    def __init__(self, student_id: str) -> None:
+        super().__init__("Student with ID '{}' not found.".format(student_id))
+        self.student_id: str = student_id
+
+
+class DuplicateStudentError(GradebookError):
+    def __init__(self, student_id: str) -> None:
+        super().__init__("Student with ID '{}' already exists.".format(student_id))
+        self.student_id: str = student_id
+
+
+class InvalidRecordError(GradebookError, ValueError):
+    """
+    Raised when a student's details break the validation rules.
+    """
+
+
+def connection() -> Any:
+    """
+    Checks a connection out of the shared pool; use it in a with block to return it.
+    """
+    return get_pool().get_connection()
+
+
+def student_record(row: Sequence[Any]) -> Dict[str, Any]:
+    """
+    Turns a student_info row into a dict keyed by STUDENT_FIELDS.
+    """
+    return dict(zip(STUDENT_FIELDS, row))
+
+
+def student_row(record: Dict[str, Any]) -> Tuple[Any, ...]:
+    """
+    Turns a student dict back into a student_info row.
+    """
+    return tuple(record[field] for field in STUDENT_FIELDS)
+
+
+def cached_entry(student_id: str) -> Optional[Tuple[Any, ...]]:
+    """
+    Read-through lookup of a student's entry (student_info and grade_table columns) in the student cache.
+    Returns None if the student does not exist; that answer is cached too.
+    """
+    cache = get_cache()
+    entry: Any = cache.get(student_id)
+    if entry is not MISS:
+        return entry
+    version: int = cache.version()
+    entry = get_storage().fetch_entry(student_id)
+    cache.put(student_id, entry, version)
+    return entry
+
+
+def _status_records(rows: List[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+    return [{"student_id": row[0], "name": row[1], "total_marks": row[2]} for row in rows]
+
+
+def student_exists(student_id: str) -> bool:
+    return cached_entry(student_id) is not None
+
+
+@operation
+def get_student(student_id: str) -> Dict[str, Any]:
+    """
+    Returns a student's details and marks.
+    """
+    entry: Optional[Tuple[Any, ...]] = cached_entry(student_id)
+    if not entry:
+        raise StudentNotFoundError(student_id)
+    return student_record(entry[:len(STUDENT_FIELDS)])
+
+
+@operation
+def get_entry(student_id: str) -> Dict[str, Any]:
+    """
+    Returns a student's details and marks along with their final grade, total marks and percentage.
+    """
+    entry: Optional[Tuple[Any, ...]] = cached_entry(student_id)
+    if not entry:
+        raise StudentNotFoundError(student_id)
+    return dict(zip(ENTRY_FIELDS, entry))
+
+
+@operation
+def add_student(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validates and adds a student (a dict with the STUDENT_FIELDS), along with their grade_table row.
+    Returns the stored student with their total marks, percentage and final grade.
+    """
+    try:
+        new_student, grade = validate_student_record(record)
+    except ValueError as e:
+        raise InvalidRecordError(str(e))
+
+    storage = get_storage()
+    if not storage.add_student(new_student, grade):
+        raise DuplicateStudentError(new_student[0])
+    # The student may be cached as missing
+    get_cache().invalidate(new_student[0])
+    get_rank_index().set(new_student[0], storage.total_marks(new_student[3:]))
+
+    result: Dict[str, Any] = student_record(new_student)
+    result.update(final_grade=grade[2], total_marks=grade[3], percentage=grade[4])
+    return result
+
+
+@operation
+def update_student(student_id: str, name: Optional[str] = None, phone_number: Optional[str] = None,
+                   marks: Optional[Sequence[Any]] = None) -> Dict[str, Any]:
+    """
+    Updates a student's name, phone number and/or marks (in SUBJECTS order) in one transaction.
+    Returns the updated student.
+    """
+    if name is not None and not is_valid_name(name):
+        raise InvalidRecordError("Name cannot contain digits.")
+    if phone_number is not None and not is_valid_phone_number(phone_number):
+        raise InvalidRecordError("Phone number must be exactly 10 digits.")
+    new_marks: Optional[List[float]] = None
+    if marks is not None:
+        if len(marks) != len(SUBJECTS):
+            raise InvalidRecordError("Expected marks for {} subjects.".format(len(SUBJECTS)))
+        try:
+            new_marks = [parse_mark(mark) for mark in marks]
+        except ValueError:
+            raise InvalidRecordError("Marks should be numbers between 0 and 100.")
+
+    storage = get_storage()
+    existing: Optional[Tuple[Any, ...]] = storage.update_student(student_id, name, phone_number, new_marks)
+    if not existing:
+        raise StudentNotFoundError(student_id)
+    get_cache().invalidate(student_id)
+    if new_marks is not None:
+        get_rank_index().set(student_id, storage.total_marks(new_marks))
+
+    updated: Dict[str, Any] = student_record(existing)
+    if name is not None:
+        updated["name"] = name
+    if phone_number is not None:
+        updated["phone_number"] = phone_number
+    if new_marks is not None:
+        updated.update(zip(SUBJECT_COLUMNS, new_marks))
+    return updated
+
+
+@operation
+def remove_student(student_id: str) -> Dict[str, Any]:
+    """
+    Removes a student and their grades. Returns the removed student.
+    """
+    existing: Optional[Tuple[Any, ...]] = get_storage().remove_student(student_id)
+    if not existing:
+        raise StudentNotFoundError(student_id)
+    get_cache().invalidate(student_id)
+    get_rank_index().remove(student_id)
+    return student_record(existing)
+
+
+@operation
+def report_card(student_id: str) -> Dict[str, Any]:
+    """
+    Returns a student's report card: the marks and grade of each subject and the final result.
+    """
+    student: Dict[str, Any] = get_student(student_id)
+    marks: List[float] = [student[column] for column in SUBJECT_COLUMNS]
+    total_marks, percentage, final_grade = calculate_result(marks)
+    return {
+        "student_id": student["student_id"],
+        "name": student["name"],
+        "phone_number": student["phone_number"],
+        "subjects": [{"subject": subject, "marks": mark, "grade": calculate_grade(mark)}
+                     for subject, mark in zip(SUBJECTS, marks)],
+        "total_marks": total_marks,
+        "max_marks": MAX_MARKS,
+        "percentage": percentage,
+        "final_grade": final_grade,
+    }
+
+
+@operation
+def average(student_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Returns a student's average mark, or without a student_id the cumulative average of all
+    entries with per-subject averages and standard deviations.
+    """
+    if student_id is not None:
+        student: Dict[str, Any] = get_student(student_id)
+        marks: List[float] = [student[column] for column in SUBJECT_COLUMNS]
+        return {"student_id": student_id, "name": student["name"], "average": sum(marks) / len(marks)}
+
+    aggregates: Optional[Dict[str, float]] = get_storage().aggregates()
+    if not aggregates:
+        return {"students": 0, "average": None, "subjects": {}}
+    return {
+        "students": int(aggregates["student_count"]),
+        "average": cumulative_average(aggregates),
+        "subjects": subject_statistics(aggregates),
+    }
+
+
+@operation
+def subject_report(subject: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Returns each subject's student count, average, standard deviation, lowest and highest mark and
+    number of failures, aggregated from the student_info subject columns; with a subject (name or code), just that one.
+    """
+    wanted: Optional[int] = None
+    if subject is not None:
+        wanted = subject_id(subject)
+        if wanted is None:
+            raise InvalidRecordError("Unknown subject '{}'. Expected one of: {}.".format(subject, ", ".join(SUBJECTS)))
+    return [subject_record(row) for row in get_storage().subject_report(wanted)]
+
+
+@operation
+def toppers() -> List[Dict[str, Any]]:
+    """
+    Returns the student(s) with the highest total marks.
+    """
+    return _status_records(get_storage().toppers())
+
+
+@operation
+def top_n(n: int) -> List[Dict[str, Any]]:
+    """
+    Returns the top N students by total marks.
+    """
+    if n <= 0:
+        raise InvalidRecordError("N must be a positive integer.")
+    return _status_records(get_storage().top_n(n))
+
+
+@operation
+def failed_students(after: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Returns the students with at least one mark below 50, by student_id (after a student_id and up to limit of them).
+    """
+    return _status_records(get_storage().failed_students(after, limit))
+
+
+@operation
+def count_failed(after: Optional[str] = None) -> int:
+    """
+    Returns the number of students with at least one mark below 50 (after a student_id).
+    """
+    return get_storage().count_failed(after)
+
+
+def _ranking() -> Any:
+    # The in-process rank index, or the storage's total_marks index when it is disabled
+    index = get_rank_index()
+    return index if index.enabled else get_storage()
+
+
+@operation
+def rank(student_id: str) -> Dict[str, Any]:
+    """
+    Returns a student's rank by total marks (1 is the topper; tied students share a rank) and
+    percentile (the share of students with the same or a lower total).
+    """
+    result: Optional[Tuple[float, int, int]] = _ranking().rank(student_id)
+    if result is None:
+        raise StudentNotFoundError(student_id)
+    total_marks, higher, students = result
+    return {
+        "student_id": student_id,
+        "total_marks": total_marks,
+        "rank": higher + 1,
+        "students": students,
+        "percentile": (students - higher) / students * 100,
+    }
+
+
+@operation
+def percentile_total(percentile: float) -> Dict[str, Any]:
+    """
+    Returns the total marks at a percentile of the class: the lowest total that at least that
+    share of the students have reached or stayed under (50 gives the median total).
+    """
+    if not 0 < percentile <= 100:
+        raise InvalidRecordError("Percentile must be above 0 and at most 100.")
+    ranking = _ranking()
+    students: int = ranking.count_students()
+    if students == 0:
+        return {"percentile": percentile, "total_marks": None, "students": 0}
+    # Position in ascending order, turned into a position from the top
+    position: int = min(students, max(1, math.ceil(percentile / 100 * students))) - 1
+    return {"percentile": percentile, "total_marks": ranking.total_at(students - 1 - position), "students": students}
+
+
+@operation
+def count_students() -> int:
+    return get_storage().count_students()
+
+
+@operation
+def entries(after: Optional[str] = None, before: Optional[str] = None, limit: Optional[int] = None,
+            filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Returns a page of entries (student details with their grade_table row) in student_id order,
+    using keyset pagination: the entries after, or just before, the given student_id.
+    """
+    return [dict(zip(ENTRY_FIELDS, row)) for row in get_storage().iter_entries(filters, after, before, limit)]
+
+
+def iter_all_entries(filters: Optional[Dict[str, Any]] = None, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """
+    Streams every entry in batches (from a server-side cursor on the SQL backends).
+    """
+    for row in get_storage().iter_entries(filters, batch_size=batch_size):
+        yield dict(zip(ENTRY_FIELDS, row))
+
+
+@operation
+def statistics() -> Dict[str, Any]:
+    """
+    Returns the class analytics (see analytics.compute_statistics).
+    """
+    return compute_statistics(*get_storage().load_marks())
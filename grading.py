@@ -0,0 +1,96 @@
+from bisect import bisect_right
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+# Subjects in the order of their columns in student_info
+SUBJECTS: List[str] = ['Maths', 'English', 'SST', 'Science', 'Computer Science']
+SUBJECT_COLUMNS: List[str] = [subject.lower().replace(" ", "_") for subject in SUBJECTS]
+
+# Fields of a student record, in the order of the student_info columns
+STUDENT_FIELDS: List[str] = ['student_id', 'name', 'phone_number'] + SUBJECT_COLUMNS
+
+# Each subject has a maximum of 100 marks
+MAX_MARKS_PER_SUBJECT: int = 100
+MAX_MARKS: int = len(SUBJECTS) * MAX_MARKS_PER_SUBJECT
+
+# Grade bands: a mark below GRADE_BOUNDARIES[i] (and not below the previous one) gets GRADE_LABELS[i]
+GRADE_BOUNDARIES: List[float] = [50, 60, 70, 80, 90]
+GRADE_LABELS: List[str] = ["Fail", "D", "C", "B", "A", "O"]
+
+
+def is_valid_name(name: str) -> bool:
+    """
+    A student's name must not contain any digits.
+    """
+    return not any(char.isdigit() for char in name)
+
+
+def is_valid_phone_number(phone_number: str) -> bool:
+    """
+    A phone number must be exactly 10 digits.
+    """
+    return len(phone_number) == 10 and phone_number.isdigit()
+
+
+def parse_mark(value: Union[str, float]) -> float:
+    """
+    Parses the marks for a subject, raising ValueError unless they are a number between 0 and 100.
+    """
+    mark: float = float(value)
+    if not 0 <= mark <= MAX_MARKS_PER_SUBJECT:
+        raise ValueError("Marks should be between 0 and 100.")
+    return mark
+
+
+def calculate_grade(mark: float) -> str:
+    """
+    Determines the grade based on the given mark
+    (O: 90 and above, A: 80-89, B: 70-79, C: 60-69, D: 50-59, otherwise Fail).
+    """
+    return GRADE_LABELS[bisect_right(GRADE_BOUNDARIES, mark)]
+
+
+def calculate_result(marks: List[float]) -> Tuple[float, float, str]:
+    """
+    Calculates the total marks, percentage and final grade for a student's marks.
+    """
+    total_marks: float = sum(marks)
+    percentage: float = (total_marks / MAX_MARKS) * 100
+    return total_marks, percentage, calculate_grade(percentage)
+
+
+def grade_row(student_row: Sequence[Any]) -> Tuple[Any, ...]:
+    """
+    Derives the grade_table row (student_id, name, final_grade, total_marks, percentage) from a student_info row.
+    """
+    total_marks, percentage, final_grade = calculate_result(list(student_row[3:]))
+    return (student_row[0], student_row[1], final_grade, total_marks, percentage)
+
+
+def validate_student_record(record: Dict[str, Any]) -> Tuple[Tuple[Any, ...], Tuple[Any, ...]]:
+    """
+    Validates a student record (a dict with the STUDENT_FIELDS) with the same rules as add_student
+    and returns the student_info and grade_table rows for it.
+    Raises ValueError describing the first problem found; a field that is blank once stripped counts as missing.
+    """
+    missing: List[str] = [field for field in STUDENT_FIELDS if record.get(field) is None or str(record[field]).strip() == '']
+    if missing:
+        raise ValueError("Missing field(s): {}".format(", ".join(missing)))
+
+    student_id: str = str(record['student_id']).strip()
+    name: str = str(record['name']).strip()
+    phone_number: str = str(record['phone_number']).strip()
+
+    if not is_valid_name(name):
+        raise ValueError("Name cannot contain digits.")
+    if not is_valid_phone_number(phone_number):
+        raise ValueError("Phone number must be exactly 10 digits.")
+
+    marks: List[float] = []
+    for column in SUBJECT_COLUMNS:
+        try:
+            marks.append(parse_mark(record[column]))
+        except ValueError:
+            raise ValueError("Marks for {} should be a number between 0 and 100.".format(column))
+
+    student_row: Tuple[Any, ...] = (student_id, name, phone_number, *marks)
+    return student_row, grade_row(student_row)
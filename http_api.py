@@ -0,0 +1,309 @@
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+
+import mysql.connector as mq
+
+import gradebook
+from changelog import LAST_SEQ_QUERY, change_log_enabled
+from db_pool import env_float, env_int, get_pool, pool_stats, storage_backend
+from gradebook import GradebookError, InvalidRecordError, StudentNotFoundError
+from student_cache import get_cache
+
+# Largest page of entries or failed students a client can ask for
+MAX_PAGE_SIZE: int = 1000
+DEFAULT_PAGE_SIZE: int = 100
+
+# The data a response was computed from: the student cache's version and the change log's last sequence number
+Version = Tuple[int, int]
+
+
+class ResponseCache:
+    """
+    An LRU cache of response bodies with a time-to-live, keyed by request path and query.
+
+    Entries remember the version of the data when they were computed: the student cache's version,
+    which any write made through the gradebook in this process moves on, and with the change log
+    enabled its last sequence number, which the writes of every process move on. A change makes
+    them all stale; without the change log, writes made by other programs are picked up once
+    entries expire (after ttl seconds).
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 5.0) -> None:
+        self.max_entries: int = max_entries
+        self.ttl: float = ttl
+        # key -> (expires_at, version, etag, body)
+        self._entries: "OrderedDict[str, Tuple[float, Version, str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def get(self, key: str, version: Version) -> Optional[Tuple[str, bytes]]:
+        """
+        Returns the (etag, body) cached for a request, or None.
+        """
+        with self._lock:
+            entry: Optional[Tuple[float, Version, str, bytes]] = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic() or entry[1] != version:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[2], entry[3]
+
+    def put(self, key: str, version: Version, body: bytes) -> str:
+        """
+        Caches a response body computed at version and returns its ETag.
+        """
+        etag: str = '"{}"'.format(hashlib.sha1(body).hexdigest()[:20])
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[key] = (time.monotonic() + self.ttl, version, etag, body)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return etag
+
+    def not_modified(self) -> None:
+        with self._lock:
+            self._stats["not_modified"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+            snapshot["size"] = len(self._entries)
+        snapshot["max_entries"] = self.max_entries
+        snapshot["ttl"] = self.ttl
+        lookups: int = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = snapshot["hits"] / lookups if lookups else 0.0
+        return snapshot
+
+
+def change_log_seq() -> int:
+    """
+    Reads the last sequence number of the change log, which every logged write moves on, whatever process makes it.
+    """
+    with get_pool().get_connection() as con:
+        cur = con.cursor()
+        cur.execute(LAST_SEQ_QUERY)
+        row: Optional[Tuple[Any, ...]] = cur.fetchone()
+    return row[0] if row else 0
+
+
+def query_int(query: Dict[str, str], key: str, default: int, maximum: Optional[int] = None) -> int:
+    try:
+        value: int = int(query[key]) if key in query else default
+    except ValueError:
+        raise InvalidRecordError("{} must be an integer.".format(key))
+    if value <= 0:
+        raise InvalidRecordError("{} must be a positive integer.".format(key))
+    return min(value, maximum) if maximum is not None else value
+
+
+def page_link(path: str, query: Dict[str, str], **changes: Any) -> str:
+    # The cursor of the current page is replaced by the given one
+    query = {key: value for key, value in query.items() if key not in ("after", "before")}
+    query.update({key: str(value) for key, value in changes.items()})
+    return path + "?" + urlencode(sorted(query.items()))
+
+
+def entries_page(query: Dict[str, str]) -> Dict[str, Any]:
+    """
+    A page of entries in student_id order (keyset pagination on after/before), with links to the next and previous pages.
+    """
+    limit: int = query_int(query, "limit", DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    filters: Dict[str, Any] = {}
+    if query.get("name"):
+        filters["name"] = query["name"]
+    if query.get("final_grade"):
+        filters["final_grade"] = query["final_grade"]
+    if query.get("min_percentage"):
+        try:
+            filters["min_percentage"] = float(query["min_percentage"])
+        except ValueError:
+            raise InvalidRecordError("min_percentage must be a number.")
+    entries: List[Dict[str, Any]] = gradebook.entries(after=query.get("after"), before=query.get("before"),
+                                                      limit=limit, filters=filters)
+    return {
+        "entries": entries,
+        "next": page_link("/entries", query, after=entries[-1]["student_id"], limit=limit) if len(entries) == limit else None,
+        "previous": page_link("/entries", query, before=entries[0]["student_id"], limit=limit) if entries else None,
+    }
+
+
+def failed_page(query: Dict[str, str]) -> Dict[str, Any]:
+    """
+    A page of the failed students after a student_id, with the number of them from there on.
+    """
+    limit: int = query_int(query, "limit", DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    after: Optional[str] = query.get("after")
+    page: List[Dict[str, Any]] = gradebook.failed_students(after, limit)
+    total: int = gradebook.count_failed(after)
+    return {
+        "students": page,
+        "total": total,
+        "next": page_link("/status/failed", query, after=page[-1]["student_id"], limit=limit) if page and total > limit else None,
+    }
+
+
+def percentile(query: Dict[str, str]) -> Dict[str, Any]:
+    try:
+        p: float = float(query.get("p", ""))
+    except ValueError:
+        raise InvalidRecordError("p must be a number.")
+    return gradebook.percentile_total(p)
+
+
+# (path pattern, handler taking the path groups and the query); every route is read-only
+ROUTES: List[Tuple[Pattern[str], Callable[..., Any]]] = [
+    (re.compile(r"^/students/([^/]+)$"), lambda query, student_id: gradebook.get_entry(student_id)),
+    (re.compile(r"^/students/([^/]+)/report-card$"), lambda query, student_id: gradebook.report_card(student_id)),
+    (re.compile(r"^/students/([^/]+)/average$"), lambda query, student_id: gradebook.average(student_id)),
+    (re.compile(r"^/students/([^/]+)/rank$"), lambda query, student_id: gradebook.rank(student_id)),
+    (re.compile(r"^/average$"), lambda query: gradebook.average()),
+    (re.compile(r"^/subjects$"), lambda query: gradebook.subject_report(query.get("subject"))),
+    (re.compile(r"^/status/toppers$"), lambda query: gradebook.toppers()),
+    (re.compile(r"^/status/top$"), lambda query: gradebook.top_n(query_int(query, "n", 10, MAX_PAGE_SIZE))),
+    (re.compile(r"^/status/failed$"), failed_page),
+    (re.compile(r"^/status/percentile$"), percentile),
+    (re.compile(r"^/entries$"), entries_page),
+]
+
+
+class GradebookHandler(BaseHTTPRequestHandler):
+    """
+    Serves the gradebook read operations as JSON, through the response cache.
+    """
+
+    # Keep-alive, so that a client reuses its connection
+    protocol_version: str = "HTTP/1.1"
+    # The headers and body go out as two writes; without TCP_NODELAY the second waits for a delayed ACK (~40ms)
+    disable_nagle_algorithm: bool = True
+    server: "GradebookServer"
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        query: Dict[str, str] = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path == "/health":
+            self.send_json(200, {"status": "ok"})
+            return
+        if url.path == "/stats":
+            self.send_json(200, {"responses": self.server.responses.stats(), "pool": pool_stats(), "student_cache": get_cache().stats()})
+            return
+
+        for pattern, handler in ROUTES:
+            match = pattern.match(url.path)
+            if match:
+                break
+        else:
+            self.send_json(404, {"error": "No such endpoint: {}".format(url.path)})
+            return
+
+        key: str = url.path + "?" + urlencode(sorted(query.items()))
+        try:
+            # Taken before reading, so a write during the read leaves the result uncached
+            version: Version = self.server.data_version()
+        except mq.Error as e:
+            self.send_json(503, {"error": "Database error: {}".format(e)})
+            return
+        cached: Optional[Tuple[str, bytes]] = self.server.responses.get(key, version)
+        if cached is None:
+            try:
+                result: Any = handler(query, *(unquote(group) for group in match.groups()))
+            except StudentNotFoundError as e:
+                self.send_json(404, {"error": str(e)})
+                return
+            except GradebookError as e:
+                self.send_json(400, {"error": str(e)})
+                return
+            except mq.Error as e:
+                self.send_json(503, {"error": "Database error: {}".format(e)})
+                return
+            body: bytes = json.dumps(result, default=str).encode('utf-8')
+            cached = (self.server.responses.put(key, version, body), body)
+
+        etag, body = cached
+        if self.headers.get("If-None-Match") == etag:
+            self.server.responses.not_modified()
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "max-age={:.0f}".format(self.server.responses.ttl))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_body(200, body, etag)
+
+    def send_json(self, status: int, result: Any) -> None:
+        self.send_body(status, json.dumps(result, default=str).encode('utf-8'))
+
+    def send_body(self, status: int, body: bytes, etag: Optional[str] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "max-age={:.0f}".format(self.server.responses.ttl))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class GradebookServer(ThreadingHTTPServer):
+    """
+    A thread per client connection; every thread reads through the shared connection pool,
+    so clients need no database credentials and open no database connections of their own.
+    """
+
+    daemon_threads: bool = True
+
+    def __init__(self, address: Tuple[str, int], responses: Optional[ResponseCache] = None, verbose: bool = False) -> None:
+        super().__init__(address, GradebookHandler)
+        self.responses: ResponseCache = responses or ResponseCache(env_int('http_cache_size', 1000), env_float('http_cache_ttl', 5.0))
+        self.verbose: bool = verbose
+        # Check the change log on each request, so that writes made by other programs invalidate the responses
+        self.follow_change_log: bool = change_log_enabled() and storage_backend() != "memory"
+        self._last_seq: int = 0
+        self._seq_lock = threading.Lock()
+
+    def data_version(self) -> Version:
+        """
+        The version of the data the responses are computed from. When the change log has moved on, the
+        student cache is cleared too, as its entries would otherwise outlive the writes of other programs.
+        """
+        if self.follow_change_log:
+            seq: int = change_log_seq()
+            with self._seq_lock:
+                if seq != self._last_seq:
+                    self._last_seq = seq
+                    get_cache().clear()
+        return get_cache().version(), self._last_seq
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the gradebook's read operations as a JSON HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=env_int('http_port', 8080), help="Port (default http_port, or 8080)")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    server: GradebookServer = GradebookServer((args.host, args.port), verbose=args.verbose)
+    print("Serving the gradebook on http://{}:{}/ (Ctrl+C to stop)".format(*server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+import atexit
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache, wraps
+from typing import Any, Callable, Dict, IO, Iterator, List, Optional, Sequence
+
+from db_pool import env_float, env_int
+
+# Upper bounds of the latency histogram buckets in milliseconds; one more bucket holds everything slower
+BUCKET_BOUNDS_MS: List[float] = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# Statements shown in the summary, by total time
+SUMMARY_STATEMENTS: int = 20
+
+
+class LatencyHistogram:
+    """
+    Counts latencies in fixed buckets (BUCKET_BOUNDS_MS), along with the rows and bytes they moved.
+    Percentiles are read from the buckets, so they are upper bounds at the bucket resolution.
+    """
+
+    def __init__(self) -> None:
+        self.buckets: List[int] = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+        self.rows: int = 0
+        self.bytes: int = 0
+
+    def add(self, seconds: float, rows: int = 0, size: int = 0) -> None:
+        self.buckets[bisect_left(BUCKET_BOUNDS_MS, seconds * 1000)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.rows += rows
+        self.bytes += size
+
+    def percentile(self, q: float) -> float:
+        """
+        Returns the q-th percentile (0-100) in milliseconds.
+        """
+        if not self.count:
+            return 0.0
+        rank: float = q / 100 * self.count
+        seen: int = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                bound: float = BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else float("inf")
+                return min(bound, self.max * 1000)
+        return self.max * 1000
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total * 1000 / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max * 1000,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "buckets": {("<={}".format(bound) if i < len(BUCKET_BOUNDS_MS) else ">{}".format(BUCKET_BOUNDS_MS[-1])): count
+                        for i, (bound, count) in enumerate(zip(BUCKET_BOUNDS_MS + [None], self.buckets)) if count},
+        }
+
+
+@lru_cache(maxsize=1024)
+def normalize(statement: str) -> str:
+    """
+    Reduces a statement to its shape, so that the same query groups together: whitespace is collapsed
+    and IN lists of any length become IN (...).
+    """
+    statement = " ".join(statement.split())
+    return re.sub(r"IN \((?:%s, )*%s\)", "IN (...)", statement)
+
+
+def value_size(value: Any) -> int:
+    """
+    Estimated size in bytes of a value on the wire.
+    """
+    if value is None:
+        return 1
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    return 8
+
+
+def rows_size(rows: Sequence[Sequence[Any]]) -> int:
+    return sum(value_size(value) for row in rows for value in row)
+
+
+class Instrumentation:
+    """
+    Collects per-operation and per-statement latency histograms and writes statements slower than
+    slow_query_ms to the slow-query log (a file, or stderr when no path is given).
+    """
+
+    def __init__(self, enabled: bool = False, slow_query_ms: float = 100.0, slow_query_log: Optional[str] = None) -> None:
+        self.enabled: bool = enabled
+        self.slow_query_ms: float = slow_query_ms
+        self.slow_query_log: Optional[str] = slow_query_log
+        self._lock = threading.Lock()
+        self._operations: Dict[str, LatencyHistogram] = {}
+        self._statements: Dict[str, LatencyHistogram] = {}
+        self._slow_queries: int = 0
+
+    def record_operation(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._operations.setdefault(name, LatencyHistogram()).add(seconds)
+
+    def record_statement(self, statement: str, seconds: float, rows: int = 0, size: int = 0, params: Any = None) -> None:
+        key: str = normalize(statement)
+        with self._lock:
+            self._statements.setdefault(key, LatencyHistogram()).add(seconds, rows, size)
+            slow: bool = seconds * 1000 >= self.slow_query_ms
+            if slow:
+                self._slow_queries += 1
+        if slow:
+            self._log_slow(key, seconds, rows, params)
+
+    def _log_slow(self, statement: str, seconds: float, rows: int, params: Any) -> None:
+        params_text: str = repr(params)
+        if len(params_text) > 200:
+            params_text = params_text[:197] + "..."
+        line: str = "{} {:.1f}ms rows={} {} params={}\n".format(
+            datetime.now().isoformat(timespec="milliseconds"), seconds * 1000, rows, statement, params_text)
+        with self._lock:
+            if self.slow_query_log:
+                with open(self.slow_query_log, "a", encoding="utf-8") as f:
+                    f.write(line)
+            else:
+                sys.stderr.write("SLOW QUERY " + line)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns the histograms of every operation and statement.
+        """
+        with self._lock:
+            return {
+                "operations": {name: histogram.snapshot() for name, histogram in self._operations.items()},
+                "statements": {statement: histogram.snapshot() for statement, histogram in self._statements.items()},
+                "slow_queries": self._slow_queries,
+                "slow_query_ms": self.slow_query_ms,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._operations.clear()
+            self._statements.clear()
+            self._slow_queries = 0
+
+
+class InstrumentedCursor:
+    """
+    Wraps a cursor to time each statement: execute plus the fetches of its results, with the rows
+    and (estimated) bytes fetched. A statement is recorded when its results run out, when the
+    cursor runs the next statement or when the cursor is closed.
+    """
+
+    def __init__(self, cur: Any, instrumentation: Instrumentation) -> None:
+        self._cur = cur
+        self._instrumentation = instrumentation
+        self._statement: Optional[str] = None
+        self._params: Any = None
+        self._elapsed: float = 0.0
+        self._rows: int = 0
+        self._bytes: int = 0
+
+    def _finish(self) -> None:
+        if self._statement is not None:
+            statement, self._statement = self._statement, None
+            self._instrumentation.record_statement(statement, self._elapsed, self._rows, self._bytes, self._params)
+
+    def _start(self, statement: str, params: Any, elapsed: float) -> None:
+        self._statement, self._params, self._elapsed, self._rows, self._bytes = statement, params, elapsed, 0, 0
+
+    def execute(self, query: str, params: Any = None, *args: Any, **kwargs: Any) -> Any:
+        self._finish()
+        start: float = time.perf_counter()
+        try:
+            return self._cur.execute(query, params, *args, **kwargs)
+        finally:
+            self._start(query, params, time.perf_counter() - start)
+
+    def executemany(self, query: str, seq_params: Any, *args: Any, **kwargs: Any) -> Any:
+        self._finish()
+        start: float = time.perf_counter()
+        try:
+            return self._cur.executemany(query, seq_params, *args, **kwargs)
+        finally:
+            self._start(query, "<{} rows>".format(len(seq_params)), time.perf_counter() - start)
+            self._finish()
+
+    def _fetched(self, start: float, rows: Sequence[Any]) -> None:
+        self._elapsed += time.perf_counter() - start
+        self._rows += len(rows)
+        self._bytes += rows_size(rows)
+
+    def fetchone(self) -> Any:
+        start: float = time.perf_counter()
+        row = self._cur.fetchone()
+        self._fetched(start, [row] if row is not None else [])
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size: int = 1) -> List[Any]:
+        start: float = time.perf_counter()
+        rows = self._cur.fetchmany(size)
+        self._fetched(start, rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self) -> List[Any]:
+        start: float = time.perf_counter()
+        rows = self._cur.fetchall()
+        self._fetched(start, rows)
+        self._finish()
+        return rows
+
+    def __iter__(self) -> Iterator[Any]:
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self) -> Any:
+        self._finish()
+        return self._cur.close()
+
+    def __del__(self) -> None:
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cur, name)
+
+
+class InstrumentedConnection:
+    """
+    Wraps a connection so that its cursors are instrumented and commits are timed.
+    """
+
+    def __init__(self, con: Any, instrumentation: Instrumentation) -> None:
+        self._con = con
+        self._instrumentation = instrumentation
+
+    def cursor(self, *args: Any, **kwargs: Any) -> InstrumentedCursor:
+        return InstrumentedCursor(self._con.cursor(*args, **kwargs), self._instrumentation)
+
+    def commit(self) -> None:
+        start: float = time.perf_counter()
+        try:
+            self._con.commit()
+        finally:
+            self._instrumentation.record_statement("COMMIT", time.perf_counter() - start)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._con, name)
+
+
+def instrument_connect(connect: Callable[[], Any], instrumentation: Optional["Instrumentation"] = None) -> Callable[[], Any]:
+    """
+    Wraps a connect function so that connection setup is timed (as the "connect" operation)
+    and the connections it opens are instrumented.
+    """
+    def instrumented_connect() -> InstrumentedConnection:
+        recorder: Instrumentation = instrumentation or get_instrumentation()
+        start: float = time.perf_counter()
+        try:
+            return InstrumentedConnection(connect(), recorder)
+        finally:
+            recorder.record_operation("connect", time.perf_counter() - start)
+    return instrumented_connect
+
+
+def operation(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Decorator that records the latency of every call under the function's name.
+    When instrumentation is disabled it costs one attribute check per call.
+    """
+    name: str = func.__name__
+
+    @wraps(func)
+    def timed_call(*args: Any, **kwargs: Any) -> Any:
+        instrumentation: Instrumentation = get_instrumentation()
+        if not instrumentation.enabled:
+            return func(*args, **kwargs)
+        start: float = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            instrumentation.record_operation(name, time.perf_counter() - start)
+    return timed_call
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """
+    Records the latency of a block of code (e.g. rendering a table) as an operation.
+    """
+    instrumentation: Instrumentation = get_instrumentation()
+    if not instrumentation.enabled:
+        yield
+        return
+    start: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        instrumentation.record_operation(name, time.perf_counter() - start)
+
+
+_instrumentation: Optional[Instrumentation] = None
+_instrumentation_lock = threading.Lock()
+
+
+def get_instrumentation() -> Instrumentation:
+    """
+    Returns the process-wide instrumentation, configured from the .env file: instrument (1 enables it),
+    slow_query_ms and slow_query_log. When enabled, the summary is written to stderr at exit.
+    """
+    global _instrumentation
+    if _instrumentation is None:
+        with _instrumentation_lock:
+            if _instrumentation is None:
+                instrumentation = Instrumentation(env_int('instrument', 0) > 0, env_float('slow_query_ms', 100.0),
+                                                  os.getenv('slow_query_log') or None)
+                if instrumentation.enabled:
+                    atexit.register(print_instrumentation, sys.stderr)
+                _instrumentation = instrumentation
+    return _instrumentation
+
+
+def print_instrumentation(file: IO[str] = sys.stdout) -> None:
+    """
+    Prints the operation and statement latencies collected so far.
+    """
+    instrumentation: Instrumentation = get_instrumentation()
+    print("\nQUERY INSTRUMENTATION", file=file)
+    print("-------------------------------------------------------------", file=file)
+    if not instrumentation.enabled:
+        print("Instrumentation is disabled; set instrument=1 in the .env file to enable it.", file=file)
+        print("-------------------------------------------------------------", file=file)
+        return
+
+    summary: Dict[str, Any] = instrumentation.summary()
+    print("{:<22} {:>7} {:>10} {:>10} {:>10} {:>10}".format("Operation", "Calls", "Mean (ms)", "P50 (ms)", "P95 (ms)", "Max (ms)"), file=file)
+    for name, stats in sorted(summary["operations"].items(), key=lambda item: -item[1]["total_ms"]):
+        print("{:<22} {:>7} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+            name[:22], stats["count"], stats["mean_ms"], stats["p50_ms"], stats["p95_ms"], stats["max_ms"]), file=file)
+
+    print("\n{:>7} {:>11} {:>10} {:>10} {:>9} {:>11}  {}".format("Calls", "Total (ms)", "Mean (ms)", "P95 (ms)", "Rows", "Bytes", "Statement"), file=file)
+    statements = sorted(summary["statements"].items(), key=lambda item: -item[1]["total_ms"])
+    for statement, stats in statements[:SUMMARY_STATEMENTS]:
+        print("{:>7} {:>11.2f} {:>10.2f} {:>10.2f} {:>9} {:>11}  {}".format(
+            stats["count"], stats["total_ms"], stats["mean_ms"], stats["p95_ms"], stats["rows"], stats["bytes"],
+            statement if len(statement) <= 80 else statement[:77] + "..."), file=file)
+    if len(statements) > SUMMARY_STATEMENTS:
+        print("... and {} more statements".format(len(statements) - SUMMARY_STATEMENTS), file=file)
+
+    print("\nSlow queries (>= {:g} ms): {}{}".format(
+        summary["slow_query_ms"], summary["slow_queries"],
+        ", logged to " + instrumentation.slow_query_log if instrumentation.slow_query_log and summary["slow_queries"] else ""), file=file)
+    print("-------------------------------------------------------------", file=file)
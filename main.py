@@ -2,19 +2,28 @@ import mysql.connector as mq
 from tabulate import tabulate
 from mysql.connector import MySQLConnection
 from typing import Optional
-import os
 from dotenv import load_dotenv
-from typing import List, Tuple, Any
+from typing import List
+from db_pool import get_pool, print_pool_stats
+from student_cache import print_cache_stats
+from instrumentation import print_instrumentation, timed
+from grade_queue import get_grade_queue, grade_queue_enabled, print_grade_queue_stats
+from paged_display import browse_entries
+from storage import get_storage
+from analytics import print_statistics
+from report_cards import render_report_card
+import gradebook
+from gradebook import GradebookError
+from grading import SUBJECTS, SUBJECT_COLUMNS, is_valid_name, is_valid_phone_number, parse_mark
 load_dotenv()
 
 def get_database_connection() -> Optional[MySQLConnection]:
+    """
+    Checks a connection out of the shared connection pool.
+    Calling close() on it returns it to the pool.
+    """
     try:
-        con: MySQLConnection = mq.connect(               
-            host=os.getenv('host'),
-            user=os.getenv('user'),
-            password=os.getenv('password'),
-            database=os.getenv('database')
-        )
+        con: MySQLConnection = get_pool().get_connection()
         return con
     except mq.Error as e:
         print("Error connecting to the database:", e)
@@ -23,7 +32,7 @@ def get_database_connection() -> Optional[MySQLConnection]:
 def menu() -> None:
     print("\n\t\t\t\tSTUDENT GRADE TRACKER\n\n")
     print("\t\t\t\t\tMAIN MENU\n")
-    print("\t\t1. Add Student\t\t\t\t 2. Update Student \n\n\t\t3. Remove Student\t\t\t 4. Add grade\n\n\t\t5. Calculate Average\t\t\t6. Status\n\n\t\t7. Display\t\t\t\t8. Exit")
+    print("\t\t1. Add Student\t\t\t\t 2. Update Student \n\n\t\t3. Remove Student\t\t\t 4. Add grade\n\n\t\t5. Calculate Average\t\t\t6. Status\n\n\t\t7. Display\t\t\t\t8. Exit\n\n\t\t9. Connection Pool Stats\t\t10. Analytics\n\n\t\t11. Cache Stats\t\t\t\t12. Query Stats\n\n\t\t13. Grade Queue")
 
 
 def add_student() -> None:
@@ -33,16 +42,10 @@ def add_student() -> None:
 
     print("\n\t\t\t\tADD NEW STUDENT")
 
-    con = get_database_connection()
-    if not con:
-        print("Failed to connect to the database.")
-        return
-    cur = con.cursor()
-
     # Get the student's name ensuring it does not contain any digits
     while True:
         name: str = input("Enter Student's Name: ")
-        if any(char.isdigit() for char in name):
+        if not is_valid_name(name):
             print("Name cannot contain digits. Please enter a valid name.")
         else:
             break
@@ -50,13 +53,7 @@ def add_student() -> None:
     # Get a unique student ID ensuring it does not already exist in the database
     while True:
         student_id: str = input("Enter Student's ID: ")
-        query: str = "SELECT * FROM student_info WHERE student_id=%s"
-        cur.execute(query, (student_id,))
-
-        # Fetch the first result from the executed query, which should correspond to the student with the given ID
-        existing_student = cur.fetchone()
-
-        if existing_student:
+        if gradebook.student_exists(student_id):
             print(f"Student with ID '{student_id}' already exists.")
         else:
             break
@@ -64,65 +61,33 @@ def add_student() -> None:
     # Get the student's phone number ensuring it is exactly 10 digits
     while True:
         phone_number: str = input("Enter Student's Phone Number: ")
-        if len(phone_number) != 10 or not phone_number.isdigit():
+        if not is_valid_phone_number(phone_number):
             print("Phone number must be exactly 10 digits. Please re-enter.")
         else:
             break
 
     # Get the student's marks for each subject
-    subjects: list[str] = ['Maths', 'English', 'SST', 'Science', 'Computer Science']
     marks: list[float] = []
-    for subject in subjects:
+    for subject in SUBJECTS:
         while True:
             try:
                 mark: float = float(input(f"Enter marks for {subject} (out of 100): "))
-                if 0 <= mark <= 100:
-                    marks.append(mark)
-                    break
-                else:
-                    print("Marks should be between 0 and 100. Please re-enter.")
             except ValueError:
                 print("Invalid input. Please enter a valid number.")
+                continue
+            try:
+                marks.append(parse_mark(mark))
+                break
+            except ValueError:
+                print("Marks should be between 0 and 100. Please re-enter.")
 
-    # Calculate total marks and percentage
-    total_marks: float = sum(marks)
-    max_marks: int = len(subjects) * 100   # each subject has a maximum of 100 marks
-    percentage: float = (total_marks / max_marks) * 100
-
-    # Calculate final grade
-    if percentage >= 90:
-        final_grade: str = "O"
-    elif percentage >= 80:
-        final_grade = "A"
-    elif percentage >= 70:
-        final_grade = "B"
-    elif percentage >= 60:
-        final_grade = "C"
-    elif percentage >= 50:
-        final_grade = "D"
-    else:
-        final_grade = "Fail"
-
-    # Insert into student_info table
-    query = """
-    INSERT INTO student_info(student_id, name, phone_number, maths, english, sst, science, computer_science) 
-    VALUES(%s, %s, %s, %s, %s, %s, %s, %s)
-    """
-    cur.execute(query, (student_id, name, phone_number, marks[0], marks[1], marks[2], marks[3], marks[4]))
-
-    # Insert into grade_table
-    query = """
-    INSERT INTO grade_table(student_id, name, final_grade, total_marks, percentage) 
-    VALUES(%s, %s, %s, %s, %s)
-    """
-    cur.execute(query, (student_id, name, final_grade, total_marks, percentage))
-
-    # Commit the changes to the database
-    con.commit()
-    print("\nSuccessfully Added The Student!")
-
-    # Close the database connection
-    con.close()
+    # Insert into student_info and grade_table, with the total marks, percentage and final grade
+    record: dict = dict(zip(SUBJECT_COLUMNS, marks), student_id=student_id, name=name, phone_number=phone_number)
+    try:
+        gradebook.add_student(record)
+        print("\nSuccessfully Added The Student!")
+    except (GradebookError, mq.Error) as e:
+        print("An error occurred: ", e)
 
 
 
@@ -131,128 +96,80 @@ def student_update() -> None:
     Updates student details in the database based on user input.
     """
     print("\n\t\t\t\tUPDATE STUDENT DETAILS")
-    con: mq.connection.MySQLConnection = get_database_connection()
-    cur: mq.cursor.MySQLCursor = con.cursor()
 
     # Get the student ID for the student to be updated
     student_id: str = input("Enter Student's ID to update: ")
 
-    # Query to fetch the student's current details
-    query: str = "SELECT * FROM student_info WHERE student_id='{}'".format(student_id)
-    cur.execute(query)
-    existing_student: Optional[Tuple[Any, ...]] = cur.fetchone()
-
-    if existing_student:
+    try:
+        # Fetch the student's current details
+        existing_student: dict = gradebook.get_student(student_id)
+    except GradebookError as e:
+        # If the student ID does not exist in the database
+        print(e)
+        return
 
-        # Display the current details of the student
-        print("Student found. Current details:")
-        print("Name:", existing_student[1])
-        print("Phone Number:", existing_student[2])
+    # Display the current details of the student
+    print("Student found. Current details:")
+    print("Name:", existing_student["name"])
+    print("Phone Number:", existing_student["phone_number"])
 
-        # Prompt the user to choose what they want to update
-        print("\nWhat do you want to update?")
-        print("1. Name")
-        print("2. Phone Number")
-        print("3. Marks for subjects")
-        choice: str = input("Enter your choice (1/2/3): ")
+    # Prompt the user to choose what they want to update
+    print("\nWhat do you want to update?")
+    print("1. Name")
+    print("2. Phone Number")
+    print("3. Marks for subjects")
+    choice: str = input("Enter your choice (1/2/3): ")
 
+    try:
         if choice == '1':
 
             # Update the student's name
             new_name: str = input("Enter new name: ")
-            update_query: str = "UPDATE student_info SET name='{}' WHERE student_id='{}'".format(new_name, student_id)
-            cur.execute(update_query)
-            con.commit()
+            gradebook.update_student(student_id, name=new_name)
             print("Name updated successfully.")
 
         elif choice == '2':
 
             # Update the student's phone number
             new_phone_number: str = input("Enter new phone number: ")
-            update_query: str = "UPDATE student_info SET phone_number='{}' WHERE student_id='{}'".format(new_phone_number, student_id)
-            cur.execute(update_query)
-            con.commit()
+            gradebook.update_student(student_id, phone_number=new_phone_number)
             print("Phone number updated successfully.")
 
         elif choice == '3':
 
             # Update the student's marks for each subject
-            subjects: List[str] = ['Maths', 'English', 'SST', 'Science', 'Computer Science']
-            for i, subject in enumerate(subjects, start=1):
-                new_mark: float = float(input("Enter new marks for {}: ".format(subject)))
-                update_query: str = "UPDATE student_info SET {}={} WHERE student_id='{}'".format(subject.lower().replace(" ", "_"), new_mark, student_id)
-                cur.execute(update_query)
-                con.commit()
+            new_marks: List[float] = [float(input("Enter new marks for {}: ".format(subject))) for subject in SUBJECTS]
+            gradebook.update_student(student_id, marks=new_marks)
             print("Marks updated successfully.")
 
         else:
             print("Invalid choice. Please enter a valid option.")
-
-    else:
-
-        # If the student ID does not exist in the database
-        print("Student with ID '{}' not found.".format(student_id))
-
-    # Close the database connection    
-    con.close()
+    except (GradebookError, mq.Error) as e:
+        print("An error occurred: ", e)
 
 def remove_student() -> None:
     """
     Removes a student and their corresponding grades from the database.
     """
     print("\n\t\t\t\tREMOVE STUDENT")
-    con: mq.connection.MySQLConnection = get_database_connection()
-    cur: mq.cursor.MySQLCursor = con.cursor()
 
     student_id: str = input("Enter Student's ID to remove: ")
-    query: str = "SELECT * FROM student_info WHERE student_id=%s"
-    cur.execute(query, (student_id,))
-    existing_student: tuple = cur.fetchone()
-
-    if existing_student:
-        confirm: str = input("Are you sure you want to remove student '{}'? (yes/no): ".format(existing_student[1]))
-        if confirm.lower() == 'yes':
-            try:
-                # Delete from grade_table
-                delete_grades_query: str = "DELETE FROM grade_table WHERE student_id=%s"
-                cur.execute(delete_grades_query, (student_id,))
-                
-                # Delete from student_info
-                delete_student_query: str = "DELETE FROM student_info WHERE student_id=%s"
-                cur.execute(delete_student_query, (student_id,))
-                
-                # Commit the transaction
-                con.commit()
-                
-                print("Student '{}' removed successfully along with their grades.".format(existing_student[1]))
-            except mq.Error as e:
-                # Rollback in case of error
-                con.rollback()
-                print("An error occurred: ", e)
-        else:
-            print("Removal canceled.")
-    else:
-        print("Student with ID '{}' not found.".format(student_id))
-
-    con.close()
-
-def calculate_grade(mark: float) -> str:
-    """
-    Determines the grade based on the given mark.
-    """
+    try:
+        existing_student: dict = gradebook.get_student(student_id)
+    except GradebookError as e:
+        print(e)
+        return
 
-    if mark >= 90:
-        return "O"
-    elif mark >= 80:
-        return "A"
-    elif mark >= 70:
-        return "B"
-    elif mark >= 60:
-        return "C"
-    elif mark >= 50:
-        return "D"
+    confirm: str = input("Are you sure you want to remove student '{}'? (yes/no): ".format(existing_student["name"]))
+    if confirm.lower() == 'yes':
+        try:
+            # Delete from grade_table and student_info in one transaction
+            gradebook.remove_student(student_id)
+            print("Student '{}' removed successfully along with their grades.".format(existing_student["name"]))
+        except (GradebookError, mq.Error) as e:
+            print("An error occurred: ", e)
     else:
-        return "Fail"
+        print("Removal canceled.")
 
 def add_grade() -> None:
     """
@@ -261,156 +178,106 @@ def add_grade() -> None:
     """
 
     print("\n\t\t\t\tGENERATE REPORT CARD")
-    con: mq.connection.MySQLConnection = get_database_connection()
-    cur: mq.cursor.MySQLCursor = con.cursor()
 
     # Prompt the user to enter the student's ID for whom the report card needs to be generated
     student_id: str = input("Enter Student's ID to generate report card: ")
 
-    # Query to fetch the student's details from the database
-    query: str = "SELECT * FROM student_info WHERE student_id='{}'".format(student_id)
-    cur.execute(query)
-    student_info: Tuple[Any, ...] = cur.fetchone()
-
-    # Check if the student information is found
-    if student_info:
-
-        # Print the header of the report card
-        print("\nREPORT CARD")
-        print("-------------------------------------------------------------")
-        print("Name: ", student_info[1])
-        print("Student ID: ", student_info[0])
-        print("Phone Number: ", student_info[2])
-        print("-------------------------------------------------------------")
-        print("{:<20} {:<10} {:<10}".format("Subject", "Marks", "Grade"))
-        print("-------------------------------------------------------------")
-
-        subjects: List[str] = ['Maths', 'English', 'SST', 'Science', 'Computer Science']
-        total_marks: float = 0
-
-        # Iterate over each subject, calculate the grade and total marks
-        for subject in subjects:
-            mark: float = student_info[subjects.index(subject) + 3]  # Adjust index for marks columns
-            grade: str = calculate_grade(mark)
-            total_marks += mark
-
-            # Print the marks and grade for each subject
-            print("{:<20} {:<10} {:<10}".format(subject, mark, grade))
-
-        print("-------------------------------------------------------------")
-        print("Total Marks Received: ", total_marks)
-        max_marks: int = len(subjects) * 100  # Each subject has a maximum of 100 marks
-        print("Maximum Marks: ", max_marks)
-        percentage: float = (total_marks / max_marks) * 100
-        print("Final Percentage: {:.2f}%".format(percentage))
-        final_grade: str = calculate_grade(percentage)
-        print("Final Grade: ", final_grade)
-        print("-------------------------------------------------------------")
-    else:
+    try:
+        # Fetch the student's details from the database
+        student_info: dict = gradebook.get_student(student_id)
+    except GradebookError as e:
         # If the student ID is not found in the database, display an error message
-        print("Student with ID '{}' not found.".format(student_id))
-    
-    con.close()
+        print(e)
+        return
+
+    # Print the report card, with the marks, grade of each subject and the final grade
+    print("\n" + render_report_card(gradebook.student_row(student_info)), end="")
 
 def calculate_average() -> None:
     """
     Calculates and prints the average marks for either a single student or all students cumulatively.
     """    
     print("\n\t\t\t\tCALCULATE AVERAGE")
-    con: mq.connection.MySQLConnection = get_database_connection()
-    cur: mq.cursor.MySQLCursor = con.cursor()
 
-    choice: str = input("Calculate average for (1) Single student or (2) All entries cumulatively? (Enter 1 or 2): ")
+    choice: str = input("Calculate average for (1) Single student, (2) All entries cumulatively or (3) One subject? (Enter 1, 2 or 3): ")
 
     if choice == '1':
         # If the user chooses to calculate average for a single student
         student_id: str = input("Enter Student's ID to calculate average: ")
 
-        # Query to fetch the student's details from the database
-        query: str = "SELECT * FROM student_info WHERE student_id='{}'".format(student_id)
-        cur.execute(query)
-        student_info: Optional[Tuple[Any, ...]] = cur.fetchone()
-
-        # Check if the student information is found
-        if student_info:
-            # Calculate the total marks by summing up the marks columns
-            total_marks: float = sum(student_info[3:])  
-
-            # Calculate the number of subjects by subtracting the non-marks columns (3)
-            subjects_count: int = len(student_info) - 3  
-
-            # Calculate the average marks
-            average: float = total_marks / subjects_count
-
+        try:
+            result: dict = gradebook.average(student_id)
             # Print the average marks for the student
-            print("Average for student '{}' (ID: {}) is: {:.2f}".format(student_info[1], student_id, average))
-        else:
-            print("Student with ID '{}' not found.".format(student_id))
+            print("Average for student '{}' (ID: {}) is: {:.2f}".format(result["name"], student_id, result["average"]))
+        except GradebookError as e:
+            print(e)
 
     elif choice == '2':
 
-        # If the user chooses to calculate the cumulative average for all students
-        cur.execute("SELECT * FROM student_info")
-        all_students_info: List[Tuple[Any, ...]] = cur.fetchall()
-        total_marks: float = 0
-        total_subjects_count: int = 0
+        # If the user chooses to calculate the cumulative average for all students,
+        # read it from the maintained aggregates instead of scanning every student
+        result = gradebook.average()
 
-        # Iterate over all students' information
-        for student_info in all_students_info:
+        if result["average"] is not None:
+            # Print the cumulative average marks for all students
+            print("Cumulative average for all entries is: {:.2f}".format(result["average"]))
 
-            # Sum the total marks for all students
-            total_marks += sum(student_info[3:])
-            # Sum the total number of subjects for all students
-            total_subjects_count += len(student_info) - 3
+            # Print the average and standard deviation of each subject
+            print("{:<20} {:<10} {:<10}".format("Subject", "Average", "Std Dev"))
+            for subject, statistics in result["subjects"].items():
+                print("{:<20} {:<10.2f} {:<10.2f}".format(subject, statistics["average"], statistics["std_dev"]))
+        else:
+            print("No entries found in the database.")
 
-        if total_subjects_count > 0:
-            # Calculate the cumulative average marks
-            average: float = total_marks / total_subjects_count
-            # Print the cumulative average marks for all students
-            print("Cumulative average for all entries is: {:.2f}".format(average))
+    elif choice == '3':
+        # Aggregated over just that subject's column of student_info
+        subject: str = input("Enter the subject ({}): ".format(", ".join(SUBJECTS)))
+        try:
+            report: List[dict] = gradebook.subject_report(subject)
+        except GradebookError as e:
+            print(e)
+            return
+        if report:
+            print("{:<20} {:<10} {:<10} {:<10} {:<10} {:<10}".format("Subject", "Average", "Std Dev", "Lowest", "Highest", "Failed"))
+            for row in report:
+                print("{:<20} {:<10.2f} {:<10.2f} {:<10.2f} {:<10.2f} {:<10}".format(
+                    row["subject"], row["average"], row["std_dev"], row["min"], row["max"], row["failed"]))
         else:
             print("No entries found in the database.")
-    con.close()
 
 def get_student_status() -> None:
     """
     Retrieves and displays the status of students based on the user's choice.
     """
 
-    con: mq.connection.MySQLConnection = get_database_connection()
-    cur: mq.cursor.MySQLCursor = con.cursor()
     print("\n\t\t\t\tSTUDENT STATUS")
 
     print("Choose an option:")
     print("1. Get the topper(s) of the class")
     print("2. Get the top N students of the class")
     print("3. Get the list of students who have failed")
+    print("4. Get a student's rank and percentile")
+    print("5. Get the total marks at a percentile")
 
-    choice: str = input("Enter your choice (1/2/3): ")
+    choice: str = input("Enter your choice (1/2/3/4/5): ")
 
     if choice == '1':
-        cur.execute("SELECT * FROM student_info")
-        all_students_info: list[tuple] = cur.fetchall()
-
-        if all_students_info:
-            # Calculate total marks for each student and find the maximum
-            student_marks: list[tuple] = [(student[0], student[1], sum(student[3:])) for student in all_students_info]
-            # Find all students with the maximum total marks (in case of ties)
-            toppers: list[tuple] = [student for student in student_marks if student[2] == max(student_marks, key=lambda x: x[2])[2]]
-
-            if len(toppers) == 1:
-                # If there is a single topper, display their information
-                print("The topper of the class is:")
-                print("Student ID:", toppers[0][0])
-                print("Name:", toppers[0][1])
-                print("Total Marks:", toppers[0][2])
-            else:
-                # If there are multiple toppers, display their information
-                print("The toppers of the class are:")
-                for topper in toppers:
-                    print("Student ID:", topper[0])
-                    print("Name:", topper[1])
-                    print("Total Marks:", topper[2])
+        # Find all students with the maximum total marks (in case of ties)
+        toppers: List[dict] = gradebook.toppers()
+
+        if len(toppers) == 1:
+            # If there is a single topper, display their information
+            print("The topper of the class is:")
+            print("Student ID:", toppers[0]["student_id"])
+            print("Name:", toppers[0]["name"])
+            print("Total Marks:", toppers[0]["total_marks"])
+        elif toppers:
+            # If there are multiple toppers, display their information
+            print("The toppers of the class are:")
+            for topper in toppers:
+                print("Student ID:", topper["student_id"])
+                print("Name:", topper["name"])
+                print("Total Marks:", topper["total_marks"])
         else:
             print("No entries found in the database.")
 
@@ -421,68 +288,102 @@ def get_student_status() -> None:
             if n <= 0:
                 print("Please enter a positive integer value for N.")
             else:
-                cur.execute("SELECT * FROM student_info")
-                all_students_info: list[tuple] = cur.fetchall()
-
-                if all_students_info:
-                    # Calculate total marks for each student 
-                    student_marks: list[tuple] = [(student[0], student[1], sum(student[3:])) for student in all_students_info]
-
-                    # Sort students by total marks in descending order
-                    sorted_students: list[tuple] = sorted(student_marks, key=lambda x: x[2], reverse=True)
+                top_students: List[dict] = gradebook.top_n(n)
 
+                if top_students:
                     print("Top {} students of the class are:".format(n))
 
                     # Display information for the top N students
-                    for i in range(min(n, len(sorted_students))):
-                        print("Student ID:", sorted_students[i][0])
-                        print("Name:", sorted_students[i][1])
-                        print("Total Marks:", sorted_students[i][2])
+                    for student in top_students:
+                        print("Student ID:", student["student_id"])
+                        print("Name:", student["name"])
+                        print("Total Marks:", student["total_marks"])
                 else:
                     print("No entries found in the database.")
         except ValueError:
             print("Invalid input. Please enter a valid integer value for N.")
 
     elif choice == '3':
-        # Option 3: Get the list of students who have failed
-        cur.execute("SELECT * FROM student_info")
-        all_students_info: list[tuple] = cur.fetchall()
-
-        if all_students_info:
-            # Filter students who have failed (at least one mark less than 50)
-            failed_students: list[tuple] = [(student[0], student[1], sum(student[3:])) for student in all_students_info if any(mark < 50 for mark in student[3:])]
-
-            if failed_students:
-                print("The following students have failed:")
-                for student in failed_students:
-                    print("Student ID:", student[0])
-                    print("Name:", student[1])
-                    print("Total Marks:", student[2])
-            else:
-                print("No students have failed.")
+        # Option 3: Get the list of students who have failed (at least one mark less than 50)
+        failed_students: List[dict] = gradebook.failed_students()
+
+        if failed_students:
+            print("The following students have failed:")
+            for student in failed_students:
+                print("Student ID:", student["student_id"])
+                print("Name:", student["name"])
+                print("Total Marks:", student["total_marks"])
+        elif gradebook.count_students():
+            print("No students have failed.")
         else:
             print("No entries found in the database.")
-        con.close()
 
+    elif choice == '4':
+        # Option 4: Rank of a student, looked up in the maintained ranking rather than by sorting the class
+        student_id: str = input("Enter Student's ID to get their rank: ")
+        try:
+            result: dict = gradebook.rank(student_id)
+            print("Student ID:", result["student_id"])
+            print("Total Marks:", result["total_marks"])
+            print("Rank: {} of {}".format(result["rank"], result["students"]))
+            print("Percentile: {:.2f}".format(result["percentile"]))
+        except GradebookError as e:
+            print(e)
+
+    elif choice == '5':
+        # Option 5: Total marks at a percentile of the class (50 gives the median)
+        try:
+            result = gradebook.percentile_total(float(input("Enter the percentile (e.g. 90): ")))
+            if result["total_marks"] is not None:
+                print("Total marks at the {:g}th percentile: {}".format(result["percentile"], result["total_marks"]))
+            else:
+                print("No entries found in the database.")
+        except ValueError:
+            print("Invalid input. Please enter a number.")
+        except GradebookError as e:
+            print(e)
+
+
+def read_display_filters() -> dict:
+    """
+    Prompts for the optional filters of the page-by-page display.
+    """
+    filters: dict = {}
+    name: str = input("Filter by name containing (leave blank for all): ").strip()
+    if name:
+        filters["name"] = name
+    final_grade: str = input("Filter by final grade (leave blank for all): ").strip()
+    if final_grade:
+        filters["final_grade"] = final_grade
+    min_percentage: str = input("Minimum percentage (leave blank for all): ").strip()
+    if min_percentage:
+        try:
+            filters["min_percentage"] = float(min_percentage)
+        except ValueError:
+            print("Invalid percentage, ignoring this filter.")
+    return filters
 
 def display_entries() -> None:
     """
     Retrieves and displays all student entries from the database, including their grades, total marks, and percentage.
+    Entries can be shown as one grid, or streamed page by page with optional filters.
     """
-    con: mq.connection.MySQLConnection = get_database_connection()
-    cur: mq.cursor.MySQLCursor = con.cursor()
+    choice: str = input("Display (1) All entries as a grid or (2) Page by page? (Enter 1 or 2): ")
 
-    # query to select student information and their corresponding grades from the database by using LEFT JOIN
-    query: str = '''
-        SELECT si.student_id, si.name AS student_name, si.phone_number, si.maths, si.english, si.sst, si.science, si.computer_science,
-               gt.final_grade, gt.total_marks, gt.percentage
-        FROM student_info si
-        LEFT JOIN grade_table gt ON si.student_id = gt.student_id
-    '''
-    cur.execute(query)
+    if choice == '2':
+        # Stream the entries from the storage backend, one page at a time
+        try:
+            page_size: int = int(input("Entries per page: "))
+        except ValueError:
+            page_size = 20
+        try:
+            browse_entries(get_storage(), max(1, page_size), read_display_filters())
+        except mq.Error as e:
+            print("Error connecting to the database:", e)
+        return
 
-    # Fetch all results from the executed query
-    entries: List[Tuple] = cur.fetchall()
+    # Fetch the student information and their corresponding grades
+    entries: List[dict] = gradebook.entries()
 
     if entries:
         # Define headers for the table display
@@ -490,10 +391,28 @@ def display_entries() -> None:
                    "Final Grade", "Total Marks", "Percentage"]
         
         # Print the entries in a tabular format using tabulate
-        print(tabulate(entries, headers=headers, tablefmt="grid"))
+        with timed("render_entries"):
+            print(tabulate([list(entry.values()) for entry in entries], headers=headers, tablefmt="grid"))
     else:
         print("No entries found.")
 
+def class_analytics() -> None:
+    """
+    Displays class-wide statistics computed in one vectorized pass over all marks.
+    """
+    print("\n\t\t\t\tCLASS ANALYTICS")
+    student_id: str = input("Enter a Student's ID to show their percentile rank (leave blank to skip): ").strip()
+    print_statistics(gradebook.statistics(), student_id or None)
+
+def grade_queue_status() -> None:
+    """
+    Displays the depth and lag of the write-behind grade queue and offers to flush it.
+    """
+    print_grade_queue_stats()
+    if grade_queue_enabled() and input("Apply every queued grade change now? (y/n): ").strip().lower() == 'y':
+        processed: int = get_grade_queue().flush()
+        print("{} students' grades brought up to date.".format(processed))
+
 def main() -> None:
     while True:
         menu()
@@ -515,6 +434,16 @@ def main() -> None:
                 display_entries()
             elif ch == 8:
                 exit()
+            elif ch == 9:
+                print_pool_stats()
+            elif ch == 10:
+                class_analytics()
+            elif ch == 11:
+                print_cache_stats()
+            elif ch == 12:
+                print_instrumentation()
+            elif ch == 13:
+                grade_queue_status()
             else:
                 print("PLEASE CHOOSE THE CORRECT CHOICE AND TRY AGAIN!!")
         except ValueError:
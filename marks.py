@@ -0,0 +1,145 @@
+import argparse
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from db_pool import get_pool
+from grading import MAX_MARKS_PER_SUBJECT, SUBJECT_COLUMNS, SUBJECTS
+
+# The subjects catalog: (subject_id, code, name, max_marks); IDs follow the order of SUBJECTS and never change
+SUBJECT_CATALOG: List[Tuple[int, str, str, float]] = [
+    (i + 1, column, subject, MAX_MARKS_PER_SUBJECT) for i, (column, subject) in enumerate(zip(SUBJECT_COLUMNS, SUBJECTS))
+]
+SUBJECT_IDS: List[int] = [subject_id for subject_id, _, _, _ in SUBJECT_CATALOG]
+
+# student_marks (created by schema.py) has one row per student and subject; its primary key serves a student's
+# marks, idx_student_marks_subject_mark a subject's. It is a copy of the student_info subject columns, made and
+# refreshed by the migration below: those columns remain the source of truth, and writes do not maintain the copy.
+
+# The figures of one student_info subject column: students, sum, sum of squares, min, max and failed
+SUBJECT_FIGURES: str = "COUNT({0}), SUM({0}), SUM({0} * {0}), MIN({0}), MAX({0}), SUM(CASE WHEN {0} < 50 THEN 1 ELSE 0 END)"
+
+# Copies one subject's column of student_info into student_marks
+MIGRATE_SUBJECT_QUERY: str = '''
+    INSERT INTO student_marks (student_id, subject_id, mark)
+    SELECT student_id, %s, {0} FROM student_info WHERE {0} IS NOT NULL
+'''
+
+# Marks that differ from the student_info columns, or belong to no student
+MISMATCHED_MARKS_QUERY: str = '''
+    SELECT COUNT(*) FROM student_marks m
+    LEFT JOIN student_info si ON si.student_id = m.student_id
+    WHERE si.student_id IS NULL OR m.mark <> CASE m.subject_id {} END
+'''.format(" ".join("WHEN {} THEN si.{}".format(subject_id, column) for subject_id, column, _, _ in SUBJECT_CATALOG))
+
+
+def subject_id(subject: str) -> Optional[int]:
+    """
+    Looks up a subject's ID by its name or code (case-insensitive), or returns None.
+    """
+    wanted: str = subject.strip().lower()
+    for subject_id, code, name, _ in SUBJECT_CATALOG:
+        if wanted in (code, name.lower()):
+            return subject_id
+    return None
+
+
+def fetch_subject_report(cur: Any, subject_id: Optional[int] = None) -> List[Tuple[Any, ...]]:
+    """
+    Returns (subject, students, sum, sum of squares, min, max, failed) for every subject in subject_id order,
+    or for one subject_id, from a single scan of the student_info subject columns. Subjects without marks are left out.
+    """
+    subjects: List[Tuple[str, str]] = [(code, name) for current_id, code, name, _ in SUBJECT_CATALOG
+                                       if subject_id is None or current_id == subject_id]
+    if not subjects:
+        return []
+    cur.execute("SELECT {} FROM student_info".format(", ".join(SUBJECT_FIGURES.format(code) for code, _ in subjects)))
+    row: Tuple[Any, ...] = cur.fetchone()
+    figures: int = len(row) // len(subjects)
+    return [(name,) + tuple(row[i * figures:(i + 1) * figures]) for i, (_, name) in enumerate(subjects) if row[i * figures]]
+
+
+def subject_record(row: Sequence[Any]) -> Dict[str, Any]:
+    """
+    Turns a fetch_subject_report row into the subject's count, average, standard deviation, range and failures.
+    """
+    subject, count, total, sum_squares, lowest, highest, failed = row
+    mean: float = float(total) / count
+    return {
+        "subject": subject,
+        "students": int(count),
+        "average": mean,
+        "std_dev": math.sqrt(max(0.0, float(sum_squares) / count - mean * mean)),
+        "min": float(lowest),
+        "max": float(highest),
+        "failed": int(failed),
+    }
+
+
+def seed_subjects(cur: Any) -> None:
+    """
+    Adds the subjects of SUBJECT_CATALOG that the subjects table does not have yet.
+    """
+    cur.execute("SELECT subject_id FROM subjects")
+    existing = {row[0] for row in cur.fetchall()}
+    missing: List[Tuple[Any, ...]] = [row for row in SUBJECT_CATALOG if row[0] not in existing]
+    if missing:
+        cur.executemany("INSERT INTO subjects (subject_id, code, name, max_marks) VALUES (%s, %s, %s, %s)", missing)
+
+
+def migrate_marks(cur: Any) -> int:
+    """
+    Seeds the subjects catalog and replaces the contents of student_marks with a copy of the subject
+    columns of student_info, so a re-run refreshes it. Returns the number of marks copied.
+    """
+    seed_subjects(cur)
+    cur.execute("DELETE FROM student_marks")
+    copied: int = 0
+    for subject_id, column, _, _ in SUBJECT_CATALOG:
+        cur.execute(MIGRATE_SUBJECT_QUERY.format(column), (subject_id,))
+        copied += max(0, cur.rowcount)
+    return copied
+
+
+def check_marks(cur: Any) -> Dict[str, int]:
+    """
+    Counts the students whose marks are missing from student_marks and the marks that disagree with student_info.
+    """
+    cur.execute('''
+        SELECT COUNT(*) FROM student_info si
+        WHERE (SELECT COUNT(*) FROM student_marks m WHERE m.student_id = si.student_id) <> %s
+    ''', (len(SUBJECT_CATALOG),))
+    incomplete: int = cur.fetchone()[0]
+    cur.execute(MISMATCHED_MARKS_QUERY)
+    return {"incomplete_students": incomplete, "mismatched_marks": cur.fetchone()[0]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Copy the subject columns of student_info into the student_marks table, or check the copy.")
+    parser.add_argument("--check", action="store_true", help="Only report students and marks that differ from student_info")
+    args = parser.parse_args()
+
+    con = get_pool().get_connection()
+    cur = con.cursor()
+    try:
+        copied: int = 0
+        if not args.check:
+            # Lock student_info against writers while its marks are copied
+            cur.execute("SELECT COUNT(*) FROM student_info FOR UPDATE")
+            cur.fetchall()
+            copied = migrate_marks(cur)
+        result: Dict[str, int] = check_marks(cur)
+        con.commit()
+    finally:
+        con.close()
+
+    print("\nMARKS MIGRATION")
+    print("-------------------------------------------------------------")
+    if not args.check:
+        print("Marks copied: ", copied)
+    print("Students with missing marks: ", result["incomplete_students"])
+    print("Marks differing from student_info: ", result["mismatched_marks"])
+    print("-------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Columns of the display as (header, width)
+COLUMNS: List[Tuple[str, int]] = [
+    ("Student ID", 12), ("Name", 24), ("Phone Number", 12), ("Maths", 6), ("English", 7), ("SST", 6),
+    ("Science", 7), ("Computer Science", 16), ("Final Grade", 11), ("Total Marks", 11), ("Percentage", 10)
+]
+
+ENTRIES_QUERY: str = '''
+    SELECT si.student_id, si.name AS student_name, si.phone_number, si.maths, si.english, si.sst, si.science, si.computer_science,
+           gt.final_grade, gt.total_marks, gt.percentage
+    FROM student_info si
+    LEFT JOIN grade_table gt ON si.student_id = gt.student_id
+'''
+
+
+def escape_like(text: str) -> str:
+    # ! escapes the LIKE wildcards, so that e.g. S_2019 matches literally (MySQL and SQLite alike); use with ESCAPE '!'
+    return re.sub(r"([!%_])", r"!\1", text)
+
+
+def build_filters(filters: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+    """
+    Turns the optional filters (name, final_grade, min_percentage, below_percentage, student_id_prefix)
+    into WHERE conditions and parameters.
+    """
+    conditions: List[str] = []
+    params: List[Any] = []
+    if filters.get("name"):
+        conditions.append("si.name LIKE %s ESCAPE '!'")
+        params.append("%" + escape_like(filters["name"]) + "%")
+    if filters.get("final_grade"):
+        conditions.append("gt.final_grade = %s")
+        params.append(filters["final_grade"])
+    if filters.get("min_percentage") is not None:
+        conditions.append("gt.percentage >= %s")
+        params.append(filters["min_percentage"])
+    if filters.get("below_percentage") is not None:
+        conditions.append("gt.percentage < %s")
+        params.append(filters["below_percentage"])
+    if filters.get("student_id_prefix"):
+        conditions.append("si.student_id LIKE %s ESCAPE '!'")
+        params.append(escape_like(filters["student_id_prefix"]) + "%")
+    return conditions, params
+
+
+def iter_entries(con: Any, filters: Optional[Dict[str, Any]] = None, after: Optional[str] = None,
+                 before: Optional[str] = None, limit: Optional[int] = None,
+                 batch_size: int = 500) -> Iterator[Tuple[Any, ...]]:
+    """
+    Streams entries ordered by student_id from an unbuffered (server-side) cursor in fetchmany batches.
+    after/before give keyset pagination: rows after the given ID, or the rows just before it
+    (still yielded in ascending order).
+    """
+    conditions, params = build_filters(filters or {})
+    if after is not None:
+        conditions.append("si.student_id > %s")
+        params.append(after)
+    if before is not None:
+        conditions.append("si.student_id < %s")
+        params.append(before)
+
+    query: str = ENTRIES_QUERY
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    # Walking backwards needs a descending scan; that page is reversed below
+    query += " ORDER BY si.student_id DESC" if before is not None else " ORDER BY si.student_id"
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+
+    cur = con.cursor(buffered=False)
+    try:
+        cur.execute(query, params)
+        if before is not None:
+            # A previous page is at most `limit` rows, so it can be held to reverse it
+            page: List[Tuple[Any, ...]] = []
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                page.extend(rows)
+            yield from reversed(page)
+        else:
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+    finally:
+        cur.close()
+
+
+def format_value(value: Any, width: int) -> str:
+    if value is None:
+        text: str = "-"
+    elif isinstance(value, float):
+        text = "{:.2f}".format(value)
+    else:
+        text = str(value)
+    # Truncate so the columns always line up
+    if len(text) > width:
+        text = text[:width - 1] + "~"
+    return text.ljust(width)
+
+
+def separator() -> str:
+    return "+" + "+".join("-" * (width + 2) for _, width in COLUMNS) + "+"
+
+
+def format_header() -> str:
+    return "| " + " | ".join(header.ljust(width) for header, width in COLUMNS) + " |"
+
+
+def format_row(row: Tuple[Any, ...]) -> str:
+    return "| " + " | ".join(format_value(value, width) for value, (_, width) in zip(row, COLUMNS)) + " |"
+
+
+def print_page(rows: Iterator[Tuple[Any, ...]]) -> Tuple[Optional[str], Optional[str], int]:
+    """
+    Prints rows as they arrive and returns the first and last student IDs printed and the row count.
+    """
+    print(separator())
+    print(format_header())
+    print(separator())
+    first_id: Optional[str] = None
+    last_id: Optional[str] = None
+    count: int = 0
+    for row in rows:
+        if first_id is None:
+            first_id = row[0]
+        last_id = row[0]
+        count += 1
+        print(format_row(row), flush=count == 1)
+    print(separator())
+    return first_id, last_id, count
+
+
+def browse_entries(storage: Any, page_size: int = 20, filters: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Displays the entries of a storage (see storage.py) page by page, moving with keyset pagination on student_id.
+    """
+    first_id, last_id, count = print_page(storage.iter_entries(filters, limit=page_size))
+    if count == 0:
+        print("No entries found.")
+        return
+
+    while True:
+        action: str = input("[n]ext page, [p]revious page or [q]uit: ").strip().lower()
+        if action == 'n':
+            rows = storage.iter_entries(filters, after=last_id, limit=page_size)
+        elif action == 'p':
+            rows = storage.iter_entries(filters, before=first_id, limit=page_size)
+        elif action == 'q':
+            break
+        else:
+            print("Invalid choice. Please enter n, p or q.")
+            continue
+
+        new_first, new_last, new_count = print_page(rows)
+        if new_count == 0:
+            print("No more entries in that direction.")
+        else:
+            first_id, last_id = new_first, new_last
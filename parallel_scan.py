@@ -0,0 +1,249 @@
+import argparse
+import heapq
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from aggregates import AGGREGATE_COLUMNS, cumulative_average, subject_statistics
+from analytics import grade_indices
+from db_pool import get_pool
+from grading import GRADE_LABELS, MAX_MARKS, SUBJECT_COLUMNS, grade_row
+from storage import INSERT_GRADE_QUERY
+
+LINE: str = "-------------------------------------------------------------"
+
+# Every student of a shard with their grade_table row, streamed in student_id order along the primary key;
+# formatted with the shard's key range condition
+SHARD_QUERY: str = '''
+    SELECT si.student_id, si.name, si.phone_number, {}, si.total_marks, gt.final_grade, gt.total_marks
+    FROM student_info si
+    LEFT JOIN grade_table gt ON si.student_id = gt.student_id
+    {}
+    ORDER BY si.student_id
+'''.format(", ".join("si." + column for column in SUBJECT_COLUMNS), "{}")
+
+# Column positions in the rows of SHARD_QUERY
+MARKS_START: int = 3
+TOTAL: int = MARKS_START + len(SUBJECT_COLUMNS)
+GRADE_FINAL_GRADE: int = TOTAL + 1
+GRADE_TOTAL: int = TOTAL + 2
+
+# Shard boundaries: the student_id at an offset of the primary key
+BOUNDARY_QUERY: str = "SELECT student_id FROM student_info ORDER BY student_id LIMIT 1 OFFSET %s"
+
+# A key range: (first student_id, student_id after the last); None leaves that end open
+Shard = Tuple[Optional[str], Optional[str]]
+
+
+def shard_ranges(cur: Any, shards: int) -> List[Shard]:
+    """
+    Splits student_info into up to shards student_id ranges of about equal size.
+    """
+    cur.execute("SELECT COUNT(*) FROM student_info")
+    count: int = cur.fetchone()[0]
+    boundaries: List[str] = []
+    for i in range(1, min(shards, count)):
+        cur.execute(BOUNDARY_QUERY, (count * i // shards,))
+        boundary: str = cur.fetchone()[0]
+        if not boundaries or boundary > boundaries[-1]:
+            boundaries.append(boundary)
+    lows: List[Optional[str]] = [None] + boundaries
+    highs: List[Optional[str]] = boundaries + [None]
+    return list(zip(lows, highs))
+
+
+def empty_partial() -> Dict[str, Any]:
+    """
+    The partial result of a scan over no students.
+    """
+    return {
+        "aggregates": [0.0] * len(AGGREGATE_COLUMNS),
+        # (total, student_id, name) of the students with the highest total seen so far
+        "toppers": [],
+        # (total, student_id, name) of the top N by total, highest first; ties by descending student_id, as in storage.fetch_top_n
+        "top_n": [],
+        # (student_id, name, total) of the students with a mark below 50, in student_id order
+        "failed": [],
+        "final_grades": [0] * len(GRADE_LABELS),
+        # student_ids whose grade_table row is missing or disagrees with their marks
+        "grade_mismatches": [],
+    }
+
+
+def scan_rows(partial: Dict[str, Any], rows: List[Tuple[Any, ...]], top_n: int) -> None:
+    """
+    Folds a chunk of SHARD_QUERY rows into a partial result, with vectorized operations over its marks.
+    """
+    marks: np.ndarray = np.array([row[MARKS_START:TOTAL] for row in rows], dtype=np.float64).reshape(len(rows), len(SUBJECT_COLUMNS))
+    # The stored totals, so that ties and ordering match the total_marks index
+    totals: np.ndarray = np.array([row[TOTAL] for row in rows], dtype=np.float64)
+
+    delta: List[float] = [float(len(rows))] + marks.sum(axis=0).tolist() + (marks * marks).sum(axis=0).tolist()
+    partial["aggregates"] = [a + b for a, b in zip(partial["aggregates"], delta)]
+
+    highest: float = float(totals.max())
+    best: float = partial["toppers"][0][0] if partial["toppers"] else float("-inf")
+    if highest > best:
+        partial["toppers"] = []
+    if highest >= best:
+        partial["toppers"] += [(highest, rows[i][0], rows[i][1]) for i in np.flatnonzero(totals == highest)]
+
+    if top_n > 0:
+        # Rows come in ascending student_id order, so among ties the last ones are wanted
+        candidates: np.ndarray = len(rows) - 1 - np.argsort(-totals[::-1], kind='stable')[:top_n]
+        partial["top_n"] = heapq.nlargest(top_n, partial["top_n"] + [(float(totals[i]), rows[i][0], rows[i][1]) for i in candidates])
+
+    partial["failed"] += [(rows[i][0], rows[i][1], float(totals[i])) for i in np.flatnonzero(marks.min(axis=1) < 50)]
+
+    # Recompute every final grade with the calculate_grade bands and compare it with grade_table
+    # (whose FLOAT totals are only as precise as a 4-byte float)
+    sums: np.ndarray = marks.sum(axis=1)
+    grades: np.ndarray = grade_indices(sums / MAX_MARKS * 100)
+    partial["final_grades"] = [a + int(b) for a, b in zip(partial["final_grades"], np.bincount(grades, minlength=len(GRADE_LABELS)))]
+    for row, grade, total in zip(rows, grades.tolist(), sums.tolist()):
+        if row[GRADE_FINAL_GRADE] != GRADE_LABELS[grade] or row[GRADE_TOTAL] is None or abs(row[GRADE_TOTAL] - total) > 1e-3:
+            partial["grade_mismatches"].append(row[0])
+
+
+def rewrite_grades(con: Any, student_ids: List[str]) -> None:
+    """
+    Replaces the grade_table rows of these students with ones recomputed from their marks. The marks
+    do not change, so nothing goes to the change log; replicas derive their grade rows from the marks.
+    """
+    cur = con.cursor()
+    for start in range(0, len(student_ids), 1000):
+        batch: List[str] = student_ids[start:start + 1000]
+        placeholders: str = ", ".join(["%s"] * len(batch))
+        cur.execute("SELECT student_id, name, phone_number, {} FROM student_info WHERE student_id IN ({}) FOR UPDATE".format(
+            ", ".join(SUBJECT_COLUMNS), placeholders), batch)
+        students: List[Tuple[Any, ...]] = cur.fetchall()
+        cur.execute("DELETE FROM grade_table WHERE student_id IN ({})".format(placeholders), batch)
+        cur.executemany(INSERT_GRADE_QUERY, [grade_row(student) for student in students])
+        con.commit()
+
+
+def scan_shard(shard: Shard, top_n: int = 10, rebuild_grades: bool = False, chunk_size: int = 50000) -> Dict[str, Any]:
+    """
+    Scans one key range on its own connection and returns its partial result. Runs in a worker process.
+    """
+    low, high = shard
+    conditions: List[str] = []
+    params: List[str] = []
+    if low is not None:
+        conditions.append("si.student_id >= %s")
+        params.append(low)
+    if high is not None:
+        conditions.append("si.student_id < %s")
+        params.append(high)
+    query: str = SHARD_QUERY.format("WHERE " + " AND ".join(conditions) if conditions else "")
+
+    partial: Dict[str, Any] = empty_partial()
+    with get_pool().get_connection() as con:
+        cur = con.cursor(buffered=False)
+        cur.execute(query, params)
+        while True:
+            rows: List[Tuple[Any, ...]] = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            scan_rows(partial, rows, top_n)
+        cur.close()
+        if rebuild_grades and partial["grade_mismatches"]:
+            rewrite_grades(con, partial["grade_mismatches"])
+    return partial
+
+
+def merge_partials(partials: List[Dict[str, Any]], top_n: int = 10) -> Dict[str, Any]:
+    """
+    Merges the partial results of the shards, given in key range order.
+    """
+    merged: Dict[str, Any] = empty_partial()
+    for partial in partials:
+        merged["aggregates"] = [a + b for a, b in zip(merged["aggregates"], partial["aggregates"])]
+        if partial["toppers"]:
+            best: float = merged["toppers"][0][0] if merged["toppers"] else float("-inf")
+            if partial["toppers"][0][0] > best:
+                merged["toppers"] = list(partial["toppers"])
+            elif partial["toppers"][0][0] == best:
+                merged["toppers"] += partial["toppers"]
+        merged["top_n"] = heapq.nlargest(top_n, merged["top_n"] + partial["top_n"])
+        merged["failed"] += partial["failed"]
+        merged["final_grades"] = [a + b for a, b in zip(merged["final_grades"], partial["final_grades"])]
+        merged["grade_mismatches"] += partial["grade_mismatches"]
+    return merged
+
+
+def parallel_scan(workers: Optional[int] = None, shards: Optional[int] = None, top_n: int = 10,
+                  rebuild_grades: bool = False) -> Dict[str, Any]:
+    """
+    Computes the class-wide figures (cumulative and per-subject averages, toppers, top N, failed
+    students, final grade counts and grade_table drift) in one pass over student_info, split into
+    student_id ranges that a pool of processes scans on their own connections. With one worker
+    the shards are scanned in this process. With rebuild_grades, drifting grade_table rows are rewritten.
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    start: float = time.perf_counter()
+    with get_pool().get_connection() as con:
+        ranges: List[Shard] = shard_ranges(con.cursor(), max(1, shards or workers))
+
+    if workers == 1:
+        partials: List[Dict[str, Any]] = [scan_shard(shard, top_n, rebuild_grades) for shard in ranges]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partials = list(executor.map(scan_shard, ranges, [top_n] * len(ranges), [rebuild_grades] * len(ranges)))
+    merged: Dict[str, Any] = merge_partials(partials, top_n)
+
+    aggregates: Dict[str, float] = dict(zip(AGGREGATE_COLUMNS, merged["aggregates"]))
+    return {
+        "students": int(aggregates["student_count"]),
+        "average": cumulative_average(aggregates),
+        "subjects": subject_statistics(aggregates),
+        "toppers": [{"student_id": student_id, "name": name, "total_marks": total}
+                    for total, student_id, name in sorted(merged["toppers"], key=lambda topper: topper[1])],
+        "top_n": [{"student_id": student_id, "name": name, "total_marks": total} for total, student_id, name in merged["top_n"]],
+        "failed": [{"student_id": student_id, "name": name, "total_marks": total} for student_id, name, total in merged["failed"]],
+        "final_grades": dict(zip(GRADE_LABELS, merged["final_grades"])),
+        "grade_mismatches": merged["grade_mismatches"],
+        "shards": len(ranges),
+        "workers": workers,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def print_scan(result: Dict[str, Any], top_n: int) -> None:
+    print("\nPARALLEL SCAN ({} students, {} shards, {} workers, {:.2f}s)".format(
+        result["students"], result["shards"], result["workers"], result["elapsed"]))
+    print(LINE)
+    if result["average"] is not None:
+        print("Cumulative average: {:.2f}".format(result["average"]))
+    for subject, statistics in result["subjects"].items():
+        print("{:<20} average {:.2f}, standard deviation {:.2f}".format(subject, statistics["average"], statistics["std_dev"]))
+    print("Topper(s): ", ", ".join("{} ({})".format(topper["student_id"], topper["total_marks"]) for topper in result["toppers"]))
+    print("Top {}: ".format(top_n), ", ".join("{} ({})".format(student["student_id"], student["total_marks"]) for student in result["top_n"]))
+    print("Failed students: ", len(result["failed"]))
+    print("Final grades: ", result["final_grades"])
+    print("grade_table rows out of date: ", len(result["grade_mismatches"]))
+    print(LINE)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compute the class-wide figures with a sharded scan on a pool of processes.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Scanning processes (default: CPU count)")
+    parser.add_argument("--shards", type=int, help="student_id ranges to split the table into (default: one per worker)")
+    parser.add_argument("--top-n", type=int, default=10, help="N for the top N (default 10)")
+    parser.add_argument("--rebuild-grades", action="store_true", help="Rewrite the grade_table rows that disagree with the marks")
+    parser.add_argument("--compare", action="store_true", help="Also time the same scan in one process")
+    args = parser.parse_args()
+
+    result: Dict[str, Any] = parallel_scan(args.workers, args.shards, max(0, args.top_n), args.rebuild_grades)
+    print_scan(result, args.top_n)
+    if args.compare:
+        single: Dict[str, Any] = parallel_scan(1, 1, max(0, args.top_n))
+        print("One process: {:.2f}s, {} workers: {:.2f}s ({:.2f}x)".format(
+            single["elapsed"], result["workers"], result["elapsed"], single["elapsed"] / result["elapsed"]))
+
+
+if __name__ == "__main__":
+    main()
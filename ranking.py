@@ -0,0 +1,379 @@
+import argparse
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from changelog import change_log_enabled, log_bounds, read_changes
+from db_pool import env_float, env_int, get_pool, storage_backend
+from storage import get_storage
+
+# Keys of the tree: (-total_marks, student_id), so that position 0 is the highest total
+Key = Tuple[float, str]
+
+# Changes read from the change log per round-trip when an expired ranking catches up
+CATCH_UP_BATCH: int = 1000
+
+# A change to a student's total: (change log sequence number, student_id, new total, or None once removed)
+TotalChange = Tuple[int, str, Optional[float]]
+
+
+class _Node:
+    __slots__ = ("key", "priority", "size", "left", "right")
+
+    def __init__(self, key: Key, priority: float) -> None:
+        self.key: Key = key
+        self.priority: float = priority
+        self.size: int = 1
+        self.left: Optional["_Node"] = None
+        self.right: Optional["_Node"] = None
+
+
+def _size(node: Optional[_Node]) -> int:
+    return node.size if node is not None else 0
+
+
+def _resize(node: _Node) -> None:
+    node.size = 1 + _size(node.left) + _size(node.right)
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    # Every key of left is below every key of right
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _resize(left)
+        return left
+    right.left = _merge(left, right.left)
+    _resize(right)
+    return right
+
+
+def _split(node: Optional[_Node], key: Key) -> Tuple[Optional[_Node], Optional[_Node]]:
+    # Splits into the keys below key and the keys from key on
+    if node is None:
+        return None, None
+    if node.key < key:
+        below, rest = _split(node.right, key)
+        node.right = below
+        _resize(node)
+        return node, rest
+    below, rest = _split(node.left, key)
+    node.left = rest
+    _resize(node)
+    return below, node
+
+
+def _remove(node: Optional[_Node], key: Key) -> Optional[_Node]:
+    if node is None:
+        return None
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    elif node.key < key:
+        node.right = _remove(node.right, key)
+    else:
+        return _merge(node.left, node.right)
+    _resize(node)
+    return node
+
+
+class OrderStatisticTree:
+    """
+    A treap (a binary search tree balanced by random priorities) whose nodes know the size of their
+    subtree, so that besides insert and remove it answers "how many keys are below this one" (rank)
+    and "which key is at this position" (select) in O(log n) expected time.
+    """
+
+    def __init__(self, keys: Iterable[Key] = ()) -> None:
+        self._random = random.Random()
+        self._root: Optional[_Node] = self._build(sorted(keys))
+
+    def _build(self, keys: List[Key]) -> Optional[_Node]:
+        # Builds the treap of sorted keys in O(n): the rightmost path is kept on a stack (a Cartesian tree)
+        stack: List[_Node] = []
+        for key in keys:
+            node: _Node = _Node(key, self._random.random())
+            last: Optional[_Node] = None
+            while stack and stack[-1].priority < node.priority:
+                last = stack.pop()
+            node.left = last
+            if stack:
+                stack[-1].right = node
+            stack.append(node)
+        root: Optional[_Node] = stack[0] if stack else None
+
+        # Sizes bottom-up: children come after their parents in a pre-order walk, so walk it backwards
+        order: List[_Node] = []
+        pending: List[_Node] = [root] if root is not None else []
+        while pending:
+            node = pending.pop()
+            order.append(node)
+            pending.extend(child for child in (node.left, node.right) if child is not None)
+        for node in reversed(order):
+            _resize(node)
+        return root
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def insert(self, key: Key) -> None:
+        below, rest = _split(self._root, key)
+        self._root = _merge(_merge(below, _Node(key, self._random.random())), rest)
+
+    def remove(self, key: Key) -> None:
+        self._root = _remove(self._root, key)
+
+    def rank(self, key: Key) -> int:
+        """
+        Number of keys below key.
+        """
+        count: int = 0
+        node: Optional[_Node] = self._root
+        while node is not None:
+            if node.key < key:
+                count += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def select(self, position: int) -> Key:
+        """
+        The key at a position (0 is the lowest key). Raises IndexError outside 0..len-1.
+        """
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        node: Optional[_Node] = self._root
+        while node is not None:
+            left: int = _size(node.left)
+            if position < left:
+                node = node.left
+            elif position == left:
+                return node.key
+            else:
+                position -= left + 1
+                node = node.right
+        raise IndexError(position)
+
+
+class RankIndex:
+    """
+    An in-process ranking of the students by total marks, kept in an OrderStatisticTree.
+
+    It is loaded from the storage on first use (one scan of student_id, total_marks and O(n log n)
+    inserts), then kept up to date by the gradebook's writes in O(log n) each; lookups are O(log n).
+    Writes made by other processes are picked up every ttl seconds: with a change log (position and
+    changes, see changelog.py) by applying the changes logged since the load, O(log n) each, and
+    otherwise by loading the whole ranking again.
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[Tuple[str, float]]], ttl: float = 60.0, enabled: bool = True,
+                 position: Optional[Callable[[], int]] = None,
+                 changes: Optional[Callable[[int, int], Optional[List[TotalChange]]]] = None) -> None:
+        self.enabled: bool = enabled
+        self.ttl: float = ttl
+        self._loader = loader
+        self._position = position
+        self._changes = changes
+        self._lock = threading.Lock()
+        self._tree: Optional[OrderStatisticTree] = None
+        self._totals: Dict[str, float] = {}
+        # The change log position the ranking is current with, when there is a change log
+        self._watermark: Optional[int] = None
+        self._expires_at: float = 0.0
+        self._stats: Dict[str, int] = {"loads": 0, "catch_ups": 0, "lookups": 0, "updates": 0}
+
+    def _ensure_loaded(self) -> OrderStatisticTree:
+        # Called with the lock held, so writes wait for a reload and are applied on top of it
+        if self._tree is not None and self._expires_at < time.monotonic() and self._watermark is not None and self._catch_up():
+            self._expires_at = time.monotonic() + self.ttl
+        if self._tree is None or self._expires_at < time.monotonic():
+            # Read before the load, so the changes made during it are applied again by the next catch-up
+            self._watermark = self._position() if self._position is not None else None
+            self._totals = {student_id: float(total) for student_id, total in self._loader()}
+            self._tree = OrderStatisticTree((-total, student_id) for student_id, total in self._totals.items())
+            self._expires_at = time.monotonic() + self.ttl
+            self._stats["loads"] += 1
+        return self._tree
+
+    def _catch_up(self) -> bool:
+        """
+        Applies the changes logged after the watermark. Returns False when the log no longer goes back
+        that far (it was pruned), so the ranking has to be loaded again.
+        """
+        while True:
+            changes: Optional[List[TotalChange]] = self._changes(self._watermark, CATCH_UP_BATCH)
+            if changes is None:
+                return False
+            # Each change carries the student's resulting total, so replaying one already applied is harmless
+            for seq, student_id, total in changes:
+                if total is None:
+                    self._remove(student_id)
+                else:
+                    self._set(student_id, total)
+                self._watermark = seq
+            if len(changes) < CATCH_UP_BATCH:
+                self._stats["catch_ups"] += 1
+                return True
+
+    def rank(self, student_id: str) -> Optional[Tuple[float, int, int]]:
+        """
+        Returns (total_marks, students with a higher total, students) for a student, or None.
+        """
+        with self._lock:
+            tree: OrderStatisticTree = self._ensure_loaded()
+            self._stats["lookups"] += 1
+            total: Optional[float] = self._totals.get(student_id)
+            if total is None:
+                return None
+            # "" sorts before every student ID, so this counts only the strictly higher totals
+            return total, tree.rank((-total, "")), len(tree)
+
+    def count_students(self) -> int:
+        with self._lock:
+            return len(self._ensure_loaded())
+
+    def total_at(self, position: int) -> Optional[float]:
+        """
+        Returns the total marks at a position of the ranking (0 is the highest), or None.
+        """
+        with self._lock:
+            tree: OrderStatisticTree = self._ensure_loaded()
+            self._stats["lookups"] += 1
+            if not 0 <= position < len(tree):
+                return None
+            return -tree.select(position)[0]
+
+    def set(self, student_id: str, total: float) -> None:
+        """
+        Records a student's new (or first) total, as Storage.total_marks gives it, so that it equals the
+        total a load would read for the same marks. Does nothing until the index has been loaded.
+        """
+        with self._lock:
+            if self._tree is not None:
+                self._set(student_id, total)
+
+    def remove(self, student_id: str) -> None:
+        with self._lock:
+            if self._tree is not None:
+                self._remove(student_id)
+
+    def _set(self, student_id: str, total: float) -> None:
+        old: Optional[float] = self._totals.get(student_id)
+        if old is not None:
+            self._tree.remove((-old, student_id))
+        self._totals[student_id] = float(total)
+        self._tree.insert((-float(total), student_id))
+        self._stats["updates"] += 1
+
+    def _remove(self, student_id: str) -> None:
+        old: Optional[float] = self._totals.pop(student_id, None)
+        if old is not None:
+            self._tree.remove((-old, student_id))
+            self._stats["updates"] += 1
+
+    def invalidate(self) -> None:
+        """
+        Drops the ranking, so that it is reloaded on next use (e.g. after a bulk change).
+        """
+        with self._lock:
+            self._tree = None
+            self._totals = {}
+            self._watermark = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+            snapshot["students"] = len(self._totals)
+            snapshot["loaded"] = self._tree is not None
+        snapshot["enabled"] = self.enabled
+        snapshot["ttl"] = self.ttl
+        return snapshot
+
+
+def log_position() -> int:
+    """
+    The last sequence number of the change log.
+    """
+    with get_pool().get_connection() as con:
+        return log_bounds(con.cursor())[1]
+
+
+def read_total_changes(after: int, limit: int) -> Optional[List[TotalChange]]:
+    """
+    Reads up to limit changes to students' totals after a change log position, or None when the
+    changes right after it have been pruned from the log.
+    """
+    with get_pool().get_connection() as con:
+        cur = con.cursor()
+        first, last = log_bounds(cur)
+        if after < last and (first is None or first > after + 1):
+            return None
+        storage = get_storage()
+        return [(seq, student_id, None if row is None else storage.total_marks(row[3:]))
+                for seq, _, student_id, row in read_changes(cur, after, limit)]
+
+
+def check_ranking(sample: int = 1000) -> Dict[str, int]:
+    """
+    Checks a fresh rank index against the storage for up to sample students. After the load, each
+    student's total is set again the way the gradebook's writes set it, from their marks; a total that
+    differed from the loaded one would split the student from those tied with them. Returns the numbers
+    of students checked, of totals that changed and of ranks that differ from the storage's.
+    """
+    storage = get_storage()
+    index: RankIndex = RankIndex(storage.student_totals)
+    loaded: Dict[str, Optional[Tuple[float, int, int]]] = {}
+    for entry in storage.iter_entries(limit=sample):
+        loaded[entry[0]] = index.rank(entry[0])
+        index.set(entry[0], storage.total_marks(entry[3:8]))
+    result: Dict[str, int] = {"checked": len(loaded), "totals": 0, "ranks": 0}
+    for student_id, before in loaded.items():
+        after: Optional[Tuple[float, int, int]] = index.rank(student_id)
+        if before is None or after is None or after[0] != before[0]:
+            result["totals"] += 1
+        if after != storage.rank(student_id):
+            result["ranks"] += 1
+    return result
+
+
+_rank_index: Optional[RankIndex] = None
+_rank_index_lock = threading.Lock()
+
+
+def get_rank_index() -> RankIndex:
+    """
+    Returns the process-wide rank index, configured from the .env file: rank_index (0 answers rank
+    queries from the database's total_marks index instead) and rank_ttl in seconds. With change_log
+    on a SQL backend, it catches up on the change log when the ttl expires instead of reloading.
+    """
+    global _rank_index
+    if _rank_index is None:
+        with _rank_index_lock:
+            if _rank_index is None:
+                logged: bool = change_log_enabled() and storage_backend() != 'memory'
+                _rank_index = RankIndex(lambda: get_storage().student_totals(), env_float('rank_ttl', 60.0),
+                                        env_int('rank_index', 1) > 0, log_position if logged else None,
+                                        read_total_changes if logged else None)
+    return _rank_index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the in-process rank index against the database, ties included.")
+    parser.add_argument("--sample", type=int, default=1000, help="Students to check (default 1000)")
+    args = parser.parse_args()
+
+    result: Dict[str, int] = check_ranking(max(1, args.sample))
+    print("\nRANK INDEX CHECK")
+    print("-------------------------------------------------------------")
+    print("Students checked: ", result["checked"])
+    print("Totals differing from the loaded ones: ", result["totals"])
+    print("Ranks differing from the database's: ", result["ranks"])
+    print("-------------------------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
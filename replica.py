@@ -0,0 +1,262 @@
+import argparse
+import glob
+import os
+import re
+import shutil
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import mysql.connector as mq
+
+from aggregates import apply_delta, check_aggregates
+from changelog import DELETE, Change, log_bounds, prune_changes, read_changes
+from db_pool import env_float, env_int, get_pool
+from grading import SUBJECT_COLUMNS, grade_row
+from schema import create_tables
+from sqlite_backend import SQLiteConnection
+from storage import INSERT_GRADE_QUERY, INSERT_STUDENT_QUERY, fetch_students
+
+# The sequence number of the last change applied (NULL until the first full copy) and of the last snapshot
+REPLICA_STATE_TABLE: str = '''
+    CREATE TABLE IF NOT EXISTS replica_state (
+        id INTEGER PRIMARY KEY,
+        watermark BIGINT,
+        snapshot_watermark BIGINT,
+        synced_at REAL
+    )
+'''
+
+# Every student of the source, for a full copy
+COPY_QUERY: str = "SELECT student_id, name, phone_number, {} FROM student_info".format(", ".join(SUBJECT_COLUMNS))
+
+# Snapshots are named after the replica and their watermark, e.g. student_replica.db.snapshot-000000001234
+SNAPSHOT_NAME: str = "{}.snapshot-{:012d}"
+SNAPSHOT_PATTERN = re.compile(r"\.snapshot-(\d+)$")
+
+
+class Replica:
+    """
+    A copy of the gradebook in a local SQLite file, kept current by applying the source's change log
+    from a watermark. The file has the tables of a backend=sqlite database, so the reports can run on it.
+    Its grade_table rows are recomputed from the replicated marks rather than copied, so they are never
+    behind the marks, even when the source's are (grade queue, parallel_scan --rebuild-grades).
+
+    A replica that has never synced, or has fallen behind the oldest change still in the log, is
+    brought up to date with a full copy of student_info first.
+    """
+
+    def __init__(self, path: str, batch_size: int = 1000, snapshot_every: int = 10000, snapshots: int = 3) -> None:
+        self.path: str = path
+        self.batch_size: int = batch_size
+        # Changes between snapshots, and the number of snapshots kept
+        self.snapshot_every: int = snapshot_every
+        self.snapshots: int = snapshots
+        self.con: SQLiteConnection = SQLiteConnection(path)
+        cur = self.con.cursor()
+        create_tables(cur, "sqlite")
+        cur.execute(REPLICA_STATE_TABLE)
+        cur.execute("SELECT COUNT(*) FROM replica_state")
+        if cur.fetchone()[0] == 0:
+            cur.execute("INSERT INTO replica_state (id) VALUES (1)")
+        self.con.commit()
+
+    def state(self) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Returns the watermark (None if the replica never synced) and the watermark of the last snapshot.
+        """
+        cur = self.con.cursor()
+        cur.execute("SELECT watermark, snapshot_watermark FROM replica_state WHERE id = 1")
+        return cur.fetchone()
+
+    def _set_watermark(self, cur: Any, watermark: int) -> None:
+        cur.execute("UPDATE replica_state SET watermark = %s, synced_at = %s WHERE id = 1", (watermark, time.time()))
+
+    def full_copy(self, source: Any) -> int:
+        """
+        Replaces the replica's students with the source's. The watermark is read before the copy, so
+        the changes made during it are applied again by the sync that follows, which converges on the
+        source whatever state each copied row was in. Returns the number of students copied.
+        """
+        _, last = log_bounds(source.cursor())
+        stream = source.cursor(buffered=False)
+        stream.execute(COPY_QUERY)
+        cur = self.con.cursor()
+        copied: int = 0
+        try:
+            for table in ("grade_table", "student_info"):
+                cur.execute("DELETE FROM {}".format(table))
+            while True:
+                rows: List[Tuple[Any, ...]] = stream.fetchmany(self.batch_size)
+                if not rows:
+                    break
+                cur.executemany(INSERT_STUDENT_QUERY, rows)
+                cur.executemany(INSERT_GRADE_QUERY, [grade_row(row) for row in rows])
+                copied += len(rows)
+            check_aggregates(cur, rebuild=True)
+            self._set_watermark(cur, last)
+            self.con.commit()
+        except Exception:
+            self.con.rollback()
+            raise
+        return copied
+
+    def apply(self, changes: List[Change]) -> None:
+        """
+        Applies a batch of changes, and moves the watermark past them, in one transaction. Only the last
+        change of each student matters, as it carries the student's whole row.
+        """
+        latest: Dict[str, Change] = {change[2]: change for change in changes}
+        student_ids: List[str] = list(latest)
+        rows: List[Tuple[Any, ...]] = [row for _, operation, _, row in latest.values() if operation != DELETE]
+        placeholders: str = ", ".join(["%s"] * len(student_ids))
+        cur = self.con.cursor()
+        try:
+            existing: Dict[str, Tuple[Any, ...]] = fetch_students(cur, student_ids)
+            apply_delta(cur, added=[row[3:] for row in rows], removed=[row[3:] for row in existing.values()])
+            cur.execute("DELETE FROM grade_table WHERE student_id IN ({})".format(placeholders), student_ids)
+            cur.execute("DELETE FROM student_info WHERE student_id IN ({})".format(placeholders), student_ids)
+            if rows:
+                cur.executemany(INSERT_STUDENT_QUERY, rows)
+                cur.executemany(INSERT_GRADE_QUERY, [grade_row(row) for row in rows])
+            self._set_watermark(cur, changes[-1][0])
+            self.con.commit()
+        except Exception:
+            self.con.rollback()
+            raise
+
+    def sync(self) -> Dict[str, Any]:
+        """
+        Applies the source's changes since the watermark, in batches, and takes a snapshot when
+        snapshot_every changes have been applied since the last one. Returns what was done.
+        """
+        start: float = time.perf_counter()
+        result: Dict[str, Any] = {"copied": None, "applied": 0, "batches": 0, "snapshot": None}
+        with get_pool().get_connection() as source:
+            cur = source.cursor()
+            watermark, _ = self.state()
+            first, last = log_bounds(cur)
+            if watermark is None or (watermark < last and (first is None or first > watermark + 1)):
+                result["copied"] = self.full_copy(source)
+                watermark, _ = self.state()
+            while True:
+                changes: List[Change] = read_changes(cur, watermark, self.batch_size)
+                if not changes:
+                    break
+                self.apply(changes)
+                watermark = changes[-1][0]
+                result["applied"] += len(changes)
+                result["batches"] += 1
+                if len(changes) < self.batch_size:
+                    break
+            _, last = log_bounds(cur)
+
+        _, snapshot_watermark = self.state()
+        if snapshot_watermark is None or watermark - snapshot_watermark >= self.snapshot_every:
+            result["snapshot"] = self.snapshot()
+        result.update(watermark=watermark, source_last=last, elapsed=time.perf_counter() - start)
+        return result
+
+    def list_snapshots(self) -> List[Tuple[int, str]]:
+        """
+        Returns the (watermark, path) of this replica's snapshots, oldest first.
+        """
+        snapshots: List[Tuple[int, str]] = []
+        for path in glob.glob(glob.escape(self.path) + ".snapshot-*"):
+            match = SNAPSHOT_PATTERN.search(path)
+            if match:
+                snapshots.append((int(match.group(1)), path))
+        return sorted(snapshots)
+
+    def snapshot(self) -> str:
+        """
+        Writes a compacted copy of the replica, as of its watermark, next to it and removes all but the
+        newest snapshots. A new replica can start from a snapshot and sync only the changes since.
+        """
+        watermark, _ = self.state()
+        path: str = SNAPSHOT_NAME.format(self.path, watermark or 0)
+        # Recorded first, so that a replica restored from the snapshot knows when its next one is due
+        cur = self.con.cursor()
+        cur.execute("UPDATE replica_state SET snapshot_watermark = %s WHERE id = 1", (watermark or 0,))
+        self.con.commit()
+        if not os.path.exists(path):
+            # VACUUM INTO reads one consistent state of the file and writes it without free pages
+            cur.execute("VACUUM INTO %s", (path,))
+        for _, old in self.list_snapshots()[:-self.snapshots or None]:
+            os.remove(old)
+        return path
+
+    def close(self) -> None:
+        self.con.close()
+
+
+def restore_snapshot(snapshot: str, path: str) -> None:
+    """
+    Starts a replica at path from a snapshot file, replacing what is there.
+    """
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    shutil.copyfile(snapshot, path)
+
+
+def open_replica(path: Optional[str] = None) -> Replica:
+    """
+    Opens the replica configured in the .env file (replica_path, replica_batch,
+    replica_snapshot_every, replica_snapshots), or the one at path.
+    """
+    return Replica(path or os.getenv('replica_path') or 'student_replica.db', env_int('replica_batch', 1000),
+                   env_int('replica_snapshot_every', 10000), max(1, env_int('replica_snapshots', 3)))
+
+
+def print_sync(result: Dict[str, Any]) -> None:
+    if result["copied"] is not None:
+        print("Full copy of {} students.".format(result["copied"]))
+    print("Applied {} changes in {} batches in {:.2f}s; watermark {}, source at {}.".format(
+        result["applied"], result["batches"], result["elapsed"], result["watermark"], result["source_last"]))
+    if result["snapshot"]:
+        print("Snapshot: ", result["snapshot"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Keep a local SQLite replica of the gradebook current from the change log.")
+    parser.add_argument("--path", help="Replica file (default: replica_path, or student_replica.db)")
+    parser.add_argument("--from-snapshot", metavar="FILE", help="Start the replica from a snapshot, then sync")
+    parser.add_argument("--snapshot", action="store_true", help="Take a snapshot after syncing")
+    parser.add_argument("--follow", action="store_true", help="Keep syncing until interrupted")
+    parser.add_argument("--interval", type=float, default=env_float('replica_interval', 5.0),
+                        help="Seconds between syncs with --follow (default replica_interval, or 5)")
+    parser.add_argument("--prune-log", action="store_true",
+                        help="Delete the source's changes up to the oldest snapshot kept, after syncing")
+    args = parser.parse_args()
+
+    if args.from_snapshot:
+        restore_snapshot(args.from_snapshot, args.path or os.getenv('replica_path') or 'student_replica.db')
+    replica: Replica = open_replica(args.path)
+    try:
+        while True:
+            try:
+                print_sync(replica.sync())
+            except mq.Error as e:
+                if not args.follow:
+                    raise
+                print("Sync failed, retrying: ", e)
+            if not args.follow:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+    if args.snapshot:
+        print("Snapshot: ", replica.snapshot())
+    if args.prune_log:
+        snapshots: List[Tuple[int, str]] = replica.list_snapshots()
+        if snapshots:
+            with get_pool().get_connection() as con:
+                deleted: int = prune_changes(con.cursor(), snapshots[0][0])
+                con.commit()
+            print("Deleted {} changes up to {} from the change log.".format(deleted, snapshots[0][0]))
+    replica.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Iterator, List, Optional, Set, Tuple
+
+from db_pool import get_pool
+from grading import MAX_MARKS, SUBJECTS, calculate_grade
+
+LINE: str = "-------------------------------------------------------------"
+
+STUDENTS_QUERY: str = '''
+    SELECT student_id, name, phone_number, maths, english, sst, science, computer_science
+    FROM student_info
+'''
+
+
+def render_report_card(student_info: Tuple[Any, ...]) -> str:
+    """
+    Renders the report card of a student_info row (student_id, name, phone_number, marks...) as text.
+    """
+    lines: List[str] = [
+        "REPORT CARD",
+        LINE,
+        "Name:  {}".format(student_info[1]),
+        "Student ID:  {}".format(student_info[0]),
+        "Phone Number:  {}".format(student_info[2]),
+        LINE,
+        "{:<20} {:<10} {:<10}".format("Subject", "Marks", "Grade"),
+        LINE,
+    ]
+
+    total_marks: float = 0
+    # Iterate over each subject, calculate the grade and total marks
+    for subject, mark in zip(SUBJECTS, student_info[3:]):
+        total_marks += mark
+        lines.append("{:<20} {:<10} {:<10}".format(subject, mark, calculate_grade(mark)))
+
+    percentage: float = (total_marks / MAX_MARKS) * 100
+    lines += [
+        LINE,
+        "Total Marks Received:  {}".format(total_marks),
+        "Maximum Marks:  {}".format(MAX_MARKS),
+        "Final Percentage: {:.2f}%".format(percentage),
+        "Final Grade:  {}".format(calculate_grade(percentage)),
+        LINE,
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def render_report_card_html(student_info: Tuple[Any, ...]) -> str:
+    """
+    Renders the report card of a student_info row as an HTML fragment with the same content.
+    """
+    rows: List[str] = []
+    total_marks: float = 0
+    for subject, mark in zip(SUBJECTS, student_info[3:]):
+        total_marks += mark
+        rows.append("<tr><td>{}</td><td>{}</td><td>{}</td></tr>".format(html.escape(subject), mark, calculate_grade(mark)))
+    percentage: float = (total_marks / MAX_MARKS) * 100
+    return (
+        '<section class="report-card">\n'
+        "<h2>REPORT CARD</h2>\n"
+        "<p>Name: {}<br>Student ID: {}<br>Phone Number: {}</p>\n"
+        "<table>\n<tr><th>Subject</th><th>Marks</th><th>Grade</th></tr>\n{}\n</table>\n"
+        "<p>Total Marks Received: {}<br>Maximum Marks: {}<br>Final Percentage: {:.2f}%<br>Final Grade: {}</p>\n"
+        "</section>\n"
+    ).format(html.escape(str(student_info[1])), html.escape(str(student_info[0])), html.escape(str(student_info[2])),
+             "\n".join(rows), total_marks, MAX_MARKS, percentage, calculate_grade(percentage))
+
+
+def render(student_info: Tuple[Any, ...], file_format: str) -> str:
+    return render_report_card_html(student_info) if file_format == 'html' else render_report_card(student_info)
+
+
+def output_name(student_id: str, file_format: str) -> str:
+    """
+    File name of a student's report card. Characters unsafe in file names are replaced, and then a short
+    hash of the real ID is added, so that e.g. "S 1" and "S_1" do not share a file.
+    """
+    name: str = re.sub(r'[^A-Za-z0-9_.-]', '_', str(student_id))
+    if name != str(student_id):
+        name += "-" + hashlib.sha1(str(student_id).encode('utf-8')).hexdigest()[:8]
+    return name + "." + file_format
+
+
+def write_atomically(path: str, content: str) -> None:
+    # Write to a temporary file first so a crash never leaves a partial report card behind
+    temp_path: str = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+def render_chunk_to_files(rows: List[Tuple[Any, ...]], file_format: str, out_dir: str) -> int:
+    """
+    Worker: renders a chunk of students into one file each. Returns the number written.
+    """
+    for row in rows:
+        content: str = render(row, file_format)
+        if file_format == 'html':
+            content = "<!DOCTYPE html>\n<html>\n<body>\n" + content + "</body>\n</html>\n"
+        write_atomically(os.path.join(out_dir, output_name(row[0], file_format)), content)
+    return len(rows)
+
+
+def render_chunk(rows: List[Tuple[Any, ...]], file_format: str) -> str:
+    """
+    Worker: renders a chunk of students into one string, for the combined file.
+    """
+    separator: str = "\n" if file_format == 'txt' else ""
+    return separator.join(render(row, file_format) for row in rows)
+
+
+def iter_chunks(con: Any, chunk_size: int, after: Optional[str] = None) -> Iterator[List[Tuple[Any, ...]]]:
+    """
+    Streams students in student_id order with a single unbuffered query, in chunks of chunk_size.
+    """
+    query: str = STUDENTS_QUERY
+    params: Tuple[Any, ...] = ()
+    if after is not None:
+        query += " WHERE student_id > %s"
+        params = (after,)
+    query += " ORDER BY student_id"
+
+    cur = con.cursor(buffered=False)
+    try:
+        cur.execute(query, params)
+        while True:
+            rows: List[Tuple[Any, ...]] = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cur.close()
+
+
+class Progress:
+    """
+    Prints progress and throughput of the batch on a single line.
+    """
+
+    def __init__(self, total: int) -> None:
+        self.total: int = total
+        self.done: int = 0
+        self.skipped: int = 0
+        self.start: float = time.perf_counter()
+
+    def update(self, written: int = 0, skipped: int = 0) -> None:
+        self.done += written
+        self.skipped += skipped
+        elapsed: float = time.perf_counter() - self.start
+        rate: float = self.done / elapsed if elapsed > 0 else 0.0
+        print("\r{} / {} report cards ({} already written), {:.0f} cards/sec".format(
+            self.done + self.skipped, self.total, self.skipped, rate), end="", flush=True)
+
+
+def generate_files(con: Any, out_dir: str, file_format: str, workers: int, chunk_size: int, progress: Progress) -> None:
+    """
+    Writes one report card per student, skipping students whose report card already exists.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    # Report cards written by an earlier (possibly crashed) run
+    existing: Set[str] = {name for name in os.listdir(out_dir) if name.endswith("." + file_format)}
+
+    pending: Deque[Future] = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for rows in iter_chunks(con, chunk_size):
+            todo: List[Tuple[Any, ...]] = [row for row in rows if output_name(row[0], file_format) not in existing]
+            if len(todo) < len(rows):
+                progress.update(skipped=len(rows) - len(todo))
+            if todo:
+                pending.append(executor.submit(render_chunk_to_files, todo, file_format, out_dir))
+            # Keep a bounded number of chunks in flight so memory stays flat
+            while len(pending) > workers * 2:
+                progress.update(written=pending.popleft().result())
+        while pending:
+            progress.update(written=pending.popleft().result())
+
+
+def generate_combined(con: Any, path: str, file_format: str, workers: int, chunk_size: int, progress: Progress) -> None:
+    """
+    Writes every report card into one file, in student_id order. A checkpoint file next to it records
+    the last student written and the file size, so a crashed run resumes where it left off.
+    """
+    checkpoint_path: str = path + ".progress"
+    after: Optional[str] = None
+    size: int = 0
+    if os.path.exists(checkpoint_path) and os.path.exists(path):
+        with open(checkpoint_path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        after, size = checkpoint["last_student_id"], checkpoint["size"]
+        cur = con.cursor()
+        cur.execute("SELECT COUNT(*) FROM student_info WHERE student_id <= %s", (after,))
+        progress.update(skipped=cur.fetchone()[0])
+        cur.close()
+
+    separator: str = "\n" if file_format == 'txt' else ""
+    with open(path, 'a+b') as out, ProcessPoolExecutor(max_workers=workers) as executor:
+        # Drop anything written after the last checkpoint
+        out.truncate(size)
+        out.seek(size)
+
+        pending: Deque[Tuple[Future, str, int]] = deque()
+
+        def write_next() -> None:
+            future, last_student_id, count = pending.popleft()
+            data: bytes = future.result().encode('utf-8')
+            if out.tell() > 0:
+                data = separator.encode('utf-8') + data
+            out.write(data)
+            out.flush()
+            os.fsync(out.fileno())
+            write_atomically(checkpoint_path, json.dumps({"last_student_id": last_student_id, "size": out.tell()}))
+            progress.update(written=count)
+
+        for rows in iter_chunks(con, chunk_size, after):
+            pending.append((executor.submit(render_chunk, rows, file_format), rows[-1][0], len(rows)))
+            while len(pending) > workers * 2:
+                write_next()
+        while pending:
+            write_next()
+
+    os.remove(checkpoint_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate the report cards of every student.")
+    parser.add_argument("--out-dir", default="report_cards", help="Directory for one file per student (default report_cards)")
+    parser.add_argument("--combined", help="Write all report cards into this single file instead")
+    parser.add_argument("--format", choices=["txt", "html"], default="txt", help="Output format (default txt)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Rendering processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Students per chunk (default 1000)")
+    args = parser.parse_args()
+
+    con = get_pool().get_connection()
+    try:
+        cur = con.cursor()
+        cur.execute("SELECT COUNT(*) FROM student_info")
+        progress: Progress = Progress(cur.fetchone()[0])
+        cur.close()
+
+        if args.combined:
+            generate_combined(con, args.combined, args.format, max(1, args.workers), max(1, args.chunk_size), progress)
+        else:
+            generate_files(con, args.out_dir, args.format, max(1, args.workers), max(1, args.chunk_size), progress)
+    finally:
+        con.close()
+
+    elapsed: float = time.perf_counter() - progress.start
+    print("\n\nREPORT CARDS")
+    print(LINE)
+    print("Written: ", progress.done)
+    print("Already written (skipped): ", progress.skipped)
+    print("Elapsed: {:.2f}s ({:.0f} cards/sec)".format(elapsed, progress.done / elapsed if elapsed > 0 else 0.0))
+    print(LINE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+from typing import Any, Dict, List, Tuple
+
+from aggregates import SUM_COLUMNS, SUMSQ_COLUMNS, check_aggregates, read_aggregates
+from changelog import seed_change_log
+from grading import SUBJECT_COLUMNS
+from marks import seed_subjects
+
+# The gradebook's tables, for MySQL and SQLite alike; {least} is the function taking the lowest of several
+# values (LEAST in MySQL, a multi-argument MIN in SQLite)
+TABLES: List[str] = [
+    # total_marks and lowest_mark are stored generated columns, indexed so that the
+    # topper / top N queries and the failed students query are index range scans
+    '''
+    CREATE TABLE IF NOT EXISTS student_info (
+        student_id VARCHAR(50) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        phone_number VARCHAR(15),
+        {columns},
+        total_marks DOUBLE AS ({total}) STORED,
+        lowest_mark FLOAT AS ({least}({subjects})) STORED
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS grade_table (
+        student_id VARCHAR(50) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        final_grade VARCHAR(4),
+        total_marks FLOAT,
+        percentage FLOAT
+    )
+    ''',
+    # The subjects catalog and one row per student and subject (see marks.py)
+    '''
+    CREATE TABLE IF NOT EXISTS subjects (
+        subject_id SMALLINT PRIMARY KEY,
+        code VARCHAR(50) NOT NULL UNIQUE,
+        name VARCHAR(100) NOT NULL,
+        max_marks FLOAT NOT NULL DEFAULT 100
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS student_marks (
+        student_id VARCHAR(50) NOT NULL,
+        subject_id SMALLINT NOT NULL,
+        mark FLOAT NOT NULL,
+        PRIMARY KEY (student_id, subject_id)
+    )
+    ''',
+    # The single row of class-wide aggregates: the count plus a sum and a sum of squares per subject (see aggregates.py)
+    '''
+    CREATE TABLE IF NOT EXISTS student_aggregates (
+        id TINYINT PRIMARY KEY,
+        student_count BIGINT NOT NULL DEFAULT 0,
+        {aggregates}
+    )
+    ''',
+    # Removed students and their grades; a student can be archived more than once, so student_id is not unique here
+    '''
+    CREATE TABLE IF NOT EXISTS student_info_archive (
+        student_id VARCHAR(50) NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        phone_number VARCHAR(15),
+        {columns},
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS grade_table_archive (
+        student_id VARCHAR(50) NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        final_grade VARCHAR(4),
+        total_marks FLOAT,
+        percentage FLOAT,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    # An append-only record of the writes to student_info, and the last sequence number handed out (see changelog.py)
+    '''
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq BIGINT PRIMARY KEY,
+        operation VARCHAR(10) NOT NULL,
+        student_id VARCHAR(50) NOT NULL,
+        data TEXT,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS change_log_state (
+        id INT PRIMARY KEY,
+        last_seq BIGINT NOT NULL
+    )
+    ''',
+]
+
+# (table, index name, columns) of the secondary indexes
+INDEXES: List[Tuple[str, str, str]] = [
+    ("student_info", "idx_total_marks", "total_marks"),
+    ("student_info", "idx_lowest_mark", "lowest_mark"),
+    # Lets a per-subject query read only that subject's rows
+    ("student_marks", "idx_student_marks_subject_mark", "subject_id, mark"),
+    ("student_info_archive", "idx_student_info_archive_id", "student_id"),
+    ("grade_table_archive", "idx_grade_table_archive_id", "student_id"),
+]
+
+LEAST_FUNCTIONS: Dict[str, str] = {"mysql": "LEAST", "sqlite": "MIN"}
+
+
+def table_definitions(backend: str) -> List[str]:
+    """
+    The CREATE TABLE statements of TABLES, written out for a backend (mysql or sqlite).
+    """
+    return [query.format(columns=",\n        ".join("{} FLOAT".format(column) for column in SUBJECT_COLUMNS),
+                         total=" + ".join(SUBJECT_COLUMNS), least=LEAST_FUNCTIONS[backend], subjects=", ".join(SUBJECT_COLUMNS),
+                         aggregates=",\n        ".join("{} DOUBLE NOT NULL DEFAULT 0".format(column)
+                                                      for column in SUM_COLUMNS + SUMSQ_COLUMNS))
+            for query in TABLES]
+
+
+def column_exists(cur: Any, table: str, column: str) -> bool:
+    """
+    Checks whether a column exists in a table of the current MySQL database.
+    """
+    cur.execute('''
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    ''', (table, column))
+    return cur.fetchone()[0] > 0
+
+
+def index_exists(cur: Any, table: str, index: str) -> bool:
+    """
+    Checks whether an index exists on a table of the current MySQL database.
+    """
+    cur.execute('''
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    ''', (table, index))
+    return cur.fetchone()[0] > 0
+
+
+def upgrade_mysql_tables(cur: Any) -> None:
+    """
+    Brings MySQL tables created by older versions up to date.
+    """
+    # Add the generated columns to student_info tables that predate them
+    if not column_exists(cur, 'student_info', 'total_marks'):
+        cur.execute("ALTER TABLE student_info ADD COLUMN total_marks DOUBLE AS ({}) STORED".format(" + ".join(SUBJECT_COLUMNS)))
+    if not column_exists(cur, 'student_info', 'lowest_mark'):
+        cur.execute("ALTER TABLE student_info ADD COLUMN lowest_mark FLOAT AS (LEAST({})) STORED".format(", ".join(SUBJECT_COLUMNS)))
+
+    # Older versions used VARCHAR(2), which cannot hold the "Fail" grade
+    cur.execute("ALTER TABLE grade_table MODIFY final_grade VARCHAR(4)")
+
+
+def create_tables(cur: Any, backend: str = "mysql") -> None:
+    """
+    Creates the gradebook's tables and indexes on a MySQL or SQLite cursor, upgrading MySQL tables
+    created by older versions, and seeds the rows the subjects, aggregates and change log tables start with.
+    """
+    for query in table_definitions(backend):
+        cur.execute(query)
+    if backend == "mysql":
+        upgrade_mysql_tables(cur)
+    for table, index, columns in INDEXES:
+        if backend == "sqlite":
+            cur.execute("CREATE INDEX IF NOT EXISTS {} ON {} ({})".format(index, table, columns))
+        elif not index_exists(cur, table, index):
+            cur.execute("CREATE INDEX {} ON {} ({})".format(index, table, columns))
+
+    # student_marks is left to the migration (python marks.py); the aggregates are seeded from student_info
+    seed_subjects(cur)
+    if read_aggregates(cur) is None:
+        check_aggregates(cur, rebuild=True)
+    seed_change_log(cur)
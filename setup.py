@@ -1,24 +1,19 @@
 import mysql.connector as mq
-import os
-from mysql.connector import MySQLConnection
 from dotenv import load_dotenv
 from typing import Union
+from db_pool import get_pool, storage_backend
+from schema import create_tables
 
 load_dotenv()
 
 def get_database_connection() -> Union[mq.MySQLConnection, None]:
     """
-    Establishes a connection to the MySQL database.
+    Checks a connection to the MySQL database out of the shared connection pool.
     Returns:
         mq.MySQLConnection: Database connection object if successful, otherwise None.
     """
     try:
-        con: mq.MySQLConnection = mq.connect(
-            host=os.getenv('host'),
-            user=os.getenv('user'),
-            password=os.getenv('password'),
-            database=os.getenv('database')
-        )
+        con: mq.MySQLConnection = get_pool().get_connection()
         return con
     except mq.Error as e:
         print("Error connecting to the database:", e)
@@ -28,39 +23,23 @@ def main() -> None:
     """
     Main function to set up database tables.
     """
+    backend: str = storage_backend()
+    if backend == 'memory':
+        print("The memory backend keeps its data in the running program; there are no tables to set up.")
+        return
+
     # Connect to the database
     con: Union[mq.MySQLConnection, None] = get_database_connection()
     if con:
         cur: mq.cursor.MySQLCursor = con.cursor()
 
-        # Create student_info table if not exists
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS student_info (
-                student_id VARCHAR(50) PRIMARY KEY,  
-                name VARCHAR(255) NOT NULL,
-                phone_number VARCHAR(15),
-                maths FLOAT,
-                english FLOAT,
-                sst FLOAT,
-                science FLOAT,
-                computer_science FLOAT
-            )
-        ''')
+        # Create the tables (see schema.py), upgrading older ones if needed
+        create_tables(cur, backend)
 
-        # Create grade_table table if not exists
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS grade_table (
-                student_id VARCHAR(50) PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                final_grade VARCHAR(2),
-                total_marks FLOAT,
-                percentage FLOAT
-            )
-        ''')
         # Committing the changes to the database
         con.commit()
 
-        # Closing the database connection
+        # Returning the database connection to the pool
         con.close()
 
 # Entry point of the script
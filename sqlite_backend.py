@@ -0,0 +1,120 @@
+import re
+import sqlite3
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence
+
+import mysql.connector as mq
+
+FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def translate(query: str) -> str:
+    """
+    Rewrites a MySQL-style query for SQLite: %s placeholders become ? and row locks are dropped
+    (the cursor takes the database write lock instead).
+    """
+    return FOR_UPDATE.sub("", query.replace("%s", "?"))
+
+
+def _translate_error(e: sqlite3.Error) -> mq.Error:
+    # Surface SQLite errors as the mysql.connector errors the callers already handle
+    if isinstance(e, sqlite3.IntegrityError):
+        return mq.IntegrityError(msg=str(e))
+    if isinstance(e, sqlite3.OperationalError):
+        return mq.OperationalError(msg=str(e))
+    return mq.DatabaseError(msg=str(e))
+
+
+class SQLiteCursor:
+    """
+    A cursor with the mysql.connector interface used by this project, on top of an sqlite3 cursor.
+    """
+
+    def __init__(self, cur: sqlite3.Cursor) -> None:
+        self._cur = cur
+
+    def execute(self, query: str, params: Optional[Sequence[Any]] = None) -> None:
+        try:
+            if not self._cur.connection.in_transaction and FOR_UPDATE.search(query):
+                # SELECT ... FOR UPDATE: take the write lock now, so the rows read cannot change before the writes
+                self._cur.execute("BEGIN IMMEDIATE")
+            self._cur.execute(translate(query), tuple(params) if params else ())
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def executemany(self, query: str, seq_params: Sequence[Sequence[Any]]) -> None:
+        try:
+            self._cur.executemany(translate(query), [tuple(params) for params in seq_params])
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def fetchone(self) -> Optional[tuple]:
+        return self._cur.fetchone()
+
+    def fetchmany(self, size: int = 1) -> List[tuple]:
+        return self._cur.fetchmany(size)
+
+    def fetchall(self) -> List[tuple]:
+        return self._cur.fetchall()
+
+    def close(self) -> None:
+        self._cur.close()
+
+    @property
+    def rowcount(self) -> int:
+        return self._cur.rowcount
+
+    @property
+    def description(self) -> Any:
+        return self._cur.description
+
+    def __iter__(self) -> Any:
+        return iter(self._cur)
+
+
+class SQLiteConnection:
+    """
+    An sqlite3 connection that behaves like a mysql.connector connection for this project's queries.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            # WAL lets readers run while a writer commits
+            self._con.execute("PRAGMA journal_mode=WAL")
+            self._con.execute("PRAGMA synchronous=NORMAL")
+
+    def cursor(self, buffered: Optional[bool] = None, **kwargs: Any) -> SQLiteCursor:
+        # sqlite3 cursors always stream, so buffered/prepared/etc. make no difference
+        return SQLiteCursor(self._con.cursor())
+
+    def commit(self) -> None:
+        self._con.commit()
+
+    def rollback(self) -> None:
+        self._con.rollback()
+
+    def close(self) -> None:
+        self._con.close()
+
+    def ping(self, reconnect: bool = False, attempts: int = 1, delay: int = 0) -> None:
+        try:
+            self._con.execute("SELECT 1")
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def is_connected(self) -> bool:
+        try:
+            self.ping()
+            return True
+        except mq.Error:
+            return False
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._con.in_transaction
+
+
+def connect_sqlite(path: str) -> SQLiteConnection:
+    return SQLiteConnection(path)
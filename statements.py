@@ -0,0 +1,187 @@
+import threading
+import weakref
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from mysql.connector.constants import FieldType
+
+# Texts of the statements run as server-side prepared statements (see register())
+_registered: Set[str] = set()
+
+
+def register(*statements: str) -> None:
+    """
+    Marks statements as hot: PreparedCursor runs them as prepared statements. Only fixed texts belong
+    here; a statement built per call (e.g. with a variable IN list) would be prepared for a single use.
+    """
+    _registered.update(statements)
+
+
+def is_registered(statement: str) -> bool:
+    return statement in _registered
+
+
+def _float_columns(description: Sequence[Any]) -> List[int]:
+    return [i for i, column in enumerate(description) if column[1] == FieldType.FLOAT]
+
+
+def _normalize_floats(rows: List[Tuple[Any, ...]], columns: List[int]) -> List[Tuple[Any, ...]]:
+    # The binary protocol sends FLOAT columns as 4-byte floats, which widen to e.g. 77.30000305175781;
+    # the text protocol gives the shortest decimal that round-trips (77.3), so convert to that
+    converted: List[Tuple[Any, ...]] = []
+    for row in rows:
+        values: List[Any] = list(row)
+        for i in columns:
+            if values[i] is not None:
+                values[i] = float(str(np.float32(values[i])))
+        converted.append(tuple(values))
+    return converted
+
+
+class StatementCache:
+    """
+    The prepared cursors of one connection, one per registered statement, prepared on first use and kept
+    for the life of the connection: the server parses and plans each statement once per connection, and
+    each call only sends the parameters (and receives rows in the binary protocol).
+    """
+
+    def __init__(self, con: Any) -> None:
+        self._con = con
+        # statement -> (the text passed to the cursor, prepared cursor)
+        self._cursors: Dict[str, Tuple[str, Any]] = {}
+        self.prepares: int = 0
+        self.executions: int = 0
+
+    def cursor(self, statement: str) -> Tuple[str, Any]:
+        """
+        Returns the prepared cursor of a statement and the text to execute on it. mysql.connector
+        re-prepares unless it is given the very same string object, hence the stored text.
+        """
+        entry: Optional[Tuple[str, Any]] = self._cursors.get(statement)
+        if entry is None:
+            entry = (statement, self._con.cursor(prepared=True))
+            self._cursors[statement] = entry
+            self.prepares += 1
+        self.executions += 1
+        return entry
+
+    def __len__(self) -> int:
+        return len(self._cursors)
+
+
+# Keyed by the pooled (raw) connection, so the cache goes when the pool discards the connection
+_caches: "weakref.WeakKeyDictionary[Any, StatementCache]" = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def statement_cache(raw: Any) -> StatementCache:
+    """
+    Returns the statement cache of a raw connection, creating it on first use.
+    """
+    with _caches_lock:
+        cache: Optional[StatementCache] = _caches.get(raw)
+        if cache is None:
+            cache = StatementCache(raw)
+            _caches[raw] = cache
+        return cache
+
+
+def statement_stats() -> Dict[str, int]:
+    """
+    Returns the number of connections with prepared statements, statements prepared and prepared executions.
+    """
+    with _caches_lock:
+        caches: List[StatementCache] = list(_caches.values())
+    return {
+        "connections": len(caches),
+        "prepared": sum(len(cache) for cache in caches),
+        "prepares": sum(cache.prepares for cache in caches),
+        "executions": sum(cache.executions for cache in caches),
+    }
+
+
+class PreparedCursor:
+    """
+    A cursor of a pooled connection that runs the registered statements through the connection's
+    StatementCache and every other statement on an ordinary cursor.
+
+    Results of prepared statements are read in full right away, as prepared cursors do not buffer and
+    the next statement may run on another cursor of the same connection. executemany always uses the
+    ordinary cursor, which sends a batch of INSERTs as one multi-row statement.
+    """
+
+    def __init__(self, con: Any) -> None:
+        self._con = con
+        self._cache: StatementCache = statement_cache(con.raw)
+        self._plain: Optional[Any] = None
+        # The cursor whose results are being read, or None for the rows of a prepared statement
+        self._active: Optional[Any] = None
+        self._rows: List[Tuple[Any, ...]] = []
+        self._position: int = 0
+        self._description: Any = None
+        self._rowcount: int = -1
+
+    def _plain_cursor(self) -> Any:
+        if self._plain is None:
+            self._plain = self._con.cursor()
+        self._active = self._plain
+        return self._plain
+
+    def execute(self, statement: str, params: Optional[Sequence[Any]] = None) -> None:
+        if statement not in _registered:
+            self._plain_cursor().execute(statement, params)
+            return
+        text, cursor = self._cache.cursor(statement)
+        cursor.execute(text, tuple(params) if params else ())
+        self._active = None
+        self._description = cursor.description
+        self._rows = []
+        if cursor.description:
+            self._rows = cursor.fetchall()
+            columns: List[int] = _float_columns(cursor.description)
+            if columns:
+                self._rows = _normalize_floats(self._rows, columns)
+        self._position = 0
+        self._rowcount = cursor.rowcount
+
+    def executemany(self, statement: str, seq_params: Sequence[Sequence[Any]]) -> None:
+        self._plain_cursor().executemany(statement, seq_params)
+
+    def fetchone(self) -> Optional[Tuple[Any, ...]]:
+        if self._active is not None:
+            return self._active.fetchone()
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return self._rows[self._position - 1]
+
+    def fetchmany(self, size: int = 1) -> List[Tuple[Any, ...]]:
+        if self._active is not None:
+            return self._active.fetchmany(size)
+        rows: List[Tuple[Any, ...]] = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self) -> List[Tuple[Any, ...]]:
+        if self._active is not None:
+            return self._active.fetchall()
+        rows: List[Tuple[Any, ...]] = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+    def __iter__(self) -> Iterator[Tuple[Any, ...]]:
+        return iter(self.fetchone, None)
+
+    @property
+    def description(self) -> Any:
+        return self._active.description if self._active is not None else self._description
+
+    @property
+    def rowcount(self) -> int:
+        return self._active.rowcount if self._active is not None else self._rowcount
+
+    def close(self) -> None:
+        # The prepared cursors belong to the connection and stay open for reuse
+        if self._plain is not None:
+            self._plain.close()
+            self._plain = None
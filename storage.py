@@ -0,0 +1,938 @@
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right, insort
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import mysql.connector as mq
+import numpy as np
+
+from aggregates import AGGREGATE_COLUMNS, UPDATE_AGGREGATES_QUERY, aggregate_delta, apply_delta, read_aggregates
+from analytics import load_marks
+from changelog import DELETE, INSERT, INSERT_CHANGE_QUERY, LAST_SEQ_QUERY, NEXT_SEQ_QUERY, UPDATE, change_log_enabled, log_changes
+from db_pool import env_int, get_pool, storage_backend
+from grading import STUDENT_FIELDS, SUBJECT_COLUMNS, SUBJECTS, grade_row
+from marks import SUBJECT_IDS, fetch_subject_report
+from paged_display import ENTRIES_QUERY, iter_entries
+from statements import PreparedCursor, register
+
+# Looks up a student's details and marks, without the generated columns of student_info
+STUDENT_QUERY: str = "SELECT student_id, name, phone_number, maths, english, sst, science, computer_science FROM student_info WHERE student_id=%s"
+
+LOCK_STUDENT_QUERY: str = STUDENT_QUERY + " FOR UPDATE"
+
+INSERT_STUDENT_QUERY: str = """
+    INSERT INTO student_info(student_id, name, phone_number, maths, english, sst, science, computer_science)
+    VALUES(%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+INSERT_GRADE_QUERY: str = """
+    INSERT INTO grade_table(student_id, name, final_grade, total_marks, percentage)
+    VALUES(%s, %s, %s, %s, %s)
+"""
+
+# Replaces all of a student's marks in one statement
+UPDATE_MARKS_QUERY: str = "UPDATE student_info SET {} WHERE student_id=%s".format(
+    ", ".join("{}=%s".format(column) for column in SUBJECT_COLUMNS))
+
+# Rewrites the derived grade_table columns of a student
+UPDATE_GRADE_QUERY: str = "UPDATE grade_table SET name=%s, final_grade=%s, total_marks=%s, percentage=%s WHERE student_id=%s"
+
+DELETE_GRADE_QUERY: str = "DELETE FROM grade_table WHERE student_id=%s"
+DELETE_STUDENT_QUERY: str = "DELETE FROM student_info WHERE student_id=%s"
+
+# Copy students and their grades into the archive tables (see archive.py); formatted with the IN placeholders
+ARCHIVE_STUDENTS_QUERY: str = """
+    INSERT INTO student_info_archive (student_id, name, phone_number, maths, english, sst, science, computer_science)
+    SELECT student_id, name, phone_number, maths, english, sst, science, computer_science
+    FROM student_info WHERE student_id IN ({})
+"""
+
+ARCHIVE_GRADES_QUERY: str = """
+    INSERT INTO grade_table_archive (student_id, name, final_grade, total_marks, percentage)
+    SELECT student_id, name, final_grade, total_marks, percentage
+    FROM grade_table WHERE student_id IN ({})
+"""
+
+# Looks up a student together with their grade_table row in one round-trip
+ENTRY_QUERY: str = ENTRIES_QUERY + " WHERE si.student_id = %s"
+
+# The statements of the single-student lookups and writes, run as prepared statements when enabled
+register(STUDENT_QUERY, LOCK_STUDENT_QUERY, ENTRY_QUERY, INSERT_STUDENT_QUERY, INSERT_GRADE_QUERY, UPDATE_MARKS_QUERY,
+         UPDATE_GRADE_QUERY, DELETE_GRADE_QUERY, DELETE_STUDENT_QUERY, UPDATE_AGGREGATES_QUERY,
+         NEXT_SEQ_QUERY, LAST_SEQ_QUERY, INSERT_CHANGE_QUERY)
+
+BACKENDS: List[str] = ["mysql", "sqlite", "memory"]
+
+# Batches larger than this are added to the in-memory indexes by re-sorting rather than one insert per row
+BULK_INDEX_THRESHOLD: int = 64
+
+
+def fetch_student(cur: Any, student_id: str, for_update: bool = False) -> Optional[Tuple[Any, ...]]:
+    """
+    Fetches a student's student_info row, optionally locking it for the current transaction.
+    """
+    cur.execute(LOCK_STUDENT_QUERY if for_update else STUDENT_QUERY, (student_id,))
+    return cur.fetchone()
+
+
+def fetch_students(cur: Any, student_ids: Sequence[str], for_update: bool = False) -> Dict[str, Tuple[Any, ...]]:
+    """
+    Fetches the student_info rows of several students in one query, keyed by student_id.
+    """
+    if not student_ids:
+        return {}
+    query: str = STUDENT_QUERY.replace("student_id=%s", "student_id IN ({})".format(", ".join(["%s"] * len(student_ids))))
+    cur.execute(query + (" FOR UPDATE" if for_update else ""), list(student_ids))
+    return {row[0]: row for row in cur.fetchall()}
+
+
+@lru_cache(maxsize=None)
+def update_student_query(columns: Tuple[str, ...]) -> str:
+    """
+    The UPDATE of some student_info columns; one text (registered as a prepared statement) per set of columns.
+    """
+    query: str = "UPDATE student_info SET {} WHERE student_id=%s".format(", ".join("{}=%s".format(column) for column in columns))
+    register(query)
+    return query
+
+
+def updated_row(existing: Tuple[Any, ...], changes: Dict[str, Any]) -> Tuple[Any, ...]:
+    """
+    Applies changes (a dict keyed by STUDENT_FIELDS) to a student_info row.
+    """
+    return tuple(changes.get(field, value) for field, value in zip(STUDENT_FIELDS, existing))
+
+
+def student_changes(name: Optional[str] = None, phone_number: Optional[str] = None,
+                    marks: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+    changes: Dict[str, Any] = {}
+    if name is not None:
+        changes["name"] = name
+    if phone_number is not None:
+        changes["phone_number"] = phone_number
+    if marks is not None:
+        changes.update(zip(SUBJECT_COLUMNS, marks))
+    return changes
+
+
+def fetch_entries(cur: Any, student_ids: Sequence[str], for_update: bool = False) -> List[Tuple[Any, ...]]:
+    """
+    Fetches the entries (student_info joined with grade_table) of several students in one query, in student_id order.
+    """
+    if not student_ids:
+        return []
+    query: str = ENTRIES_QUERY + " WHERE si.student_id IN ({}) ORDER BY si.student_id".format(", ".join(["%s"] * len(student_ids)))
+    cur.execute(query + (" FOR UPDATE" if for_update else ""), list(student_ids))
+    return cur.fetchall()
+
+
+def fetch_toppers(cur: Any) -> List[Tuple[Any, ...]]:
+    """
+    Returns (student_id, name, total_marks) of the student(s) with the highest total marks.
+    MAX over the indexed total_marks column is a single index lookup.
+    """
+    cur.execute('''
+        SELECT student_id, name, total_marks FROM student_info
+        WHERE total_marks = (SELECT MAX(total_marks) FROM student_info)
+        ORDER BY student_id
+    ''')
+    return cur.fetchall()
+
+
+def fetch_top_n(cur: Any, n: int) -> List[Tuple[Any, ...]]:
+    """
+    Returns (student_id, name, total_marks) of the top N students by total marks, tied totals by
+    descending student_id: the order of a backward scan of the total_marks index, whose entries end
+    with the primary key, so it is read in order without a sort.
+    """
+    cur.execute('''
+        SELECT student_id, name, total_marks FROM student_info
+        ORDER BY total_marks DESC, student_id DESC
+        LIMIT %s
+    ''', (n,))
+    return cur.fetchall()
+
+
+def failed_condition(after: Optional[str]) -> Tuple[str, List[Any]]:
+    # The failed students, after a student_id if given
+    if after is None:
+        return "lowest_mark < 50", []
+    return "lowest_mark < 50 AND student_id > %s", [after]
+
+
+def fetch_failed_students(cur: Any, after: Optional[str] = None, limit: Optional[int] = None) -> List[Tuple[Any, ...]]:
+    """
+    Returns (student_id, name, total_marks) of the students with at least one mark below 50, by student_id,
+    after a student_id and up to limit of them, using a range scan on the lowest_mark index.
+    """
+    condition, params = failed_condition(after)
+    query: str = "SELECT student_id, name, total_marks FROM student_info WHERE {} ORDER BY student_id".format(condition)
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    cur.execute(query, params)
+    return cur.fetchall()
+
+
+def count_failed_students(cur: Any, after: Optional[str] = None) -> int:
+    """
+    Counts the students with at least one mark below 50 (after a student_id), from the lowest_mark index alone.
+    """
+    condition, params = failed_condition(after)
+    cur.execute("SELECT COUNT(*) FROM student_info WHERE {}".format(condition), params)
+    return cur.fetchone()[0]
+
+
+def fetch_rank(cur: Any, student_id: str) -> Optional[Tuple[float, int, int]]:
+    """
+    Returns (total_marks, students with a higher total, students) for a student, or None.
+    The higher totals are counted with a range scan of the total_marks index, so the cost grows with
+    the student's rank (and the COUNT(*) of all students with the table); ranking.RankIndex is O(log n).
+    """
+    cur.execute('''
+        SELECT si.total_marks,
+               (SELECT COUNT(*) FROM student_info higher WHERE higher.total_marks > si.total_marks),
+               (SELECT COUNT(*) FROM student_info)
+        FROM student_info si WHERE si.student_id = %s
+    ''', (student_id,))
+    row = cur.fetchone()
+    return (float(row[0]), int(row[1]), int(row[2])) if row else None
+
+
+def fetch_total_at(cur: Any, position: int) -> Optional[float]:
+    """
+    Returns the total marks at a position of the ranking (0 is the highest), read along the total_marks
+    index; OFFSET steps over the position's entries, so the cost grows with the position.
+    """
+    cur.execute("SELECT total_marks FROM student_info ORDER BY total_marks DESC LIMIT 1 OFFSET %s", (position,))
+    row = cur.fetchone()
+    return float(row[0]) if row else None
+
+
+def fetch_entry(cur: Any, student_id: str) -> Optional[Tuple[Any, ...]]:
+    """
+    Fetches a student's student_info row joined with their grade_table row.
+    """
+    cur.execute(ENTRY_QUERY, (student_id,))
+    return cur.fetchone()
+
+
+class Storage(ABC):
+    """
+    Where the students and their grades are kept. Rows are tuples in the column order of the
+    queries above: student rows as student_info (STUDENT_FIELDS), grade rows as grade_table and
+    entries as ENTRIES_QUERY. Every write keeps the class-wide aggregates up to date atomically.
+    A backend implements every abstract method, or it cannot be created.
+    """
+
+    name: str = ""
+
+    @abstractmethod
+    def fetch_entry(self, student_id: str) -> Optional[Tuple[Any, ...]]:
+        """
+        Returns a student's entry (student row followed by final grade, total marks and percentage), or None.
+        """
+
+    @abstractmethod
+    def add_student(self, student_row: Tuple[Any, ...], grade_row: Tuple[Any, ...]) -> bool:
+        """
+        Stores a new student with their grade row. Returns False if the student ID is taken.
+        """
+
+    @abstractmethod
+    def insert_students(self, rows: Sequence[Tuple[Tuple[Any, ...], Tuple[Any, ...]]]) -> int:
+        """
+        Stores a batch of (student row, grade row) pairs all-or-nothing, raising mq.IntegrityError
+        if any student ID is taken. Returns the number stored.
+        """
+
+    @abstractmethod
+    def update_student(self, student_id: str, name: Optional[str] = None, phone_number: Optional[str] = None,
+                       marks: Optional[Sequence[float]] = None) -> Optional[Tuple[Any, ...]]:
+        """
+        Changes the given details of a student, rewriting their grade row to match, in one transaction.
+        Returns their student row from before the change, or None.
+        """
+
+    @abstractmethod
+    def update_marks(self, updates: Sequence[Tuple[str, Sequence[float]]]) -> List[Tuple[Any, ...]]:
+        """
+        Replaces the marks of a batch of students, given as (student_id, marks) pairs, and rewrites
+        their grade rows, all in one transaction. Students that do not exist are skipped; if a student
+        is given twice the last marks win. Returns the student rows, from before the change, of the
+        students updated.
+        """
+
+    @abstractmethod
+    def remove_student(self, student_id: str) -> Optional[Tuple[Any, ...]]:
+        """
+        Removes a student and their grade row. Returns the removed student row, or None.
+        """
+
+    @abstractmethod
+    def remove_students(self, student_ids: Sequence[str], archive: bool = False,
+                        before_commit: Optional[Callable[[List[Tuple[Any, ...]]], None]] = None) -> List[Tuple[Any, ...]]:
+        """
+        Removes a batch of students and their grade rows in one transaction, first copying them to the
+        archive tables when archive is set. before_commit is called with the entries being removed just
+        before the transaction commits; if it raises, nothing is removed. Students that do not exist are
+        skipped. Returns the removed entries in student_id order.
+        """
+
+    @abstractmethod
+    def toppers(self) -> List[Tuple[Any, ...]]:
+        """
+        Returns (student_id, name, total_marks) of the student(s) with the highest total marks, by student_id.
+        """
+
+    @abstractmethod
+    def top_n(self, n: int) -> List[Tuple[Any, ...]]:
+        """
+        Returns (student_id, name, total_marks) of the top N students by total marks, tied totals by descending student_id.
+        """
+
+    @abstractmethod
+    def failed_students(self, after: Optional[str] = None, limit: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        """
+        Returns (student_id, name, total_marks) of the students with a mark below 50, by student_id,
+        after a student_id and up to limit of them.
+        """
+
+    @abstractmethod
+    def count_failed(self, after: Optional[str] = None) -> int:
+        """
+        Returns the number of students with a mark below 50 (after a student_id).
+        """
+
+    @abstractmethod
+    def count_students(self) -> int:
+        """
+        Returns the number of students.
+        """
+
+    @abstractmethod
+    def existing_ids(self, student_ids: Sequence[str]) -> Set[str]:
+        """
+        Returns which of the given student IDs are stored, with one lookup for the batch.
+        """
+
+    @abstractmethod
+    def iter_entries(self, filters: Optional[Dict[str, Any]] = None, after: Optional[str] = None,
+                     before: Optional[str] = None, limit: Optional[int] = None,
+                     batch_size: int = 500) -> Iterator[Tuple[Any, ...]]:
+        """
+        Streams entries in student_id order, with the filters and keyset pagination of paged_display.iter_entries.
+        """
+
+    @abstractmethod
+    def aggregates(self) -> Optional[Dict[str, float]]:
+        """
+        Returns the class-wide aggregates (see aggregates.AGGREGATE_COLUMNS), or None if they are not set up.
+        """
+
+    @abstractmethod
+    def load_marks(self) -> Tuple[List[str], np.ndarray]:
+        """
+        Returns the student IDs in order and an (n_students, n_subjects) array of their marks.
+        """
+
+    @abstractmethod
+    def subject_report(self, subject_id: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        """
+        Returns the per-subject rows of marks.fetch_subject_report, for every subject or just one.
+        """
+
+    @abstractmethod
+    def student_totals(self) -> List[Tuple[str, float]]:
+        """
+        Returns (student_id, total_marks) of every student, to build a ranking from.
+        """
+
+    def total_marks(self, marks: Sequence[float]) -> float:
+        """
+        The total_marks this storage keeps for a student with these marks, exactly as student_totals and
+        rank return it. Writes record this value in the rank index, so that tied students stay tied.
+        """
+        return float(sum(marks))
+
+    @abstractmethod
+    def rank(self, student_id: str) -> Optional[Tuple[float, int, int]]:
+        """
+        Returns (total_marks, students with a higher total, students) for a student, or None.
+        """
+
+    @abstractmethod
+    def total_at(self, position: int) -> Optional[float]:
+        """
+        Returns the total marks at a position of the ranking by total marks (0 is the highest), or None.
+        """
+
+
+class SQLStorage(Storage):
+    """
+    Storage in a SQL database (MySQL, or SQLite through sqlite_backend), reached through the shared connection pool.
+    """
+
+    def __init__(self, name: str = "mysql", grade_queue: Optional[Any] = None, prepared: bool = False,
+                 change_log: bool = False) -> None:
+        self.name = name
+        # With a grade_queue.GradeQueue, grade_table rows are written behind by its worker instead of with each change
+        self.grade_queue = grade_queue
+        # Run the registered single-student statements as prepared statements (see statements.py)
+        self.prepared: bool = prepared
+        # Record every write in the change log, in the write's transaction (see changelog.py)
+        self.change_log: bool = change_log
+
+    def log_changes(self, cur: Any, operation: str, student_rows: Sequence[Sequence[Any]]) -> None:
+        if self.change_log:
+            log_changes(cur, operation, student_rows)
+
+    def connection(self) -> Any:
+        return get_pool().get_connection()
+
+    def cursor(self, con: Any) -> Any:
+        """
+        A cursor for the single-student operations: a PreparedCursor when prepared statements are enabled.
+        """
+        return PreparedCursor(con) if self.prepared else con.cursor()
+
+    def fetch_entry(self, student_id: str) -> Optional[Tuple[Any, ...]]:
+        with self.connection() as con:
+            return fetch_entry(self.cursor(con), student_id)
+
+    def add_student(self, student_row: Tuple[Any, ...], grade_row: Tuple[Any, ...]) -> bool:
+        with self.connection() as con:
+            cur = self.cursor(con)
+            if fetch_student(cur, student_row[0]):
+                return False
+            try:
+                cur.execute(INSERT_STUDENT_QUERY, student_row)
+                if self.grade_queue is not None:
+                    # Queued before the commit, so that a crash can at worst leave a harmless extra entry,
+                    # and confirmed after it, so that a batch reading the row before the commit is redone
+                    self.grade_queue.enqueue([student_row[0]])
+                else:
+                    cur.execute(INSERT_GRADE_QUERY, grade_row)
+
+                # Fold the marks into the class-wide aggregates in the same transaction
+                apply_delta(cur, added=[student_row[3:]])
+                self.log_changes(cur, INSERT, [student_row])
+                con.commit()
+            except mq.IntegrityError:
+                con.rollback()
+                return False
+        if self.grade_queue is not None:
+            self.grade_queue.committed([student_row[0]])
+        return True
+
+    def insert_students(self, rows: Sequence[Tuple[Tuple[Any, ...], Tuple[Any, ...]]]) -> int:
+        with self.connection() as con:
+            cur = con.cursor()
+            try:
+                cur.executemany(INSERT_STUDENT_QUERY, [student_row for student_row, _ in rows])
+                if self.grade_queue is not None:
+                    self.grade_queue.enqueue([student_row[0] for student_row, _ in rows])
+                else:
+                    cur.executemany(INSERT_GRADE_QUERY, [grade for _, grade in rows])
+                apply_delta(cur, added=[student_row[3:] for student_row, _ in rows])
+                self.log_changes(cur, INSERT, [student_row for student_row, _ in rows])
+                con.commit()
+            except mq.Error:
+                con.rollback()
+                raise
+        if self.grade_queue is not None:
+            self.grade_queue.committed([student_row[0] for student_row, _ in rows])
+        return len(rows)
+
+    def update_student(self, student_id: str, name: Optional[str] = None, phone_number: Optional[str] = None,
+                       marks: Optional[Sequence[float]] = None) -> Optional[Tuple[Any, ...]]:
+        changes: Dict[str, Any] = student_changes(name, phone_number, marks)
+        with self.connection() as con:
+            cur = self.cursor(con)
+            # Lock the row so the aggregates see the exact marks being replaced
+            existing: Optional[Tuple[Any, ...]] = fetch_student(cur, student_id, for_update=True)
+            if not existing:
+                return None
+            if not changes:
+                return existing
+
+            # Every changed column in one statement, and the grade row recomputed alongside
+            cur.execute(update_student_query(tuple(changes)), list(changes.values()) + [student_id])
+            if name is not None or marks is not None:
+                if self.grade_queue is not None:
+                    self.grade_queue.enqueue([student_id])
+                else:
+                    cur.execute(UPDATE_GRADE_QUERY, grade_row(updated_row(existing, changes))[1:] + (student_id,))
+            if marks is not None:
+                apply_delta(cur, added=[marks], removed=[existing[3:]])
+            self.log_changes(cur, UPDATE, [updated_row(existing, changes)])
+            con.commit()
+        if self.grade_queue is not None and (name is not None or marks is not None):
+            self.grade_queue.committed([student_id])
+        return existing
+
+    def update_marks(self, updates: Sequence[Tuple[str, Sequence[float]]]) -> List[Tuple[Any, ...]]:
+        wanted: Dict[str, Sequence[float]] = dict(updates)
+        with self.connection() as con:
+            cur = con.cursor()
+            try:
+                # Lock the whole batch with one query
+                existing: Dict[str, Tuple[Any, ...]] = fetch_students(cur, list(wanted), for_update=True)
+                found: List[Tuple[Any, ...]] = [existing[student_id] for student_id in wanted if student_id in existing]
+                if not found:
+                    con.rollback()
+                    return []
+                rows: List[Tuple[Any, ...]] = [row[:3] + tuple(wanted[row[0]]) for row in found]
+                cur.executemany(UPDATE_MARKS_QUERY, [row[3:] + (row[0],) for row in rows])
+                if self.grade_queue is not None:
+                    self.grade_queue.enqueue([row[0] for row in rows])
+                else:
+                    cur.executemany(UPDATE_GRADE_QUERY, [grade_row(row)[1:] + (row[0],) for row in rows])
+                apply_delta(cur, added=[row[3:] for row in rows], removed=[row[3:] for row in found])
+                self.log_changes(cur, UPDATE, rows)
+                con.commit()
+            except mq.Error:
+                con.rollback()
+                raise
+        if self.grade_queue is not None:
+            self.grade_queue.committed([row[0] for row in found])
+        return found
+
+    def remove_student(self, student_id: str) -> Optional[Tuple[Any, ...]]:
+        with self.connection() as con:
+            cur = self.cursor(con)
+            try:
+                # Lock the row and take its current marks out of the aggregates
+                existing: Optional[Tuple[Any, ...]] = fetch_student(cur, student_id, for_update=True)
+                if not existing:
+                    return None
+                apply_delta(cur, removed=[existing[3:]])
+
+                if self.grade_queue is not None:
+                    # The worker deletes the grade row of a student who no longer exists
+                    self.grade_queue.enqueue([student_id])
+                else:
+                    cur.execute(DELETE_GRADE_QUERY, (student_id,))
+                cur.execute(DELETE_STUDENT_QUERY, (student_id,))
+                self.log_changes(cur, DELETE, [existing])
+                con.commit()
+            except mq.Error:
+                con.rollback()
+                raise
+        if self.grade_queue is not None:
+            self.grade_queue.committed([student_id])
+        return existing
+
+    def remove_students(self, student_ids: Sequence[str], archive: bool = False,
+                        before_commit: Optional[Callable[[List[Tuple[Any, ...]]], None]] = None) -> List[Tuple[Any, ...]]:
+        if archive and self.grade_queue is not None:
+            # The archive copies grade_table, so bring it up to date first
+            self.grade_queue.flush()
+        with self.connection() as con:
+            cur = con.cursor()
+            try:
+                # Lock the batch, then copy, delete and take it out of the aggregates in the same transaction
+                entries: List[Tuple[Any, ...]] = fetch_entries(cur, student_ids, for_update=True)
+                if entries:
+                    found: List[str] = [entry[0] for entry in entries]
+                    placeholders: str = ", ".join(["%s"] * len(found))
+                    if archive:
+                        cur.execute(ARCHIVE_STUDENTS_QUERY.format(placeholders), found)
+                        cur.execute(ARCHIVE_GRADES_QUERY.format(placeholders), found)
+                    apply_delta(cur, removed=[entry[3:8] for entry in entries])
+                    if self.grade_queue is not None:
+                        self.grade_queue.enqueue(found)
+                    else:
+                        cur.execute("DELETE FROM grade_table WHERE student_id IN ({})".format(placeholders), found)
+                    cur.execute("DELETE FROM student_info WHERE student_id IN ({})".format(placeholders), found)
+                    self.log_changes(cur, DELETE, [entry[:8] for entry in entries])
+                    if before_commit is not None:
+                        before_commit(entries)
+                con.commit()
+            except Exception:
+                con.rollback()
+                raise
+        if self.grade_queue is not None:
+            self.grade_queue.committed([entry[0] for entry in entries])
+        return entries
+
+    def toppers(self) -> List[Tuple[Any, ...]]:
+        with self.connection() as con:
+            return fetch_toppers(con.cursor())
+
+    def top_n(self, n: int) -> List[Tuple[Any, ...]]:
+        with self.connection() as con:
+            return fetch_top_n(con.cursor(), n)
+
+    def failed_students(self, after: Optional[str] = None, limit: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        with self.connection() as con:
+            return fetch_failed_students(con.cursor(), after, limit)
+
+    def count_failed(self, after: Optional[str] = None) -> int:
+        with self.connection() as con:
+            return count_failed_students(con.cursor(), after)
+
+    def count_students(self) -> int:
+        with self.connection() as con:
+            cur = con.cursor()
+            cur.execute("SELECT COUNT(*) FROM student_info")
+            return cur.fetchone()[0]
+
+    def existing_ids(self, student_ids: Sequence[str]) -> Set[str]:
+        if not student_ids:
+            return set()
+        with self.connection() as con:
+            cur = con.cursor()
+            cur.execute("SELECT student_id FROM student_info WHERE student_id IN ({})".format(
+                ", ".join(["%s"] * len(student_ids))), list(student_ids))
+            return {row[0] for row in cur.fetchall()}
+
+    def iter_entries(self, filters: Optional[Dict[str, Any]] = None, after: Optional[str] = None,
+                     before: Optional[str] = None, limit: Optional[int] = None,
+                     batch_size: int = 500) -> Iterator[Tuple[Any, ...]]:
+        # Holds a pooled connection while the caller iterates
+        with self.connection() as con:
+            yield from iter_entries(con, filters, after, before, limit, batch_size)
+
+    def aggregates(self) -> Optional[Dict[str, float]]:
+        with self.connection() as con:
+            return read_aggregates(con.cursor())
+
+    def load_marks(self) -> Tuple[List[str], np.ndarray]:
+        with self.connection() as con:
+            return load_marks(con.cursor())
+
+    def subject_report(self, subject_id: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        with self.connection() as con:
+            return fetch_subject_report(con.cursor(), subject_id)
+
+    def student_totals(self) -> List[Tuple[str, float]]:
+        with self.connection() as con:
+            cur = con.cursor()
+            cur.execute("SELECT student_id, total_marks FROM student_info")
+            return cur.fetchall()
+
+    def total_marks(self, marks: Sequence[float]) -> float:
+        if self.name != "mysql":
+            return float(sum(marks))
+        # MySQL keeps the marks as single-precision FLOAT, which the generated column sums as DOUBLE
+        return float(sum(float(np.float32(mark)) for mark in marks))
+
+    def rank(self, student_id: str) -> Optional[Tuple[float, int, int]]:
+        with self.connection() as con:
+            return fetch_rank(con.cursor(), student_id)
+
+    def total_at(self, position: int) -> Optional[float]:
+        with self.connection() as con:
+            return fetch_total_at(con.cursor(), position)
+
+
+class MemoryStorage(Storage):
+    """
+    Storage in this process only: dicts keyed by student_id, plus sorted lists standing in for the
+    primary key and the total_marks / lowest_mark indexes. Nothing is persisted, so it suits
+    tests, benchmarks and single-process runs. Errors are raised as the mysql.connector errors
+    the SQL backends raise.
+    """
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._students: Dict[str, Tuple[Any, ...]] = {}
+        self._grades: Dict[str, Tuple[Any, ...]] = {}
+        # Sorted student IDs, (total_marks, student_id) and (lowest_mark, student_id) pairs
+        self._ids: List[str] = []
+        self._by_total: List[Tuple[float, str]] = []
+        self._by_lowest: List[Tuple[float, str]] = []
+        self._aggregates: List[float] = [0.0] * len(AGGREGATE_COLUMNS)
+        # Archived (student row, grade row) pairs, like the archive tables
+        self._archive: List[Tuple[Tuple[Any, ...], Optional[Tuple[Any, ...]]]] = []
+
+    def _index(self, student_row: Tuple[Any, ...]) -> None:
+        marks: Tuple[float, ...] = student_row[3:]
+        insort(self._ids, student_row[0])
+        insort(self._by_total, (sum(marks), student_row[0]))
+        insort(self._by_lowest, (min(marks), student_row[0]))
+
+    def _index_many(self, student_rows: List[Tuple[Any, ...]]) -> None:
+        # Appending and re-sorting (a merge of two sorted runs for Timsort) beats one insort per row
+        self._ids.extend(student_row[0] for student_row in student_rows)
+        self._by_total.extend((sum(student_row[3:]), student_row[0]) for student_row in student_rows)
+        self._by_lowest.extend((min(student_row[3:]), student_row[0]) for student_row in student_rows)
+        for index in (self._ids, self._by_total, self._by_lowest):
+            index.sort()
+
+    def _unindex(self, student_row: Tuple[Any, ...]) -> None:
+        marks: Tuple[float, ...] = student_row[3:]
+        for index, key in ((self._ids, student_row[0]), (self._by_total, (sum(marks), student_row[0])), (self._by_lowest, (min(marks), student_row[0]))):
+            del index[bisect_left(index, key)]
+
+    def _apply_delta(self, added: Sequence[Sequence[float]] = (), removed: Sequence[Sequence[float]] = ()) -> None:
+        self._aggregates = [value + change for value, change in zip(self._aggregates, aggregate_delta(added, removed))]
+
+    def _entry(self, student_id: str) -> Tuple[Any, ...]:
+        grade: Optional[Tuple[Any, ...]] = self._grades.get(student_id)
+        return self._students[student_id] + (grade[2:] if grade else (None, None, None))
+
+    def _status_rows(self, student_ids: Sequence[str]) -> List[Tuple[Any, ...]]:
+        return [(student_id, self._students[student_id][1], sum(self._students[student_id][3:])) for student_id in student_ids]
+
+    def fetch_entry(self, student_id: str) -> Optional[Tuple[Any, ...]]:
+        with self._lock:
+            return self._entry(student_id) if student_id in self._students else None
+
+    def add_student(self, student_row: Tuple[Any, ...], grade_row: Tuple[Any, ...]) -> bool:
+        try:
+            self.insert_students([(student_row, grade_row)])
+            return True
+        except mq.IntegrityError:
+            return False
+
+    def insert_students(self, rows: Sequence[Tuple[Tuple[Any, ...], Tuple[Any, ...]]]) -> int:
+        with self._lock:
+            # Check the whole batch first so it goes in all-or-nothing
+            seen: set = set()
+            for student_row, _ in rows:
+                if student_row[0] in self._students or student_row[0] in seen:
+                    raise mq.IntegrityError(msg="Duplicate entry '{}' for key 'PRIMARY'".format(student_row[0]))
+                seen.add(student_row[0])
+
+            student_rows: List[Tuple[Any, ...]] = []
+            for student_row, grade in rows:
+                student_rows.append(tuple(student_row))
+                self._students[student_row[0]] = student_rows[-1]
+                self._grades[student_row[0]] = tuple(grade)
+            if len(student_rows) > BULK_INDEX_THRESHOLD:
+                self._index_many(student_rows)
+            else:
+                for student_row in student_rows:
+                    self._index(student_row)
+            self._apply_delta(added=[student_row[3:] for student_row, _ in rows])
+        return len(rows)
+
+    def update_student(self, student_id: str, name: Optional[str] = None, phone_number: Optional[str] = None,
+                       marks: Optional[Sequence[float]] = None) -> Optional[Tuple[Any, ...]]:
+        with self._lock:
+            existing: Optional[Tuple[Any, ...]] = self._students.get(student_id)
+            if existing is None:
+                return None
+            self._replace(existing, updated_row(existing, student_changes(name, phone_number, marks)))
+        return existing
+
+    def update_marks(self, updates: Sequence[Tuple[str, Sequence[float]]]) -> List[Tuple[Any, ...]]:
+        wanted: Dict[str, Sequence[float]] = dict(updates)
+        with self._lock:
+            found: List[Tuple[Any, ...]] = [self._students[student_id] for student_id in wanted if student_id in self._students]
+            for existing in found:
+                self._replace(existing, existing[:3] + tuple(wanted[existing[0]]))
+        return found
+
+    def _replace(self, existing: Tuple[Any, ...], updated: Tuple[Any, ...]) -> None:
+        # Swaps a student row for its updated version, keeping the grade row, indexes and aggregates in step
+        student_id: str = existing[0]
+        self._students[student_id] = updated
+        if student_id in self._grades:
+            self._grades[student_id] = grade_row(updated)
+        if updated[3:] != existing[3:]:
+            self._unindex(existing)
+            self._index(updated)
+            self._apply_delta(added=[updated[3:]], removed=[existing[3:]])
+
+    def remove_student(self, student_id: str) -> Optional[Tuple[Any, ...]]:
+        with self._lock:
+            existing: Optional[Tuple[Any, ...]] = self._students.pop(student_id, None)
+            if existing is None:
+                return None
+            self._grades.pop(student_id, None)
+            self._unindex(existing)
+            self._apply_delta(removed=[existing[3:]])
+        return existing
+
+    def remove_students(self, student_ids: Sequence[str], archive: bool = False,
+                        before_commit: Optional[Callable[[List[Tuple[Any, ...]]], None]] = None) -> List[Tuple[Any, ...]]:
+        with self._lock:
+            found: List[str] = sorted(set(student_id for student_id in student_ids if student_id in self._students))
+            entries: List[Tuple[Any, ...]] = [self._entry(student_id) for student_id in found]
+            # Called before anything changes, so a failure leaves the students in place
+            if entries and before_commit is not None:
+                before_commit(entries)
+            for student_id in found:
+                existing: Tuple[Any, ...] = self._students.pop(student_id)
+                grade: Optional[Tuple[Any, ...]] = self._grades.pop(student_id, None)
+                if archive:
+                    self._archive.append((existing, grade))
+                self._unindex(existing)
+            self._apply_delta(removed=[entry[3:8] for entry in entries])
+        return entries
+
+    def toppers(self) -> List[Tuple[Any, ...]]:
+        with self._lock:
+            if not self._by_total:
+                return []
+            # Every student tied with the highest total, at the end of the index
+            highest: float = self._by_total[-1][0]
+            start: int = bisect_left(self._by_total, (highest, ""))
+            return self._status_rows(sorted(student_id for _, student_id in self._by_total[start:]))
+
+    def top_n(self, n: int) -> List[Tuple[Any, ...]]:
+        with self._lock:
+            # Ties come out by descending student_id, as from the SQL backends
+            return self._status_rows([student_id for _, student_id in reversed(self._by_total[-n:])])
+
+    def _failed_ids(self, after: Optional[str]) -> List[str]:
+        end: int = bisect_left(self._by_lowest, (50.0, ""))
+        return sorted(student_id for _, student_id in self._by_lowest[:end] if after is None or student_id > after)
+
+    def failed_students(self, after: Optional[str] = None, limit: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        with self._lock:
+            return self._status_rows(self._failed_ids(after)[:limit])
+
+    def count_failed(self, after: Optional[str] = None) -> int:
+        with self._lock:
+            return len(self._failed_ids(after))
+
+    def count_students(self) -> int:
+        with self._lock:
+            return len(self._students)
+
+    def existing_ids(self, student_ids: Sequence[str]) -> Set[str]:
+        with self._lock:
+            return {student_id for student_id in student_ids if student_id in self._students}
+
+    def _matches(self, entry: Tuple[Any, ...], filters: Dict[str, Any]) -> bool:
+        # The same conditions as paged_display.build_filters (LIKE is case-insensitive in MySQL)
+        if filters.get("name") and filters["name"].lower() not in entry[1].lower():
+            return False
+        if filters.get("final_grade") and entry[8] != filters["final_grade"]:
+            return False
+        if filters.get("min_percentage") is not None and (entry[10] is None or entry[10] < filters["min_percentage"]):
+            return False
+        if filters.get("below_percentage") is not None and (entry[10] is None or entry[10] >= filters["below_percentage"]):
+            return False
+        if filters.get("student_id_prefix") and not entry[0].lower().startswith(filters["student_id_prefix"].lower()):
+            return False
+        return True
+
+    def iter_entries(self, filters: Optional[Dict[str, Any]] = None, after: Optional[str] = None,
+                     before: Optional[str] = None, limit: Optional[int] = None,
+                     batch_size: int = 500) -> Iterator[Tuple[Any, ...]]:
+        filters = filters or {}
+        remaining: float = float("inf") if limit is None else limit
+
+        if before is not None:
+            # Walk backwards from before; a previous page is at most limit rows
+            page: List[Tuple[Any, ...]] = []
+            with self._lock:
+                position: int = bisect_left(self._ids, before)
+                while position > 0 and len(page) < remaining:
+                    position -= 1
+                    student_id: str = self._ids[position]
+                    if after is not None and student_id <= after:
+                        break
+                    entry: Tuple[Any, ...] = self._entry(student_id)
+                    if self._matches(entry, filters):
+                        page.append(entry)
+            yield from reversed(page)
+            return
+
+        # Keyset batches: each batch is read under the lock, so writers can run in between
+        last: Optional[str] = after
+        while remaining > 0:
+            with self._lock:
+                position = 0 if last is None else bisect_right(self._ids, last)
+                student_ids: List[str] = self._ids[position:position + batch_size]
+                batch: List[Tuple[Any, ...]] = [self._entry(student_id) for student_id in student_ids]
+            if not student_ids:
+                return
+            last = student_ids[-1]
+            for entry in batch:
+                if self._matches(entry, filters):
+                    yield entry
+                    remaining -= 1
+                    if remaining <= 0:
+                        return
+
+    def aggregates(self) -> Optional[Dict[str, float]]:
+        with self._lock:
+            return dict(zip(AGGREGATE_COLUMNS, self._aggregates))
+
+    def load_marks(self) -> Tuple[List[str], np.ndarray]:
+        with self._lock:
+            student_ids: List[str] = list(self._ids)
+            marks: np.ndarray = np.array([self._students[student_id][3:] for student_id in student_ids],
+                                         dtype=np.float64).reshape(len(student_ids), len(SUBJECTS))
+        return student_ids, marks
+
+    def subject_report(self, subject_id: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        _, marks = self.load_marks()
+        if not len(marks):
+            return []
+        report: List[Tuple[Any, ...]] = []
+        for j, (current_id, subject) in enumerate(zip(SUBJECT_IDS, SUBJECTS)):
+            if subject_id is None or subject_id == current_id:
+                column: np.ndarray = marks[:, j]
+                report.append((subject, len(column), float(column.sum()), float((column * column).sum()),
+                               float(column.min()), float(column.max()), int((column < 50).sum())))
+        return report
+
+    def student_totals(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            return [(student_id, total) for total, student_id in self._by_total]
+
+    def rank(self, student_id: str) -> Optional[Tuple[float, int, int]]:
+        with self._lock:
+            student: Optional[Tuple[Any, ...]] = self._students.get(student_id)
+            if student is None:
+                return None
+            total: float = sum(student[3:])
+            # The total_marks index is ascending, so the higher totals are the ones after the last tie
+            return total, len(self._by_total) - bisect_right(self._by_total, (total, chr(0x10FFFF))), len(self._by_total)
+
+    def total_at(self, position: int) -> Optional[float]:
+        with self._lock:
+            if not 0 <= position < len(self._by_total):
+                return None
+            return self._by_total[len(self._by_total) - 1 - position][0]
+
+
+def create_storage(backend: Optional[str] = None) -> Storage:
+    """
+    Creates the storage for a backend name (mysql, sqlite or memory), by default the configured one.
+    """
+    backend = backend or storage_backend()
+    if backend == "memory":
+        return MemoryStorage()
+    if backend in ("mysql", "sqlite"):
+        # Imported here because grade_queue builds on this module
+        from grade_queue import get_grade_queue, grade_queue_enabled
+        return SQLStorage(backend, get_grade_queue() if grade_queue_enabled() else None,
+                          prepared=backend == "mysql" and env_int('prepared_statements', 0) > 0,
+                          change_log=change_log_enabled())
+    raise ValueError("Unknown storage backend '{}', expected one of: {}.".format(backend, ", ".join(BACKENDS)))
+
+
+_storage: Optional[Storage] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> Storage:
+    """
+    Returns the process-wide storage, chosen by the backend setting of the .env file.
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
+
+
+def set_storage(storage: Storage) -> None:
+    """
+    Replaces the process-wide storage, e.g. to run every operation against another backend.
+    """
+    global _storage
+    with _storage_lock:
+        _storage = storage
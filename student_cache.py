@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from db_pool import env_float, env_int
+
+# Marker for "not cached", since None is a cached answer (the student does not exist)
+MISS: object = object()
+
+
+class StudentCache:
+    """
+    An in-process LRU cache with a time-to-live, keyed by student_id.
+
+    Values are whatever the caller stores (None records that a student does not exist).
+    invalidate() leaves a tombstone behind, so a reader that fetched from the database
+    before a write cannot put the old value back afterwards.
+    Writes made by other processes are only picked up once entries expire (after ttl seconds).
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 60.0) -> None:
+        self.max_entries: int = max_entries
+        self.ttl: float = ttl
+        # student_id -> (expires_at, value, version); value is MISS for a tombstone
+        self._entries: "OrderedDict[str, Tuple[float, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: int = 0
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def version(self) -> int:
+        """
+        Token to take before reading from the database and to pass to put().
+        """
+        with self._lock:
+            return self._version
+
+    def get(self, student_id: str) -> Any:
+        """
+        Returns the cached value, or MISS.
+        """
+        if not self.enabled:
+            return MISS
+        with self._lock:
+            entry: Optional[Tuple[float, Any, int]] = self._entries.get(student_id)
+            if entry is None or entry[1] is MISS:
+                self._stats["misses"] += 1
+                return MISS
+            if entry[0] < time.monotonic():
+                del self._entries[student_id]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return MISS
+            self._entries.move_to_end(student_id)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def put(self, student_id: str, value: Any, version: int) -> None:
+        """
+        Caches a value read from the database, unless the student was invalidated after version was taken.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            entry: Optional[Tuple[float, Any, int]] = self._entries.get(student_id)
+            if entry is not None and entry[2] > version:
+                return
+            self._entries[student_id] = (time.monotonic() + self.ttl, value, version)
+            self._entries.move_to_end(student_id)
+            self._evict()
+
+    def invalidate(self, student_id: str) -> None:
+        """
+        Drops a student from the cache; call it after every write to that student.
+        """
+        with self._lock:
+            # Counted even when disabled, since other caches (e.g. http_api's responses) follow the version
+            self._version += 1
+            if not self.enabled:
+                return
+            self._entries[student_id] = (time.monotonic() + self.ttl, MISS, self._version)
+            self._entries.move_to_end(student_id)
+            self._stats["invalidations"] += 1
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def _evict(self) -> None:
+        # Drop the least recently used entries beyond the size limit
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the hit/miss/eviction counters, for tuning the cache size.
+        """
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+            snapshot["size"] = len(self._entries)
+        snapshot["max_entries"] = self.max_entries
+        snapshot["ttl"] = self.ttl
+        lookups: int = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = snapshot["hits"] / lookups if lookups else 0.0
+        return snapshot
+
+
+_cache: Optional[StudentCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> StudentCache:
+    """
+    Returns the process-wide student cache, sized from the .env settings
+    (cache_size, 0 disables it, and cache_ttl in seconds).
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = StudentCache(env_int('cache_size', 10000), env_float('cache_ttl', 60.0))
+    return _cache
+
+
+def print_cache_stats() -> None:
+    """
+    Prints the student cache statistics.
+    """
+    print("\nSTUDENT CACHE STATISTICS")
+    print("-------------------------------------------------------------")
+    for key, value in get_cache().stats().items():
+        if isinstance(value, float):
+            print("{:<25} {:.4f}".format(key, value))
+        else:
+            print("{:<25} {}".format(key, value))
+    print("-------------------------------------------------------------")